@@ -0,0 +1,224 @@
+"""
+Gazetteer of Chile's 346 communes (16 regions) + a compiled commune matcher.
+
+`CommuneMatcher` normalizes a free-text location ("Viña del Mar",
+"VINA DEL MAR, Valparaiso", "Puerto Montt") — accents, case and punctuation
+stripped — and walks a token trie built once from the gazetteer. A single
+left-to-right pass returns the (region, commune) of the earliest, longest
+match, so "San Pedro de la Paz" beats "San Pedro" and "La Florida" beats
+"Florida". Cost per lookup depends on the length of the string, not on the
+size of the gazetteer, and repeated cities hit an LRU cache.
+
+    matcher = CommuneMatcher()
+    matcher.match("Viña del Mar")            # → ("Valparaíso", "Viña del Mar")
+    region_filter = RegionFilter({"Valparaíso", "Metropolitana"})
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# ─── Gazetteer: region → communes (official names) ──────────────────────────────
+GAZETTEER: dict[str, list[str]] = {
+    "Arica y Parinacota": [
+        "Arica", "Camarones", "Putre", "General Lagos",
+    ],
+    "Tarapacá": [
+        "Iquique", "Alto Hospicio", "Pozo Almonte", "Camiña", "Colchane", "Huara", "Pica",
+    ],
+    "Antofagasta": [
+        "Antofagasta", "Mejillones", "Sierra Gorda", "Taltal", "Calama", "Ollagüe",
+        "San Pedro de Atacama", "Tocopilla", "María Elena",
+    ],
+    "Atacama": [
+        "Copiapó", "Caldera", "Tierra Amarilla", "Chañaral", "Diego de Almagro",
+        "Vallenar", "Alto del Carmen", "Freirina", "Huasco",
+    ],
+    "Coquimbo": [
+        "La Serena", "Coquimbo", "Andacollo", "La Higuera", "Paiguano", "Vicuña",
+        "Illapel", "Canela", "Los Vilos", "Salamanca", "Ovalle", "Combarbalá",
+        "Monte Patria", "Punitaqui", "Río Hurtado",
+    ],
+    "Valparaíso": [
+        "Valparaíso", "Casablanca", "Concón", "Juan Fernández", "Puchuncaví", "Quintero",
+        "Viña del Mar", "Isla de Pascua", "Los Andes", "Calle Larga", "Rinconada",
+        "San Esteban", "La Ligua", "Cabildo", "Papudo", "Petorca", "Zapallar",
+        "Quillota", "La Calera", "Hijuelas", "La Cruz", "Nogales", "San Antonio",
+        "Algarrobo", "Cartagena", "El Quisco", "El Tabo", "Santo Domingo",
+        "San Felipe", "Catemu", "Llaillay", "Panquehue", "Putaendo", "Santa María",
+        "Quilpué", "Limache", "Olmué", "Villa Alemana",
+    ],
+    "Metropolitana": [
+        "Santiago", "Cerrillos", "Cerro Navia", "Conchalí", "El Bosque", "Estación Central",
+        "Huechuraba", "Independencia", "La Cisterna", "La Florida", "La Granja",
+        "La Pintana", "La Reina", "Las Condes", "Lo Barnechea", "Lo Espejo", "Lo Prado",
+        "Macul", "Maipú", "Ñuñoa", "Pedro Aguirre Cerda", "Peñalolén", "Providencia",
+        "Pudahuel", "Quilicura", "Quinta Normal", "Recoleta", "Renca", "San Joaquín",
+        "San Miguel", "San Ramón", "Vitacura", "Puente Alto", "Pirque",
+        "San José de Maipo", "Colina", "Lampa", "Tiltil", "San Bernardo", "Buin",
+        "Calera de Tango", "Paine", "Melipilla", "Alhué", "Curacaví", "María Pinto",
+        "San Pedro", "Talagante", "El Monte", "Isla de Maipo", "Padre Hurtado", "Peñaflor",
+    ],
+    "O'Higgins": [
+        "Rancagua", "Codegua", "Coinco", "Coltauco", "Doñihue", "Graneros", "Las Cabras",
+        "Machalí", "Malloa", "Mostazal", "Olivar", "Peumo", "Pichidegua",
+        "Quinta de Tilcoco", "Rengo", "Requínoa", "San Vicente", "Pichilemu",
+        "La Estrella", "Litueche", "Marchigüe", "Navidad", "Paredones", "San Fernando",
+        "Chépica", "Chimbarongo", "Lolol", "Nancagua", "Palmilla", "Peralillo",
+        "Placilla", "Pumanque", "Santa Cruz",
+    ],
+    "Maule": [
+        "Talca", "Constitución", "Curepto", "Empedrado", "Maule", "Pelarco", "Pencahue",
+        "Río Claro", "San Clemente", "San Rafael", "Cauquenes", "Chanco", "Pelluhue",
+        "Curicó", "Hualañé", "Licantén", "Molina", "Rauco", "Romeral",
+        "Sagrada Familia", "Teno", "Vichuquén", "Linares", "Colbún", "Longaví",
+        "Parral", "Retiro", "San Javier", "Villa Alegre", "Yerbas Buenas",
+    ],
+    "Ñuble": [
+        "Chillán", "Bulnes", "Chillán Viejo", "El Carmen", "Pemuco", "Pinto", "Quillón",
+        "San Ignacio", "Yungay", "Quirihue", "Cobquecura", "Coelemu", "Ninhue",
+        "Portezuelo", "Ránquil", "Treguaco", "San Carlos", "Coihueco", "Ñiquén",
+        "San Fabián", "San Nicolás",
+    ],
+    "Biobío": [
+        "Concepción", "Coronel", "Chiguayante", "Florida", "Hualqui", "Lota", "Penco",
+        "San Pedro de la Paz", "Santa Juana", "Talcahuano", "Tomé", "Hualpén", "Lebu",
+        "Arauco", "Cañete", "Contulmo", "Curanilahue", "Los Álamos", "Tirúa",
+        "Los Ángeles", "Antuco", "Cabrero", "Laja", "Mulchén", "Nacimiento", "Negrete",
+        "Quilaco", "Quilleco", "San Rosendo", "Santa Bárbara", "Tucapel", "Yumbel",
+        "Alto Biobío",
+    ],
+    "La Araucanía": [
+        "Temuco", "Carahue", "Cunco", "Curarrehue", "Freire", "Galvarino", "Gorbea",
+        "Lautaro", "Loncoche", "Melipeuco", "Nueva Imperial", "Padre Las Casas",
+        "Perquenco", "Pitrufquén", "Pucón", "Saavedra", "Teodoro Schmidt", "Toltén",
+        "Vilcún", "Villarrica", "Cholchol", "Angol", "Collipulli", "Curacautín",
+        "Ercilla", "Lonquimay", "Los Sauces", "Lumaco", "Purén", "Renaico", "Traiguén",
+        "Victoria",
+    ],
+    "Los Ríos": [
+        "Valdivia", "Corral", "Lanco", "Los Lagos", "Máfil", "Mariquina", "Paillaco",
+        "Panguipulli", "La Unión", "Futrono", "Lago Ranco", "Río Bueno",
+    ],
+    "Los Lagos": [
+        "Puerto Montt", "Calbuco", "Cochamó", "Fresia", "Frutillar", "Los Muermos",
+        "Llanquihue", "Maullín", "Puerto Varas", "Castro", "Ancud", "Chonchi",
+        "Curaco de Vélez", "Dalcahue", "Puqueldón", "Queilén", "Quellón", "Quemchi",
+        "Quinchao", "Osorno", "Puerto Octay", "Purranque", "Puyehue", "Río Negro",
+        "San Juan de la Costa", "San Pablo", "Chaitén", "Futaleufú", "Hualaihué", "Palena",
+    ],
+    "Aysén": [
+        "Coyhaique", "Lago Verde", "Aysén", "Cisnes", "Guaitecas", "Cochrane",
+        "O'Higgins", "Tortel", "Chile Chico", "Río Ibáñez",
+    ],
+    "Magallanes": [
+        "Punta Arenas", "Laguna Blanca", "Río Verde", "San Gregorio", "Cabo de Hornos",
+        "Antártica", "Porvenir", "Primavera", "Timaukel", "Natales", "Torres del Paine",
+    ],
+}
+
+# Common spellings / town names → official commune
+ALIASES: dict[str, str] = {
+    "Calera": "La Calera",
+    "Llay Llay": "Llaillay",
+    "Til Til": "Tiltil",
+    "Hanga Roa": "Isla de Pascua",
+    "Marchihue": "Marchigüe",
+    "Paihuano": "Paiguano",
+    "Coihaique": "Coyhaique",
+    "Puerto Aysén": "Aysén",
+    "Aisén": "Aysén",
+    "Puerto Natales": "Natales",
+    "Puerto Williams": "Cabo de Hornos",
+    "San José de la Mariquina": "Mariquina",
+    "Alto Bío Bío": "Alto Biobío",
+    "Chol Chol": "Cholchol",
+    "Santiago Centro": "Santiago",
+    "Reñaca": "Viña del Mar",
+    "Mostazal San Francisco": "Mostazal",
+}
+
+# Region codes accepted in TARGET_REGIONS alongside the names
+REGION_CODES: dict[str, str] = {
+    "XV": "Arica y Parinacota", "I": "Tarapacá", "II": "Antofagasta", "III": "Atacama",
+    "IV": "Coquimbo", "V": "Valparaíso", "RM": "Metropolitana", "XIII": "Metropolitana",
+    "VI": "O'Higgins", "VII": "Maule", "XVI": "Ñuble", "VIII": "Biobío",
+    "IX": "La Araucanía", "XIV": "Los Ríos", "X": "Los Lagos", "XI": "Aysén",
+    "XII": "Magallanes",
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """'Viña del Mar' / 'VINA  DEL-MAR' → 'vina del mar' (accents, case, punctuation stripped)."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    ascii_only = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", ascii_only.lower()).strip()
+
+
+def resolve_region(name: str) -> str:
+    """Map a region name or code ('Valparaiso', 'V', 'RM', 'biobio') to its GAZETTEER key."""
+    if name.upper() in REGION_CODES:
+        return REGION_CODES[name.upper()]
+    wanted = normalize(name)
+    for region in GAZETTEER:
+        if normalize(region) == wanted:
+            return region
+    raise ValueError(f"Unknown Chilean region: {name!r}")
+
+
+class CommuneMatcher:
+    """Token-trie matcher over every commune (and alias) in the gazetteer."""
+
+    _END = object()
+
+    def __init__(self, gazetteer: dict[str, list[str]] = GAZETTEER,
+                 aliases: dict[str, str] = ALIASES, cache_size: int = 4096):
+        commune_region = {c: r for r, communes in gazetteer.items() for c in communes}
+        self._trie: dict = {}
+        for commune, region in commune_region.items():
+            self._insert(commune, (region, commune))
+        for alias, commune in aliases.items():
+            if commune in commune_region:
+                self._insert(alias, (commune_region[commune], commune))
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _insert(self, name: str, value: tuple[str, str]):
+        node = self._trie
+        for token in normalize(name).split():
+            node = node.setdefault(token, {})
+        node[self._END] = value
+
+    def _match(self, text: str) -> tuple[str, str] | None:
+        """(region, commune) of the earliest, longest commune in `text`, else None."""
+        if not text:
+            return None
+        tokens = normalize(text).split()
+        for start in range(len(tokens)):
+            node = self._trie
+            found = None
+            for token in tokens[start:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                found = node.get(self._END, found)
+            if found:
+                return found
+        return None
+
+
+class RegionFilter:
+    """Answers "is this city in one of the target regions?" via CommuneMatcher."""
+
+    def __init__(self, target_regions, matcher: CommuneMatcher | None = None):
+        self.regions = {resolve_region(r) for r in target_regions}
+        self.matcher = matcher or CommuneMatcher()
+
+    def locate(self, city: str) -> tuple[str, str, bool]:
+        """(region, commune, in_target) — region/commune are '' when unknown."""
+        hit = self.matcher.match(city)
+        if not hit:
+            return "", "", False
+        region, commune = hit
+        return region, commune, region in self.regions
@@ -0,0 +1,127 @@
+"""
+GraphQL cursor pagination for the Marketplace scraper.
+
+Instead of scrolling the page and waiting for the feed to fire /api/graphql
+requests as a side effect, we:
+  1. Let the page issue its first marketplace_search request normally and
+     record it (URL, form fields incl. doc_id, variables, headers).
+  2. Read `feed_units.page_info.end_cursor` from its response.
+  3. Re-POST the same request with `variables.cursor = end_cursor` through the
+     logged-in browser context's request client, page after page.
+
+The DOM never grows and there is no fixed scroll delay — throughput is bound
+by Facebook's response time. Replayed responses go through the same
+parse_feed_units() as scrolled ones.
+
+The tab may keep firing feed requests of its own while we replay. Their
+cursors are tracked as `end_cursor` (what the page has seen) and only seed
+the replay; from then on the replay follows its own `replay_cursor`, so the
+two never overwrite each other's position.
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qsl
+
+from graphql_prefilter import decode_graphql
+
+CURSOR_VARIABLE = "cursor"
+
+# Request headers worth carrying over to the replayed POST. Cookies are added
+# by the context itself; length/encoding headers are recomputed.
+REPLAY_HEADERS = {
+    "content-type", "x-fb-friendly-name", "x-fb-lsd", "x-asbd-id",
+    "accept", "accept-language", "origin", "referer", "user-agent",
+}
+
+
+def page_info(data: dict) -> dict:
+    try:
+        return data["data"]["marketplace_search"]["feed_units"].get("page_info") or {}
+    except (KeyError, TypeError, AttributeError):
+        return {}
+
+
+class MarketplaceQueryCapture:
+    """Remembers the first marketplace_search request, the latest cursor the
+    page has seen and the replay's own cursor."""
+
+    def __init__(self):
+        self.url: str | None = None
+        self.form: dict[str, str] = {}
+        self.variables: dict = {}
+        self.headers: dict[str, str] = {}
+        self.doc_id: str | None = None
+        self.friendly_name: str | None = None
+        self.end_cursor: str | None = None          # latest from the page's own requests
+        self.has_next_page = True
+        self.replay_cursor: str | None = None       # advanced only by replay()
+        self.replay_has_next = True
+        self.ready = asyncio.Event()
+
+    async def observe(self, request, data: dict):
+        """Call for every decoded /api/graphql response that carried a feed."""
+        info = page_info(data)
+        if not self.ready.is_set():
+            if not await self._capture(request):
+                return
+        if info:
+            self.end_cursor = info.get("end_cursor") or self.end_cursor
+            self.has_next_page = bool(info.get("has_next_page", True))
+            if self.end_cursor:
+                self.ready.set()
+
+    async def _capture(self, request) -> bool:
+        post = request.post_data or ""
+        form = dict(parse_qsl(post, keep_blank_values=True))
+        if "variables" not in form:
+            return False
+        try:
+            variables = json.loads(form["variables"])
+        except json.JSONDecodeError:
+            return False
+        headers = await request.all_headers()
+        self.url = request.url
+        self.form = form
+        self.variables = variables
+        self.doc_id = form.get("doc_id")
+        self.friendly_name = form.get("fb_api_req_friendly_name") or headers.get("x-fb-friendly-name")
+        self.headers = {k: v for k, v in headers.items() if k.lower() in REPLAY_HEADERS}
+        print(f"  🧷 Captured feed query {self.friendly_name or '?'} (doc_id={self.doc_id})")
+        return True
+
+    async def fetch_next(self, context) -> dict | None:
+        """POST the captured query with the replay cursor; returns decoded JSON."""
+        variables = {**self.variables, CURSOR_VARIABLE: self.replay_cursor}
+        form = {**self.form, "variables": json.dumps(variables, separators=(",", ":"))}
+        resp = await context.request.post(self.url, form=form, headers=self.headers)
+        if not resp.ok:
+            raise RuntimeError(f"GraphQL replay HTTP {resp.status}")
+        return decode_graphql(await resp.body())
+
+    async def replay(self, context, *, max_pages: int, delay: float = 0.0, retries: int = 3):
+        """Async generator of decoded feed pages, following end_cursor until the
+        feed reports no next page (or max_pages / repeated failures). Starts
+        from the last cursor the page has seen."""
+        self.replay_cursor, self.replay_has_next = self.end_cursor, self.has_next_page
+        for _ in range(max_pages):
+            if not (self.replay_has_next and self.replay_cursor):
+                return
+            for attempt in range(1, retries + 1):
+                try:
+                    data = await self.fetch_next(context)
+                    break
+                except Exception as e:
+                    print(f"  ⚠️  Replay failed ({attempt}/{retries}): {e}")
+                    await asyncio.sleep(2 ** attempt)
+            else:
+                return
+            info = page_info(data)
+            if not info:
+                # Not a feed page (checkpoint, rate limit, schema change) — stop
+                return
+            self.replay_cursor = info.get("end_cursor")
+            self.replay_has_next = bool(info.get("has_next_page")) and bool(self.replay_cursor)
+            yield data
+            if delay:
+                await asyncio.sleep(delay)
@@ -3,14 +3,32 @@ Facebook Marketplace - Quick Debug Script (v2)
 Opens FB, waits for you to be logged in (checks URL), then goes to marketplace
 and dumps the first 5 GraphQL responses to JSON files so we can inspect the structure.
 Run this, log in manually if needed, let it capture, then check the .json files.
+
+CAPTURE_MODE = "ring" instead streams every GraphQL response, compressed, into
+a size-capped ring of NDJSON segments written by a background thread (see
+graphql_capture.py) and keeps scrolling until MAX_SCROLLS or Ctrl-C — leave it
+running for hours; inspect with `python graphql_capture.py stats graphql_capture/`.
 """
 
 import asyncio
 import json
+from collections import Counter
 from pathlib import Path
 from playwright.async_api import async_playwright
 
+import graphql_capture
+from graphql_prefilter import request_names
+from resource_blocker import install_resource_blocker
+
 OUTPUT_DIR = Path(__file__).parent
+BLOCK_RESOURCES = False   # abort images / media / fonts / analytics while capturing
+CAPTURE_MODE = "files"    # "files" → first 8 responses as JSON files | "ring" → compressed ring buffer
+CAPTURE_DIR = graphql_capture.CAPTURE_DIR
+CAPTURE_MAX_BYTES = graphql_capture.MAX_BYTES   # ring mode: total size kept on disk
+CAPTURE_COMPRESSION = "gzip"                    # ring mode: "gzip" | "zstd"
+MAX_CAPTURES = 8          # files mode: stop after this many responses
+MAX_SCROLLS = 5_000       # ring mode: scrolls before stopping (Ctrl-C stops earlier)
+SCROLL_PAUSE = 2.5
 
 TARGET_URL = (
     "https://www.facebook.com/marketplace/106647439372422/search/"
@@ -18,17 +36,31 @@ TARGET_URL = (
 )
 
 graphql_count = 0
-all_urls = []
+url_counts: Counter[str] = Counter()   # files mode (the ring counts its own, for urls.json)
+ring: graphql_capture.CaptureRing | None = None
 
 async def handle_response(response):
     global graphql_count
     url = response.url
-    all_urls.append(url)
+    if ring:
+        ring.see(url)
+    else:
+        url_counts[graphql_capture.url_key(url)] += 1
 
     if "graphql" not in url:
         return
 
     graphql_count += 1
+    if ring:
+        try:
+            body = await response.body()
+        except Exception:
+            return
+        name, doc_id = request_names(response.request)
+        ring.add(url, body, status=response.status, friendly_name=name, doc_id=doc_id)
+        return
+    if graphql_count > MAX_CAPTURES:
+        return
     try:
         text = await response.text()
         try:
@@ -43,13 +75,26 @@ async def handle_response(response):
         top_keys = list(data.keys())[:8] if isinstance(data, dict) else f"list len={len(data)}"
         print(f"  📡 #{graphql_count:>2}: {out_file.name}  keys={top_keys}")
 
-        if graphql_count >= 8:
-            print("  ℹ️  Captured 8 responses — stopping early.")
+        if graphql_count >= MAX_CAPTURES:
+            print(f"  ℹ️  Captured {MAX_CAPTURES} responses — stopping early.")
     except Exception as e:
         print(f"  ⚠️  Could not parse response {graphql_count}: {e}")
 
 
 async def main():
+    global ring
+    if CAPTURE_MODE == "ring":
+        ring = graphql_capture.CaptureRing(CAPTURE_DIR, max_bytes=CAPTURE_MAX_BYTES,
+                                           compression=CAPTURE_COMPRESSION)
+    try:
+        await capture()
+    finally:
+        if ring:
+            ring.close()
+            print(f"📦 Capture ring: {ring.summary()} → {CAPTURE_DIR}")
+
+
+async def capture():
     async with async_playwright() as p:
         browser = await p.chromium.launch(
             headless=False,
@@ -65,6 +110,7 @@ async def main():
         )
         page = await context.new_page()
         page.on("response", handle_response)
+        block_stats = await install_resource_blocker(page) if BLOCK_RESOURCES else None
 
         # Go to Facebook home
         await page.goto("https://www.facebook.com", wait_until="domcontentloaded", timeout=30_000)
@@ -92,19 +138,28 @@ async def main():
         await page.goto(TARGET_URL, wait_until="domcontentloaded", timeout=60_000)
         await asyncio.sleep(4)
 
-        print(f"\n🔄 Scrolling 8 times and listening for GraphQL…\n")
-        for i in range(8):
+        scrolls = MAX_SCROLLS if ring else MAX_CAPTURES
+        print(f"\n🔄 Scrolling up to {scrolls} times and listening for GraphQL…\n")
+        for i in range(scrolls):
             await page.evaluate("window.scrollBy(0, 1200)")
-            print(f"  Scroll {i+1}/8 — GraphQL captured: {graphql_count}")
-            await asyncio.sleep(2.5)
-            if graphql_count >= 8:
+            if ring:
+                if (i + 1) % 20 == 0:
+                    print(f"  Scroll {i+1}/{scrolls} — {ring.summary()}")
+            else:
+                print(f"  Scroll {i+1}/{scrolls} — GraphQL captured: {graphql_count}")
+            await asyncio.sleep(SCROLL_PAUSE)
+            if not ring and graphql_count >= MAX_CAPTURES:
                 break
 
         await asyncio.sleep(3)
 
         print(f"\n✅ Done. Captured {graphql_count} GraphQL responses.")
-        print(f"   Unique URLs seen: {len(set(all_urls))}")
-        print(f"\n📁 Check {OUTPUT_DIR} for graphql_response_*.json files\n")
+        counts = ring.urls if ring else url_counts
+        print(f"   Unique URLs seen: {len(counts)} ({sum(counts.values())} requests)")
+        if block_stats:
+            print(f"   Resource blocker: {block_stats.summary()}")
+        if not ring:
+            print(f"\n📁 Check {OUTPUT_DIR} for graphql_response_*.json files\n")
 
         await browser.close()
 
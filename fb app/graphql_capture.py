@@ -0,0 +1,321 @@
+"""
+Bounded, compressed capture of /api/graphql responses.
+
+debug_graphql.py used to pretty-print every response into its own JSON file,
+synchronously inside the response handler, and stop after 8. CaptureRing is
+meant to stay on for hours — during production scrapes too — so the corpus is
+already there the day Facebook changes its schema:
+
+  • add() only puts the record on a bounded queue; a background thread
+    compresses and writes it (when the queue is full the record is dropped
+    and counted — the event loop never waits on disk)
+  • records are NDJSON lines {ts, seq, url, status, friendly_name, doc_id,
+    body}, each written as its own gzip member (or zstd frame, with the
+    optional `zstandard` package), so any record can be read on its own and a
+    crash loses at most the record being written
+  • segments rotate every SEGMENT_BYTES; once all segments exceed MAX_BYTES
+    the oldest are deleted — a ring buffer on disk
+  • each segment has an index (capture-000042.idx) with the offset, size,
+    friendly name and doc_id of every record, so lookups by query don't
+    decompress the whole corpus
+  • URLs seen (see()) are kept as counts (collections.Counter), not as a
+    list, and written to urls.json on close()
+  • `seq` continues from the last record already in the directory, so it
+    stays unique across runs sharing one ring
+
+Reading:
+
+    for record in iter_records(CAPTURE_DIR, friendly_name="MarketplaceSearchFeedPaginationQuery"):
+        data = decode_graphql(record["body"])
+
+    python graphql_capture.py stats graphql_capture/
+    python graphql_capture.py export graphql_capture/ out/ [--friendly-name … | --doc-id …]
+"""
+
+import argparse
+import gzip
+import json
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    import zstandard
+except ImportError:      # optional — gzip is always available
+    zstandard = None
+
+CAPTURE_DIR = Path(__file__).parent / "graphql_capture"
+MAX_BYTES = 256 * 1024 * 1024     # ring size: oldest segments are deleted beyond this
+SEGMENT_BYTES = 16 * 1024 * 1024  # compressed bytes per segment file
+QUEUE_MAX = 1_000                 # records waiting for the writer; more are dropped
+COMPRESSION = "gzip"              # "gzip" | "zstd" (needs pip install zstandard)
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 6
+
+_SUFFIX = {"gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+_STOP = object()
+
+
+def available(compression: str) -> bool:
+    if compression == "zstd" and zstandard is None:
+        print("  ℹ️  zstd capture disabled (pip install zstandard to enable) — using gzip.")
+        return False
+    return True
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def _decompress(data: bytes, suffix: str) -> bytes:
+    if suffix.endswith(".zst"):
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def url_key(url: str) -> str:
+    """scheme://host/path — query strings would make every URL unique."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class CaptureRing:
+    """Background-written, size-capped ring of compressed GraphQL captures."""
+
+    def __init__(self, directory: Path = CAPTURE_DIR, *, max_bytes: int = MAX_BYTES,
+                 segment_bytes: int = SEGMENT_BYTES, compression: str = COMPRESSION,
+                 queue_max: int = QUEUE_MAX):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.compression = compression if available(compression) else "gzip"
+        self.urls: Counter[str] = Counter()
+        self.by_name: Counter[str] = Counter()
+
+        self.captured = 0
+        self.dropped = 0
+        self.bytes_in = 0           # uncompressed
+        self.bytes_out = 0          # compressed, written
+        self.segments_deleted = 0
+
+        existing = segments(self.directory)
+        self._segment_no = int(existing[-1].name.split("-")[1].split(".")[0]) if existing else 0
+        self._seq = _last_seq(existing)
+        self._data = self._index = None
+        self._segment_size = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_max)
+        self._thread = threading.Thread(target=self._writer, name="graphql-capture", daemon=True)
+        self._thread.start()
+
+    # ── Producer side (event loop) ─────────────────────────────────────────────
+    def see(self, url: str):
+        """Count one response URL (captured or not) for urls.json."""
+        self.urls[url_key(url)] += 1
+
+    def add(self, url: str, body: bytes, *, status: int | None = None,
+            friendly_name: str | None = None, doc_id: str | None = None) -> bool:
+        """Queue one response for the writer; False if it had to be dropped."""
+        record = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "url": url,
+                  "status": status, "friendly_name": friendly_name, "doc_id": doc_id}
+        try:
+            self._queue.put_nowait((record, body))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.by_name[friendly_name or "?"] += 1
+        return True
+
+    def close(self):
+        """Write everything still queued, then stop the writer."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self.write_urls()
+
+    def write_urls(self, *, reset: bool = False):
+        """Write the URL counts to urls.json (and start counting afresh with `reset`)."""
+        (self.directory / "urls.json").write_text(
+            json.dumps(dict(self.urls.most_common()), ensure_ascii=False, indent=1), encoding="utf-8")
+        if reset:
+            self.urls.clear()
+
+    # ── Writer thread ──────────────────────────────────────────────────────────
+    def _writer(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                self._write(*item)
+        finally:
+            self._close_segment()
+
+    def _write(self, record: dict, body: bytes):
+        if self._data is None or self._segment_size >= self.segment_bytes:
+            self._close_segment()
+            self._open_segment()
+        self._seq += 1
+        record = {**record, "seq": self._seq, "body": body.decode("utf-8", errors="replace")}
+        raw = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        blob = _compress(raw, self.compression)
+        offset = self._segment_size
+        self._data.write(blob)
+        self._data.flush()
+        self._index.write(json.dumps({
+            "seq": self._seq, "offset": offset, "length": len(blob), "bytes": len(raw),
+            "friendly_name": record["friendly_name"], "doc_id": record["doc_id"], "status": record["status"],
+        }) + "\n")
+        self._index.flush()
+        self._segment_size += len(blob)
+        self.captured += 1
+        self.bytes_in += len(raw)
+        self.bytes_out += len(blob)
+
+    def _open_segment(self):
+        self._segment_no += 1
+        stem = f"capture-{self._segment_no:06d}"
+        self._data = open(self.directory / f"{stem}{_SUFFIX[self.compression]}", "ab")
+        self._index = open(self.directory / f"{stem}.idx", "a", encoding="utf-8")
+        self._segment_size = 0
+        self._enforce_cap()
+
+    def _close_segment(self):
+        if self._data is not None:
+            self._data.close()
+            self._index.close()
+            self._data = self._index = None
+
+    def _enforce_cap(self):
+        """Delete the oldest closed segments until the ring fits in max_bytes."""
+        closed = segments(self.directory)[:-1]
+        total = sum(p.stat().st_size for p in closed)
+        for path in closed:
+            if total <= self.max_bytes - self.segment_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+            _index_path(path).unlink(missing_ok=True)
+            self.segments_deleted += 1
+
+    def summary(self) -> str:
+        ratio = self.bytes_in / self.bytes_out if self.bytes_out else 0.0
+        return (f"{self.captured} responses ({self.bytes_in / 1e6:.1f} MB → {self.bytes_out / 1e6:.1f} MB "
+                f"{self.compression}, {ratio:.1f}×), {self.dropped} dropped, "
+                f"{self.segments_deleted} old segments rotated out, {len(self.urls)} distinct URLs")
+
+
+# ─── Reading ────────────────────────────────────────────────────────────────────
+def segments(directory: Path) -> list[Path]:
+    """Data segments, oldest first."""
+    return sorted(p for p in Path(directory).glob("capture-*.ndjson.*") if p.suffix in {".gz", ".zst"})
+
+
+def _index_path(segment: Path) -> Path:
+    return segment.with_name(segment.name.split(".")[0] + ".idx")
+
+
+def _last_seq(existing: list[Path]) -> int:
+    """Highest seq written to the ring so far (0 for an empty directory)."""
+    for segment in reversed(existing):
+        entries = read_index(segment)
+        if entries:
+            return max(e.get("seq") or 0 for e in entries)
+    return 0
+
+
+def read_index(segment: Path) -> list[dict]:
+    index = _index_path(segment)
+    if not index.exists():
+        return []
+    entries = []
+    with open(index, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue      # torn last line after a crash
+    return entries
+
+
+def iter_index(directory: Path):
+    """(segment, index entry) for every record, oldest first."""
+    for segment in segments(directory):
+        for entry in read_index(segment):
+            yield segment, entry
+
+
+def iter_records(directory: Path, *, friendly_name: str | None = None, doc_id: str | None = None):
+    """Decoded capture records, oldest first, optionally only one query."""
+    for segment in segments(directory):
+        wanted = [e for e in read_index(segment)
+                  if (not friendly_name or e.get("friendly_name") == friendly_name)
+                  and (not doc_id or e.get("doc_id") == doc_id)]
+        if not wanted:
+            continue
+        with open(segment, "rb") as f:
+            for entry in wanted:
+                f.seek(entry["offset"])
+                blob = f.read(entry["length"])
+                try:
+                    yield json.loads(_decompress(blob, segment.suffix))
+                except (OSError, EOFError, ValueError):
+                    continue
+
+
+def stats(directory: Path) -> dict:
+    names: Counter[tuple] = Counter()
+    records = raw = 0
+    for _, entry in iter_index(directory):
+        names[(entry.get("friendly_name") or "?", entry.get("doc_id") or "?")] += 1
+        records += 1
+        raw += entry.get("bytes") or 0
+    on_disk = sum(p.stat().st_size for p in segments(directory))
+    return {"records": records, "segments": len(segments(directory)), "bytes": raw,
+            "bytes_on_disk": on_disk, "queries": names}
+
+
+# ─── CLI ────────────────────────────────────────────────────────────────────────
+def main():
+    ap = argparse.ArgumentParser(description="Inspect / export a GraphQL capture ring")
+    sub = ap.add_subparsers(dest="command", required=True)
+    s = sub.add_parser("stats", help="records per friendly name / doc_id")
+    s.add_argument("directory", type=Path)
+    e = sub.add_parser("export", help="write records as graphql_response_NNNNN.json files")
+    e.add_argument("directory", type=Path)
+    e.add_argument("out", type=Path)
+    e.add_argument("--friendly-name")
+    e.add_argument("--doc-id")
+    args = ap.parse_args()
+
+    if args.command == "stats":
+        t0 = time.perf_counter()
+        info = stats(args.directory)
+        print(f"📦 {info['records']} records in {info['segments']} segments — "
+              f"{info['bytes'] / 1e6:.1f} MB raw, {info['bytes_on_disk'] / 1e6:.1f} MB on disk "
+              f"({(time.perf_counter() - t0) * 1000:.0f} ms)")
+        for (name, doc_id), n in info["queries"].most_common():
+            print(f"   {n:>7}  {name:<50} doc_id={doc_id}")
+        urls = args.directory / "urls.json"
+        if urls.exists():
+            top = list(json.loads(urls.read_text(encoding="utf-8")).items())[:10]
+            print("\n   Top URLs:")
+            for url, n in top:
+                print(f"   {n:>7}  {url}")
+    else:
+        args.out.mkdir(parents=True, exist_ok=True)
+        n = 0
+        for n, record in enumerate(iter_records(args.directory, friendly_name=args.friendly_name,
+                                                doc_id=args.doc_id), 1):
+            (args.out / f"graphql_response_{n:05d}.json").write_text(record["body"], encoding="utf-8")
+        print(f"💾 {n} responses → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Cheap classification and off-loop decoding of /api/graphql responses.
+
+Most /api/graphql traffic on a Marketplace page is not the feed
+(notifications, chat, presence, …). Decoding all of it on the event loop
+stalls the scroll loop, so handle_response goes through three gates:
+
+  1. request level  — the `x-fb-friendly-name` header / `fb_api_req_friendly_name`
+                      form field (or the captured feed doc_id) rules out
+                      non-Marketplace queries without touching the body.
+  2. byte prefix    — the raw body must mention `marketplace_search` in its
+                      first PREFIX_SCAN_BYTES bytes, checked before any decoding.
+  3. decode         — with orjson when installed, and for bodies above
+                      OFFLOAD_BYTES in a worker process that hands back only
+                      the slim feed (listing nodes + page_info), so the loop
+                      never blocks on a big payload.
+
+`FeedDecoder.stats` counts what was skipped at each gate and the decode time
+per response (mean and max over the whole run, p95 over the last
+DECODE_SAMPLE_SIZE decodes, so memory stays flat in the daemon).
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl
+
+try:
+    import orjson
+except ImportError:      # optional — falls back to the stdlib decoder
+    orjson = None
+
+PREFIX_SCAN_BYTES = 4096
+OFFLOAD_BYTES = 512 * 1024
+FEED_MARKER = b'"marketplace_search"'
+XSSI_PREFIX = b"for (;;);"
+DECODE_SAMPLE_SIZE = 1_000       # recent decode times kept for the p95
+
+
+def fast_loads(payload: bytes | str):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def decode_graphql(payload: bytes | str):
+    """Decode a /api/graphql body. FB may prefix `for (;;);` and may stream
+    several JSON objects (deferred fragments) separated by newlines — the feed
+    lives in the first one."""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    payload = payload.lstrip()
+    if payload.startswith(XSSI_PREFIX):
+        payload = payload[len(XSSI_PREFIX):]
+    try:
+        return fast_loads(payload)
+    except ValueError:
+        return fast_loads(payload.split(b"\n", 1)[0])
+
+
+def slim_feed(payload: bytes) -> dict | None:
+    """Decode and keep only what parse_feed_units / the cursor capture read.
+    Runs in a worker process, so only the small result crosses back."""
+    data = decode_graphql(payload)
+    try:
+        units = data["data"]["marketplace_search"]["feed_units"]
+    except (KeyError, TypeError):
+        return None
+    edges = [
+        {"node": {"listing": (edge.get("node") or {}).get("listing")}}
+        for edge in units.get("edges") or []
+        if isinstance(edge, dict)
+    ]
+    return {"data": {"marketplace_search": {"feed_units": {
+        "edges": edges, "page_info": units.get("page_info") or {},
+    }}}}
+
+
+def request_names(request) -> tuple[str | None, str | None]:
+    """(friendly_name, doc_id) of a GraphQL request, without reading the response."""
+    name = request.headers.get("x-fb-friendly-name")
+    doc_id = None
+    post = request.post_data or ""
+    if post:
+        form = dict(parse_qsl(post, keep_blank_values=True))
+        name = name or form.get("fb_api_req_friendly_name")
+        doc_id = form.get("doc_id")
+    return name, doc_id
+
+
+def is_candidate_request(request, feed_doc_id: str | None = None) -> bool:
+    """False only when the request is certainly not a Marketplace feed query."""
+    name, doc_id = request_names(request)
+    if feed_doc_id and doc_id == feed_doc_id:
+        return True
+    if name:
+        return "marketplace" in name.lower()
+    return True
+
+
+def looks_like_feed(body: bytes) -> bool:
+    return FEED_MARKER in body[:PREFIX_SCAN_BYTES]
+
+
+class PrefilterStats:
+    def __init__(self):
+        self.seen = 0
+        self.skipped_by_name = 0
+        self.skipped_by_scan = 0
+        self.decoded = 0
+        self.offloaded = 0
+        self.decode_ms: deque[float] = deque(maxlen=DECODE_SAMPLE_SIZE)   # most recent
+        self.decode_ms_total = 0.0
+        self.decode_ms_max = 0.0
+
+    def record_decode(self, ms: float):
+        self.decoded += 1
+        self.decode_ms.append(ms)
+        self.decode_ms_total += ms
+        self.decode_ms_max = max(self.decode_ms_max, ms)
+
+    def summary(self) -> str:
+        skipped = self.skipped_by_name + self.skipped_by_scan
+        line = (f"{self.seen} seen, {skipped} skipped "
+                f"({self.skipped_by_name} by name, {self.skipped_by_scan} by byte scan), "
+                f"{self.decoded} decoded ({self.offloaded} off-loop)")
+        if self.decode_ms:
+            ms = sorted(self.decode_ms)
+            p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+            line += (f", decode ms avg {self.decode_ms_total / self.decoded:.1f} / p95 {p95:.1f} "
+                     f"/ max {self.decode_ms_max:.1f}")
+        return line
+
+
+class FeedDecoder:
+    """Decodes feed bodies inline (small) or in a worker process (large)."""
+
+    def __init__(self, offload_bytes: int = OFFLOAD_BYTES, workers: int = 1):
+        self.offload_bytes = offload_bytes
+        self.workers = workers
+        self.stats = PrefilterStats()
+        self._pool: ProcessPoolExecutor | None = None
+
+    async def decode(self, body: bytes) -> dict | None:
+        t0 = time.perf_counter()
+        if len(body) > self.offload_bytes:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            data = await asyncio.get_running_loop().run_in_executor(self._pool, slim_feed, body)
+            self.stats.offloaded += 1
+        else:
+            data = decode_graphql(body)
+        self.stats.record_decode((time.perf_counter() - t0) * 1000)
+        return data
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
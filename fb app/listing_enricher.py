@@ -0,0 +1,336 @@
+"""
+Listing detail enrichment for the Marketplace scraper.
+
+The feed only carries title, price, city, a km subtitle and the seller name.
+Description, transmission, fuel type, number of owners and the full photo list
+live on https://www.facebook.com/marketplace/item/{lid}/. ListingEnricher
+fetches them while the feed is still being scraped:
+
+  • the parser submit()s every qualifying listing to an asyncio queue
+  • WORKERS tabs of the same logged-in context take listings off the queue,
+    open the item page and read the details from its /api/graphql responses
+    (falling back to the JSON embedded in the page HTML)
+  • a shared rate limiter spaces item-page visits (RATE_PER_MINUTE overall)
+    and failed fetches are retried with exponential backoff
+  • results are cached in the listing_details table by listing id — a listing
+    is never enriched twice, across runs too (when it lives in the listing
+    store's database)
+
+    enricher = ListingEnricher(context, store.conn)
+    await enricher.start()
+    enricher.submit(row)                 # non-blocking, from the parser
+    await enricher.close(drain_timeout=120)
+"""
+
+import asyncio
+import json
+import re
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import run_log
+from graphql_prefilter import fast_loads, XSSI_PREFIX
+
+ITEM_URL = "https://www.facebook.com/marketplace/item/{lid}/"
+WORKERS = 2                  # item-page tabs working in parallel
+RATE_PER_MINUTE = 20         # item-page visits per minute, all workers together
+RETRIES = 2                  # extra attempts per listing within a run
+RETRY_BACKOFF = 5.0          # seconds before the first retry (doubles each time)
+DETAIL_TIMEOUT = 15.0        # wait this long for the details after navigation
+MAX_ATTEMPTS = 3             # listings failing in this many runs are given up on
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listing_details (
+    listing_id   TEXT PRIMARY KEY,
+    fetched_at   TEXT NOT NULL,
+    status       TEXT NOT NULL,        -- ok | failed
+    attempts     INTEGER DEFAULT 1,
+    description  TEXT,
+    transmission TEXT,
+    fuel         TEXT,
+    owners       INTEGER,
+    photos       TEXT                  -- JSON list of image URIs
+);
+"""
+
+# GraphQL key → listing_details column
+DETAIL_KEYS = {
+    "redacted_description": "description",
+    "vehicle_transmission_type": "transmission",
+    "vehicle_fuel_type": "fuel",
+    "vehicle_number_of_owners": "owners",
+    "listing_photos": "photos",
+}
+# Same keys as embedded in the item page's server-rendered JSON
+_EMBEDDED = {
+    "description": re.compile(r'"redacted_description":\{"text":"((?:[^"\\]|\\.)*)"'),
+    "transmission": re.compile(r'"vehicle_transmission_type":"([A-Z_]+)"'),
+    "fuel": re.compile(r'"vehicle_fuel_type":"([A-Z_]+)"'),
+    "owners": re.compile(r'"vehicle_number_of_owners":"?(\d+)'),
+}
+_EMBEDDED_PHOTO = re.compile(r'"listing_photos":\[(.*?)\]\}?,"')
+_PHOTO_URI = re.compile(r'"uri":"((?:[^"\\]|\\.)*)"')
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def find_keys(obj, wanted) -> dict:
+    """Depth-first search of a decoded payload for the first value of each
+    wanted key (iterative, so deep GraphQL trees don't hit the recursion limit)."""
+    found = {}
+    stack = [obj]
+    while stack and len(found) < len(wanted):
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in wanted and key not in found and value not in (None, "", []):
+                    found[key] = value
+                elif isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(node, list):
+            stack.extend(node)
+    return found
+
+
+def _photo_uris(photos) -> list[str]:
+    uris = []
+    for photo in photos or []:
+        image = (photo or {}).get("image") or {}
+        uri = image.get("uri") or (photo or {}).get("uri")
+        if uri:
+            uris.append(uri)
+    return uris
+
+
+def details_from_payload(payload) -> dict:
+    """listing_details columns found in one decoded GraphQL payload."""
+    raw = find_keys(payload, DETAIL_KEYS)
+    details = {}
+    for key, value in raw.items():
+        column = DETAIL_KEYS[key]
+        if column == "description":
+            value = value.get("text") if isinstance(value, dict) else value
+        elif column == "photos":
+            value = _photo_uris(value)
+        elif column == "owners":
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                continue
+        if value not in (None, "", []):
+            details[column] = value
+    return details
+
+
+def details_from_html(html: str) -> dict:
+    """Fallback: the same fields from the JSON embedded in the item page."""
+    details = {}
+    for column, pattern in _EMBEDDED.items():
+        m = pattern.search(html)
+        if m:
+            value = json.loads(f'"{m.group(1)}"')
+            details[column] = int(value) if column == "owners" else value
+    m = _EMBEDDED_PHOTO.search(html)
+    if m:
+        details["photos"] = [json.loads(f'"{u}"') for u in _PHOTO_URI.findall(m.group(1))]
+    return details
+
+
+def _payloads(body: bytes):
+    """Every JSON object of a (possibly streamed, multi-line) GraphQL body."""
+    body = body.lstrip()
+    if body.startswith(XSSI_PREFIX):
+        body = body[len(XSSI_PREFIX):]
+    for line in body.split(b"\n"):
+        if line.strip():
+            try:
+                yield fast_loads(line)
+            except ValueError:
+                continue
+
+
+class RateLimiter:
+    """Spaces acquisitions at least 60 / per_minute seconds apart."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class ListingEnricher:
+    """Bounded worker pool that enriches qualifying listings from their item page."""
+
+    def __init__(self, context, conn: sqlite3.Connection | None = None, *, workers: int = WORKERS,
+                 rate_per_minute: float = RATE_PER_MINUTE, retries: int = RETRIES,
+                 item_url: str = ITEM_URL, on_details=None):
+        self.context = context
+        self.conn = conn or sqlite3.connect(":memory:")
+        self.conn.executescript(SCHEMA)
+        self.workers = workers
+        self.retries = retries
+        self.item_url = item_url
+        self.on_details = on_details      # callback(lid, details) after a successful fetch
+        self.limiter = RateLimiter(rate_per_minute)
+        self.queue: asyncio.Queue[str] = asyncio.Queue()
+        self._queued: set[str] = set()
+        self._tasks: list[asyncio.Task] = []
+
+        self.enriched = 0
+        self.failed = 0
+        self.cached = 0
+
+    # ── Lifecycle ──────────────────────────────────────────────────────────────
+    async def start(self):
+        for n in range(self.workers):
+            page = await self.context.new_page()
+            self._tasks.append(asyncio.create_task(self._worker(page), name=f"enricher-{n}"))
+
+    async def close(self, drain_timeout: float | None = None):
+        """Let queued listings finish (up to `drain_timeout` seconds), then stop."""
+        if drain_timeout and self._tasks:
+            if self.queue.qsize():
+                run_log.say(f"  ⏳ Enrichment: waiting up to {drain_timeout:.0f}s for {self.queue.qsize()} queued listings…")
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    # ── Called from the parser ─────────────────────────────────────────────────
+    def submit(self, row: dict) -> bool:
+        """Queue a listing unless it is queued, cached, or has failed too often.
+        Only queued listings are kept in memory."""
+        lid = row["id"]
+        if lid in self._queued:
+            return False
+        self._queued.add(lid)
+        done = self.conn.execute(
+            "SELECT status, attempts FROM listing_details WHERE listing_id = ?", (lid,)).fetchone()
+        if done and (done[0] == "ok" or done[1] >= MAX_ATTEMPTS):
+            self.cached += 1
+            return False
+        self.queue.put_nowait(lid)
+        return True
+
+    def details(self, lid: str) -> dict | None:
+        row = self.conn.execute(
+            "SELECT description, transmission, fuel, owners, photos FROM listing_details "
+            "WHERE listing_id = ? AND status = 'ok'", (lid,)).fetchone()
+        if row is None:
+            return None
+        return {"description": row[0], "transmission": row[1], "fuel": row[2],
+                "owners": row[3], "photos": json.loads(row[4] or "[]")}
+
+    # ── Workers ────────────────────────────────────────────────────────────────
+    async def _worker(self, page):
+        try:
+            while True:
+                lid = await self.queue.get()
+                try:
+                    await self._enrich(page, lid)
+                finally:
+                    # Done: the listing_details row answers for it from now on
+                    self._queued.discard(lid)
+                    self.queue.task_done()
+        finally:
+            await page.close()
+
+    async def _enrich(self, page, lid: str):
+        delay = RETRY_BACKOFF
+        for attempt in range(self.retries + 1):
+            await self.limiter.acquire()
+            try:
+                details = await self._fetch(page, lid)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                details, error = None, e
+            else:
+                error = None
+            if details:
+                self._save(lid, "ok", details)
+                self.enriched += 1
+                if self.on_details:
+                    self.on_details(lid, details)
+                run_log.event("enriched", id=lid, transmission=details.get("transmission"),
+                              fuel=details.get("fuel"), photos=len(details.get("photos") or []))
+                return
+            if attempt < self.retries:
+                await asyncio.sleep(delay)
+                delay *= 2
+        self._save(lid, "failed", {})
+        self.failed += 1
+        run_log.event("enrich_failed", id=lid, error=type(error).__name__ if error else None)
+
+    async def _fetch(self, page, lid: str) -> dict:
+        """Open the item page and collect details from its GraphQL responses."""
+        details: dict = {}
+        complete = asyncio.Event()
+        marker = lid.encode()
+
+        async def on_response(response):
+            if "/api/graphql" not in response.url:
+                return
+            try:
+                body = await response.body()
+            except Exception:
+                return
+            if marker not in body:
+                return
+            for payload in _payloads(body):
+                for column, value in details_from_payload(payload).items():
+                    details.setdefault(column, value)
+            if "description" in details and "photos" in details:
+                complete.set()
+
+        page.on("response", on_response)
+        try:
+            await page.goto(self.item_url.format(lid=lid), wait_until="domcontentloaded", timeout=30_000)
+            try:
+                await asyncio.wait_for(complete.wait(), timeout=DETAIL_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            if "description" not in details:
+                for column, value in details_from_html(await page.content()).items():
+                    details.setdefault(column, value)
+        finally:
+            page.remove_listener("response", on_response)
+        return details
+
+    def _save(self, lid: str, status: str, details: dict):
+        photos = details.get("photos")
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO listing_details (listing_id, fetched_at, status, description,
+                    transmission, fuel, owners, photos)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(listing_id) DO UPDATE SET
+                    fetched_at = excluded.fetched_at, status = excluded.status,
+                    attempts = attempts + 1,
+                    description = excluded.description, transmission = excluded.transmission,
+                    fuel = excluded.fuel, owners = excluded.owners, photos = excluded.photos
+                """,
+                (lid, _now(), status, details.get("description"), details.get("transmission"),
+                 details.get("fuel"), details.get("owners"),
+                 json.dumps(photos) if photos is not None else None),
+            )
+
+    def summary(self) -> str:
+        return (f"{self.enriched} enriched, {self.failed} failed, {self.cached} already cached, "
+                f"{self.queue.qsize()} still queued")
@@ -0,0 +1,222 @@
+"""
+Structured vehicle fields from Marketplace listing text.
+
+`km` arrives as the raw first subtitle ("120 mil km", "120.000 km", "45K km")
+and year / make / model are buried in the title ("Toyota Yaris 2015 1.5
+full"). FieldExtractor turns them into typed columns once, when the row is
+built, so downstream filters and price comparisons never re-parse strings:
+
+    km_num  int | None   odometer in km
+    year    int | None   model year (1960 … next year)
+    make    str         canonical make ("Toyota", "Mercedes-Benz") or ""
+    model   str         canonical model of that make ("Yaris", "CX-5") or ""
+
+Patterns are precompiled and titles are matched against a token index built
+once from VOCABULARY (make aliases and model names, one- and two-token keys),
+so extraction is a dict lookup per title token — tens of thousands of titles
+per second — and repeated titles hit an LRU cache.
+
+    extractor = FieldExtractor()
+    extractor.extract("Toyota Yaris 2015 1.5", "98 mil km")
+    # → {"km_num": 98000, "year": 2015, "make": "Toyota", "model": "Yaris"}
+    extractor.extract_many(rows)            # adds the four columns in place
+"""
+
+import re
+from datetime import date
+from functools import lru_cache
+
+# ─── Vocabulary: make → models (names as they should be stored) ─────────────────
+VOCABULARY: dict[str, list[str]] = {
+    "Toyota": ["Yaris", "Corolla", "Corolla Cross", "Hilux", "RAV4", "Rush", "Fortuner", "4Runner",
+               "Land Cruiser", "Prado", "Auris", "Prius", "C-HR", "Tercel", "Hiace", "Avanza", "Etios"],
+    "Chevrolet": ["Sail", "Spark", "Aveo", "Cruze", "Onix", "Prisma", "Tracker", "Captiva", "Colorado",
+                  "D-Max", "Silverado", "Corsa", "Optra", "Orlando", "Groove", "Spin", "Camaro", "N300"],
+    "Nissan": ["Versa", "Sentra", "March", "Tiida", "Kicks", "Qashqai", "X-Trail", "Navara", "Terrano",
+               "Frontier", "Pathfinder", "Murano", "Note", "V16", "NP300", "Juke"],
+    "Hyundai": ["Accent", "Elantra", "i10", "Grand i10", "i20", "i30", "Tucson", "Santa Fe", "Creta",
+                "Kona", "Venue", "Veloster", "H1", "Porter", "Getz", "Sonata"],
+    "Kia": ["Rio", "Morning", "Picanto", "Cerato", "Soluto", "Sportage", "Sorento", "Seltos", "Sonet",
+            "Soul", "Carnival", "Frontier", "Optima"],
+    "Suzuki": ["Swift", "Baleno", "Celerio", "Alto", "Dzire", "Ciaz", "Vitara", "Grand Vitara",
+               "S-Cross", "Jimny", "Ertiga", "Ignis", "SX4", "APV"],
+    "Mazda": ["Mazda2", "Mazda3", "Mazda6", "CX-3", "CX-30", "CX-5", "CX-9", "BT-50", "MX-5"],
+    "Peugeot": ["208", "2008", "301", "308", "3008", "408", "5008", "Partner", "Expert", "Boxer"],
+    "Ford": ["Fiesta", "Focus", "EcoSport", "Escape", "Explorer", "Ranger", "F-150", "Territory",
+             "Edge", "Mustang", "Transit", "Ka"],
+    "Mitsubishi": ["L200", "Montero", "Outlander", "ASX", "Eclipse Cross", "Lancer", "Mirage", "Katana"],
+    "Volkswagen": ["Gol", "Polo", "Golf", "Jetta", "Voyage", "Vento", "Virtus", "T-Cross", "Tiguan",
+                   "Amarok", "Saveiro", "Passat", "Beetle", "Up"],
+    "Renault": ["Clio", "Symbol", "Logan", "Sandero", "Stepway", "Duster", "Koleos", "Captur",
+                "Oroch", "Kangoo", "Megane", "Fluence", "Kwid", "Alaskan"],
+    "Subaru": ["Impreza", "XV", "Forester", "Outback", "Legacy", "WRX", "Evoltis"],
+    "Honda": ["Civic", "City", "Fit", "Accord", "CR-V", "HR-V", "WR-V", "Pilot"],
+    "Citroën": ["C3", "C4", "C5", "C-Elysée", "Berlingo", "C3 Aircross", "C4 Cactus"],
+    "Fiat": ["Uno", "Palio", "Punto", "Mobi", "Argo", "Cronos", "Strada", "Fiorino", "500", "Toro"],
+    "Jeep": ["Renegade", "Compass", "Cherokee", "Grand Cherokee", "Wrangler", "Gladiator"],
+    "BMW": ["Serie 1", "Serie 3", "Serie 5", "X1", "X3", "X5", "X6"],
+    "Mercedes-Benz": ["Clase A", "Clase C", "Clase E", "GLA", "GLC", "GLE", "Sprinter", "Vito"],
+    "Audi": ["A1", "A3", "A4", "A5", "A6", "Q2", "Q3", "Q5", "Q7"],
+    "Great Wall": ["Wingle", "Poer", "Voleex", "Haval H6"],
+    "Haval": ["H6", "Jolion", "H2"],
+    "Chery": ["Tiggo 2", "Tiggo 3", "Tiggo 4", "Tiggo 7", "Tiggo 8", "IQ", "Arrizo"],
+    "MG": ["MG3", "MG5", "MG6", "ZS", "ZX", "HS", "RX5", "GT"],
+    "JAC": ["S2", "S3", "JS2", "JS3", "JS4", "T6", "T8"],
+    "Changan": ["CS15", "CS35", "CS55", "Alsvin", "Hunter", "CX70"],
+    "Geely": ["Coolray", "Azkarra", "GX3", "Emgrand"],
+    "SsangYong": ["Korando", "Rexton", "Actyon", "Tivoli", "Musso", "Stavic"],
+    "Dodge": ["Journey", "Durango", "Ram", "Caliber", "Neon"],
+    "RAM": ["700", "1000", "1500", "2500"],
+    "Volvo": ["XC40", "XC60", "XC90", "S60", "V40"],
+    "Land Rover": ["Defender", "Discovery", "Range Rover", "Evoque", "Freelander"],
+    "Mini": ["Cooper", "Countryman"],
+    "Maxus": ["T60", "T90", "V80", "Deliver 9"],
+    "DFSK": ["Glory 580", "C31", "C35", "K01"],
+    "BYD": ["F0", "F3", "Song", "Yuan", "Dolphin"],
+    "Opel": ["Corsa", "Astra", "Mokka", "Combo"],
+    "Skoda": ["Fabia", "Octavia", "Rapid", "Kodiaq", "Karoq"],
+    "Seat": ["Ibiza", "Leon", "Arona", "Ateca"],
+    "Lexus": ["NX", "RX", "UX", "IS"],
+    "Porsche": ["Cayenne", "Macan", "911", "Panamera"],
+    "Alfa Romeo": ["Giulietta", "Giulia", "Stelvio", "Mito"],
+    "Chrysler": ["PT Cruiser", "300C", "Town & Country"],
+    "Foton": ["Tunland", "Midi", "Gratour"],
+    "Mahindra": ["Scorpio", "Pik Up", "XUV500"],
+    "Jetour": ["X70", "Dashing"],
+}
+
+# Other spellings of a make (normalized) → VOCABULARY key
+MAKE_ALIASES = {
+    "chevy": "Chevrolet", "vw": "Volkswagen", "volks": "Volkswagen", "mercedes": "Mercedes-Benz",
+    "mb": "Mercedes-Benz", "benz": "Mercedes-Benz", "citroen": "Citroën", "ssang yong": "SsangYong",
+    "greatwall": "Great Wall", "range rover": "Land Rover", "mg motor": "MG", "alfa": "Alfa Romeo",
+}
+
+# Model spellings the automatic variants miss (normalized) → (make, model)
+MODEL_ALIASES = {
+    "rav 4": ("Toyota", "RAV4"), "mazda 3": ("Mazda", "Mazda3"), "mazda 2": ("Mazda", "Mazda2"),
+    "mazda 6": ("Mazda", "Mazda6"), "dmax": ("Chevrolet", "D-Max"), "l 200": ("Mitsubishi", "L200"),
+    "np 300": ("Nissan", "NP300"), "xtrail": ("Nissan", "X-Trail"), "grand i 10": ("Hyundai", "Grand i10"),
+    "i 10": ("Hyundai", "i10"), "new yaris": ("Toyota", "Yaris"), "sportage r": ("Kia", "Sportage"),
+}
+
+MIN_YEAR = 1960
+_YEAR = re.compile(r"(?<![\d.,])(19[6-9]\d|20[0-4]\d)(?![\d.,]|\s*(?:km|kms|cc)\b)")
+_KM = re.compile(r"(\d[\d.,]*)\s*(mil|k)?\s*(?:km|kms|kilometros|kilómetros)\b", re.IGNORECASE)
+_THOUSANDS_SEP = re.compile(r"[.,]")
+_DECIMAL = re.compile(r"(\d+)[.,](\d{1,2})")    # "1.2" / "120,5" before "mil" / "k"
+_TOKEN = re.compile(r"[a-z0-9]+")
+_LETTER = re.compile(r"[a-z]")
+_DIGIT = re.compile(r"\d")
+_ACCENTS = str.maketrans("áéíóúüñàèìòùâêîôûë", "aeiouunaeiouaeioue")
+
+
+def _tokens(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower().translate(_ACCENTS))
+
+
+def parse_km(text: str) -> int | None:
+    """'120.000 km' / '120 mil km' / '45K km' → 120000 / 120000 / 45000;
+    '1.2 mil km' / '120,5 mil km' / '1,5k km' → 1200 / 120500 / 1500.
+    Only numbers followed by a km unit count (the subtitle may be a place).
+    Before "mil" / "k" one or two digits after a separator are a decimal
+    fraction; otherwise separators group thousands."""
+    m = _KM.search(text or "")
+    if not m:
+        return None
+    digits = m.group(1).rstrip(".,")
+    if m.group(2):
+        decimal = _DECIMAL.fullmatch(digits)
+        if decimal:
+            return round(float(f"{decimal.group(1)}.{decimal.group(2)}") * 1000)
+        return int(_THOUSANDS_SEP.sub("", digits) or 0) * 1000
+    return int(_THOUSANDS_SEP.sub("", digits) or 0)
+
+
+def parse_year(text: str, model: str = "") -> int | None:
+    """First plausible model year in the text (not a mileage or displacement).
+    A number that is the model name ("Peugeot 2008 año 2018") is used only
+    when nothing else looks like a year."""
+    latest = date.today().year + 1
+    years = [int(m.group(1)) for m in _YEAR.finditer(text or "")]
+    years = [y for y in years if MIN_YEAR <= y <= latest]
+    preferred = [y for y in years if str(y) != model]
+    return (preferred or years or [None])[0]
+
+
+def _variants(name: str) -> set[str]:
+    """Normalized keys for a name: 'CX-5' → {'cx 5', 'cx5'}, 'Grand Vitara' → {'grand vitara'}."""
+    tokens = _tokens(name)
+    keys = {" ".join(tokens)}
+    if 1 < len(tokens) and len("".join(tokens)) <= 6:
+        keys.add("".join(tokens))
+    return keys
+
+
+class FieldExtractor:
+    """Token-index extractor for km_num / year / make / model."""
+
+    def __init__(self, vocabulary: dict[str, list[str]] = VOCABULARY,
+                 make_aliases: dict[str, str] = MAKE_ALIASES,
+                 model_aliases: dict[str, tuple[str, str]] = MODEL_ALIASES):
+        # key (1–2 normalized tokens) → make
+        self.makes: dict[str, str] = {}
+        # make → key → model, plus key → {(make, model)} for titles without a make
+        self.models: dict[str, dict[str, str]] = {}
+        self.model_owners: dict[str, set[tuple[str, str]]] = {}
+        for make, models in vocabulary.items():
+            for key in _variants(make):
+                self.makes[key] = make
+            for model in models:
+                for key in _variants(model):
+                    self._add_model(key, make, model)
+        for alias, make in make_aliases.items():
+            self.makes[alias] = make
+        for alias, (make, model) in model_aliases.items():
+            self._add_model(alias, make, model)
+        self.extract = lru_cache(maxsize=50_000)(self._extract)
+
+    def _add_model(self, key: str, make: str, model: str):
+        self.models.setdefault(make, {})[key] = model
+        # Without a make in the title, bare numbers ("2008", "1500") and short
+        # words ("city", "rio") are too ambiguous to imply a model
+        if _LETTER.search(key) and (_DIGIT.search(key) or len(key) >= 4):
+            self.model_owners.setdefault(key, set()).add((make, model))
+
+    @staticmethod
+    def _lookup(tokens: list[str], index, start: int = 0) -> tuple[str, int] | None:
+        """Earliest match in `index`, preferring a two-token key → (value, end)."""
+        for i in range(start, len(tokens)):
+            if i + 1 < len(tokens):
+                pair = f"{tokens[i]} {tokens[i + 1]}"
+                if pair in index:
+                    return index[pair], i + 2
+            if tokens[i] in index:
+                return index[tokens[i]], i + 1
+        return None
+
+    def _extract(self, title: str, km_text: str = "") -> dict:
+        tokens = _tokens(title or "")
+        make = model = ""
+        found = self._lookup(tokens, self.makes)
+        if found:
+            make, end = found
+            # Model after the make, else anywhere ("Yaris Toyota 2015")
+            hit = self._lookup(tokens, self.models.get(make, {}), end) or \
+                self._lookup(tokens, self.models.get(make, {}))
+            model = hit[0] if hit else ""
+        else:
+            # No make in the title: accept a model only if one make owns it
+            hit = self._lookup(tokens, self.model_owners)
+            if hit and len(hit[0]) == 1:
+                make, model = next(iter(hit[0]))
+        km_num = parse_km(km_text)
+        if km_num is None:
+            km_num = parse_km(title)
+        return {"km_num": km_num, "year": parse_year(title, model), "make": make, "model": model}
+
+    def extract_many(self, rows: list[dict]) -> list[dict]:
+        """Add km_num / year / make / model to each row (from title and km), in place."""
+        for row in rows:
+            row.update(self.extract(row.get("title") or "", row.get("km") or ""))
+        return rows
@@ -0,0 +1,285 @@
+"""
+Streaming listing sink for the Marketplace scraper.
+
+Every new listing is appended to the output file and flushed the moment it is
+parsed, so a crash, a login checkpoint or a Ctrl-C only ever loses the row
+that was being written. Rows are not kept in memory — only their ids, so the
+scraper can dedup and a resumed run knows where the last one stopped.
+
+Membership ("already written?") is a Bloom filter (seen_filter.py, about
+1.8 bytes per id); only its possible hits need an exact answer. That comes
+from an in-memory id set, or — once confirm_with() hands the sink an exact
+check such as the listing store's "seen in this run" — from that check,
+and the set is dropped (it keeps only ids the check doesn't know).
+
+Only an interrupted run is resumed: a run that finished cleanly calls
+mark_complete(), and the next run starts a fresh stream (as the scraper always
+did), so listings are re-observed on every scheduled re-scrape.
+
+Format follows the file suffix: `.ndjson` / `.jsonl` → one JSON object per
+line, anything else → CSV. The qualified file is a filtered view of the same
+stream (rebuilt from it on resume, appended to as qualifying rows arrive);
+reposts — rows whose canonical_id points at another listing — stay out of it.
+
+A CSV whose header differs from FIELDNAMES (written before columns were
+added) is left untouched: the stream goes to `<stem>.<schema tag><suffix>`
+next to it instead, where the tag is derived from the column list — so each
+layout gets its own file and later runs resume the right one.
+"""
+
+import csv
+import json
+import os
+import zlib
+from pathlib import Path
+
+from seen_filter import SeenFilter
+
+FIELDNAMES = [
+    "id", "title", "price", "price_clp", "city", "region", "commune", "km",
+    "km_num", "year", "make", "model", "seller", "url", "v_region", "qualifies", "canonical_id",
+    "market_price", "deal_score",
+]
+
+NDJSON_SUFFIXES = {".ndjson", ".jsonl"}
+FILTER_CAPACITY = 1_000_000  # ids per run before the filter's hit rate (and exact checks) climbs
+FILTER_ERROR_RATE = 0.001
+
+
+def _is_ndjson(path: Path) -> bool:
+    return path.suffix.lower() in NDJSON_SUFFIXES
+
+
+def _truthy(value) -> bool:
+    """CSV round-trips booleans as 'True'/'False' — accept both forms."""
+    if isinstance(value, str):
+        return value.strip().lower() in {"true", "1", "yes"}
+    return bool(value)
+
+
+def _is_lead(row: dict) -> bool:
+    """Qualifying and not a repost of an earlier listing."""
+    canonical = row.get("canonical_id")
+    return _truthy(row.get("qualifies")) and (not canonical or str(canonical) == str(row.get("id")))
+
+
+def schema_tag(fieldnames: list[str]) -> str:
+    """Short, stable tag for a column layout."""
+    return f"{zlib.crc32(','.join(fieldnames).encode()):08x}"
+
+
+def _truncate_partial_tail(path: Path) -> bool:
+    """Drop a half-written last record (no trailing newline) left by a crash."""
+    size = path.stat().st_size
+    if size == 0:
+        return False
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) == b"\n":
+            return False
+        # Walk back in chunks until the previous newline
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            nl = chunk.rfind(b"\n")
+            if nl != -1:
+                f.truncate(pos + nl + 1)
+                return True
+        f.truncate(0)
+        return True
+
+
+class ListingSink:
+    """Append-only, crash-safe writer for scraped listings.
+
+    Usage:
+        sink = ListingSink(all_path, qualified_path, resume=True)
+        sink.open()
+        if lid not in sink:
+            sink.write(row)
+        sink.close()
+    """
+
+    def __init__(self, path: Path, qualified_path: Path, *, resume: bool = True,
+                 fieldnames: list[str] = FIELDNAMES, fsync: bool = False):
+        self.path = Path(path)
+        self.qualified_path = Path(qualified_path)
+        self.resume = resume
+        self.fieldnames = fieldnames
+        self.fsync = fsync
+        self.ndjson = _is_ndjson(self.path)
+        self.complete_marker = self.path.with_name(self.path.name + ".complete")
+
+        self.ids = SeenFilter(FILTER_CAPACITY, FILTER_ERROR_RATE)   # every id written or resumed
+        self.exact_ids: set[str] = set()   # exact answer for filter hits (until confirm_with)
+        self.exact = None                  # lid → bool, asked on filter hits instead of exact_ids
+        self.total = 0
+        self.qualifying = 0
+        self.resumed_total = 0
+
+        self._f = None
+        self._qf = None
+        self._writer = None
+        self._qwriter = None
+
+    # ── Lifecycle ──────────────────────────────────────────────────────────────
+    def open(self):
+        self._avoid_foreign_schema()
+        if self.complete_marker.exists():
+            # Previous run finished cleanly — nothing to resume
+            self.complete_marker.unlink()
+            mode = "w"
+        elif self.path.exists() and self.resume and self._schema_matches():
+            _truncate_partial_tail(self.path)
+            self._load_existing()
+            self.resumed_total = self.total
+            self._rebuild_qualified()
+            mode = "a"
+        else:
+            mode = "w"
+
+        self._f = open(self.path, mode, newline="", encoding="utf-8")
+        self._qf = open(self.qualified_path, mode, newline="", encoding="utf-8")
+        if not self.ndjson:
+            self._writer = csv.DictWriter(self._f, fieldnames=self.fieldnames, extrasaction="ignore")
+            self._qwriter = csv.DictWriter(self._qf, fieldnames=self.fieldnames, extrasaction="ignore")
+            if mode == "w":
+                self._writer.writeheader()
+                self._qwriter.writeheader()
+                self._flush(self._f)
+                self._flush(self._qf)
+        return self
+
+    def _avoid_foreign_schema(self):
+        """Leave a CSV with another column layout alone — it may be a tracked
+        baseline — and stream to a schema-tagged file next to it instead."""
+        if not self._has_foreign_schema():
+            return
+        original = self.path
+        tag = schema_tag(self.fieldnames)
+        self.path = original.with_name(f"{original.stem}.{tag}{original.suffix}")
+        self.qualified_path = self.qualified_path.with_name(
+            f"{self.qualified_path.stem}.{tag}{self.qualified_path.suffix}")
+        self.complete_marker = self.path.with_name(self.path.name + ".complete")
+        print(f"  ℹ️  {original.name} has a different schema — left as is, writing {self.path.name}")
+
+    def confirm_with(self, check):
+        """Answer filter hits with `check(lid)` from now on and drop the exact
+        id set — keeping only the ids written so far that `check` doesn't know."""
+        self.exact_ids = {lid for lid in self.exact_ids if not check(lid)}
+        self.exact = check
+
+    def mark_complete(self):
+        """Record that this run finished cleanly, so the next one starts fresh."""
+        self.complete_marker.touch()
+
+    def close(self):
+        for f in (self._f, self._qf):
+            if f and not f.closed:
+                self._flush(f)
+                f.close()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ── Writing ────────────────────────────────────────────────────────────────
+    def __contains__(self, lid: str) -> bool:
+        if lid not in self.ids:
+            return False          # definitely never written
+        return lid in self.exact_ids or (self.exact is not None and self.exact(lid))
+
+    def __len__(self) -> int:
+        return self.total
+
+    def write(self, row: dict):
+        """Append one listing to the stream (and to the qualified view) and flush."""
+        self._write_line(self._f, self._writer, row)
+        self._remember(str(row["id"]))
+        self.total += 1
+        if _is_lead(row):
+            self._write_line(self._qf, self._qwriter, row)
+            self.qualifying += 1
+
+    def _remember(self, lid: str):
+        self.ids.add(lid)
+        if self.exact is None:
+            self.exact_ids.add(lid)
+
+    def _write_line(self, f, writer, row: dict):
+        if self.ndjson:
+            f.write(json.dumps({k: row.get(k) for k in self.fieldnames}, ensure_ascii=False) + "\n")
+        else:
+            writer.writerow(row)
+        self._flush(f)
+
+    def _flush(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    # ── Resume ─────────────────────────────────────────────────────────────────
+    def iter_rows(self, path: Path | None = None):
+        """Stream rows back from disk one at a time (never loads the whole file)."""
+        path = Path(path or self.path)
+        with open(path, newline="", encoding="utf-8") as f:
+            if self.ndjson:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+            else:
+                yield from csv.DictReader(f)
+
+    def _read_header(self) -> list[str]:
+        with open(self.path, newline="", encoding="utf-8") as f:
+            return next(csv.reader(f), [])
+
+    def _has_foreign_schema(self) -> bool:
+        """A non-empty CSV at `path` whose header isn't ours."""
+        if self.ndjson or not self.path.exists() or self.path.stat().st_size == 0:
+            return False
+        return self._read_header() != self.fieldnames
+
+    def _schema_matches(self) -> bool:
+        if self.path.stat().st_size == 0:
+            return False
+        if self.ndjson:
+            return True
+        return self._read_header() == self.fieldnames
+
+    def _load_existing(self):
+        for row in self.iter_rows():
+            lid = str(row.get("id") or "")
+            if not lid or lid in self:
+                continue
+            self._remember(lid)
+            self.total += 1
+            if _is_lead(row):
+                self.qualifying += 1
+
+    def _rebuild_qualified(self):
+        """Regenerate the qualified file from the main stream (it may be stale after a crash)."""
+        tmp = self.qualified_path.with_name(self.qualified_path.name + ".tmp")
+        with open(tmp, "w", newline="", encoding="utf-8") as out:
+            writer = None
+            if not self.ndjson:
+                writer = csv.DictWriter(out, fieldnames=self.fieldnames, extrasaction="ignore")
+                writer.writeheader()
+            for row in self.iter_rows():
+                if not _is_lead(row):
+                    continue
+                if self.ndjson:
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                else:
+                    writer.writerow(row)
+        os.replace(tmp, self.qualified_path)
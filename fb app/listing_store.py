@@ -0,0 +1,331 @@
+"""
+Persistent SQLite listing store for the Marketplace scraper.
+
+One row per listing id, kept across runs, so dedup no longer starts cold and
+"what is new since the last run?" is an indexed lookup instead of a manual
+CSV diff. The database runs in WAL mode so readers (dashboards, ad-hoc
+sqlite3 sessions) never block the scraper while it writes.
+
+    store = ListingStore(DB_FILE)
+    run_id = store.start_run()
+    new_ids = store.upsert_many(rows)      # one transaction per GraphQL page
+    store.finish_run(run_id, seen=…, new=…, stop_reason=…)
+    store.new_since_last_run(qualifying_only=True)
+    store.price_drops(min_pct=10, run_id=run_id)
+
+Change detection: every upsert compares the incoming price_clp / title / km
+with the stored state of the same id and writes one compact listing_history
+row per changed listing (old → new values and the price drop in percent), so
+"price dropped ≥ X%" is a single indexed query.
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id          TEXT PRIMARY KEY,
+    title       TEXT,
+    price       TEXT,
+    price_clp   INTEGER,
+    city        TEXT,
+    region      TEXT,
+    commune     TEXT,
+    km          TEXT,
+    km_num      INTEGER,
+    year        INTEGER,
+    make        TEXT,
+    model       TEXT,
+    seller      TEXT,
+    url         TEXT,
+    v_region    INTEGER,
+    qualifies   INTEGER,
+    canonical_id TEXT,
+    market_price INTEGER,
+    deal_score  REAL,
+    first_seen  TEXT NOT NULL,
+    last_seen   TEXT NOT NULL,
+    first_run   INTEGER,
+    last_run    INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_listings_price_clp ON listings(price_clp);
+CREATE INDEX IF NOT EXISTS idx_listings_city      ON listings(city);
+CREATE INDEX IF NOT EXISTS idx_listings_v_region  ON listings(v_region);
+CREATE INDEX IF NOT EXISTS idx_listings_region    ON listings(region);
+CREATE INDEX IF NOT EXISTS idx_listings_first_run ON listings(first_run, qualifies);
+
+CREATE TABLE IF NOT EXISTS listing_history (
+    listing_id     TEXT NOT NULL,
+    run_id         INTEGER,
+    observed_at    TEXT NOT NULL,
+    old_price_clp  INTEGER,
+    new_price_clp  INTEGER,
+    price_drop_pct REAL,          -- > 0 dropped, < 0 raised, NULL unchanged
+    old_title      TEXT,
+    new_title      TEXT,
+    old_km         TEXT,
+    new_km         TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_drop    ON listing_history(price_drop_pct, observed_at);
+CREATE INDEX IF NOT EXISTS idx_history_run     ON listing_history(run_id, price_drop_pct);
+CREATE INDEX IF NOT EXISTS idx_history_listing ON listing_history(listing_id, observed_at);
+
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at  TEXT NOT NULL,
+    finished_at TEXT,
+    seen        INTEGER DEFAULT 0,
+    new         INTEGER DEFAULT 0,
+    stop_reason TEXT
+);
+"""
+
+# Fields whose changes between sightings are recorded in listing_history
+TRACKED_FIELDS = ("price_clp", "title", "km")
+
+# Columns copied from the scraper row on every sighting → SQLite type
+ROW_COLUMNS = {
+    "id": "TEXT", "title": "TEXT", "price": "TEXT", "price_clp": "INTEGER",
+    "city": "TEXT", "region": "TEXT", "commune": "TEXT", "km": "TEXT",
+    "km_num": "INTEGER", "year": "INTEGER", "make": "TEXT", "model": "TEXT",
+    "seller": "TEXT", "url": "TEXT", "v_region": "INTEGER", "qualifies": "INTEGER",
+    "canonical_id": "TEXT", "market_price": "INTEGER", "deal_score": "REAL",
+}
+
+# Columns a re-sighting refreshes without rebuilding the whole row (refresh_many)
+REFRESH_COLUMNS = ("title", "price", "price_clp", "km", "km_num")
+
+_REFRESH_SQL = f"""
+UPDATE listings SET {", ".join(f"{c} = :{c}" for c in REFRESH_COLUMNS)},
+    last_seen = :now, last_run = :run
+WHERE id = :id
+"""
+
+_UPSERT_SQL = f"""
+INSERT INTO listings ({", ".join(ROW_COLUMNS)}, first_seen, last_seen, first_run, last_run)
+VALUES ({", ".join(":" + c for c in ROW_COLUMNS)}, :now, :now, :run, :run)
+ON CONFLICT(id) DO UPDATE SET
+    {", ".join(f"{c} = excluded.{c}" for c in ROW_COLUMNS if c != "id")},
+    last_seen = excluded.last_seen, last_run = excluded.last_run
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _change(old: tuple, row: dict) -> dict | None:
+    """History values for one listing, or None if no tracked field changed."""
+    old_price, old_title, old_km = old
+    new_price, new_title, new_km = (row.get(f) for f in TRACKED_FIELDS)
+    price_changed = bool(old_price and new_price and old_price != new_price)
+    title_changed = bool(old_title and new_title and old_title != new_title)
+    km_changed = bool(old_km and new_km and old_km != new_km)
+    if not (price_changed or title_changed or km_changed):
+        return None
+    drop_pct = round((old_price - new_price) / old_price * 100, 2) if price_changed else None
+    return {"id": row["id"], "values": (
+        old_price if price_changed else None, new_price if price_changed else None, drop_pct,
+        old_title if title_changed else None, new_title if title_changed else None,
+        old_km if km_changed else None, new_km if km_changed else None,
+    )}
+
+
+class ListingStore:
+    """Embedded listing database keyed by Marketplace listing id."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self.run_id: int | None = None
+        self.run_open = False     # started and not finished yet
+        self.changed = 0          # listings with a recorded change in this run
+        self.price_drops_seen = 0
+
+    def close(self):
+        self.conn.close()
+
+    def _migrate(self):
+        """Add columns introduced after a database was created."""
+        wanted = {"listings": ROW_COLUMNS, "runs": {"stop_reason": "TEXT"}}
+        with self.conn:
+            for table, columns in wanted.items():
+                have = {r["name"] for r in self.conn.execute(f"PRAGMA table_info({table})")}
+                for col, sql_type in columns.items():
+                    if col not in have:
+                        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {sql_type}")
+            # Indexes on migrated columns can only be created once they exist
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_listings_vehicle ON listings(make, model, year)")
+
+    # ── Runs ───────────────────────────────────────────────────────────────────
+    def start_run(self) -> int:
+        with self.conn:
+            cur = self.conn.execute("INSERT INTO runs (started_at) VALUES (?)", (_now(),))
+        self.run_id = cur.lastrowid
+        self.run_open = True
+        self.changed = self.price_drops_seen = 0
+        return self.run_id
+
+    def finish_run(self, run_id: int | None = None, *, seen: int = 0, new: int = 0,
+                   stop_reason: str | None = None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ?, seen = ?, new = ?, stop_reason = ? WHERE run_id = ?",
+                (_now(), seen, new, stop_reason, run_id or self.run_id),
+            )
+        if run_id in (None, self.run_id):
+            self.run_open = False
+
+    def last_run_id(self) -> int | None:
+        row = self.conn.execute("SELECT MAX(run_id) FROM runs").fetchone()
+        return row[0]
+
+    # ── Writes ─────────────────────────────────────────────────────────────────
+    def upsert_many(self, rows: list[dict]) -> set[str]:
+        """Insert or refresh a batch of listings in one transaction.
+
+        New ids get first_seen/first_run stamped; known ids have their fields
+        and last_seen/last_run refreshed, and any change in TRACKED_FIELDS is
+        written to listing_history. Returns the ids that were not in the store
+        before this batch.
+        """
+        if not rows:
+            return set()
+        ids = [r["id"] for r in rows]
+        now = _now()
+        with self.conn:
+            previous = self._current_state(ids)
+            self._record_history(rows, previous, now)
+            self.conn.executemany(_UPSERT_SQL, [
+                {**{c: r.get(c) for c in ROW_COLUMNS}, "now": now, "run": self.run_id} for r in rows
+            ])
+        return set(ids) - previous.keys()
+
+    def refresh_many(self, rows: list[dict]) -> int:
+        """Cheap update for re-sightings of listings already in the store.
+
+        Changes in TRACKED_FIELDS go to listing_history as in upsert_many, but
+        only REFRESH_COLUMNS and last_seen/last_run are written — the stored
+        canonical_id, deal score and the rest are kept. Rows not in the store
+        are ignored. Returns how many listings changed.
+        """
+        if not rows:
+            return 0
+        now = _now()
+        with self.conn:
+            previous = self._current_state([r["id"] for r in rows])
+            rows = [r for r in rows if r["id"] in previous]
+            history = self._record_history(rows, previous, now)
+            self.conn.executemany(_REFRESH_SQL, [
+                {**{c: r.get(c) for c in REFRESH_COLUMNS}, "id": r["id"], "now": now, "run": self.run_id}
+                for r in rows
+            ])
+        return len(history)
+
+    def _record_history(self, rows: list[dict], previous: dict[str, tuple], now: str) -> list[dict]:
+        """Write a listing_history row for every known listing whose tracked fields changed."""
+        history = [h for r in rows if r["id"] in previous
+                   for h in [_change(previous[r["id"]], r)] if h]
+        if history:
+            self.conn.executemany(
+                """
+                INSERT INTO listing_history (listing_id, run_id, observed_at,
+                    old_price_clp, new_price_clp, price_drop_pct,
+                    old_title, new_title, old_km, new_km)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(h["id"], self.run_id, now, *h["values"]) for h in history],
+            )
+            self.changed += len(history)
+            self.price_drops_seen += sum(1 for h in history if (h["values"][2] or 0) > 0)
+        return history
+
+    def _current_state(self, ids: list[str]) -> dict[str, tuple]:
+        """id → (price_clp, title, km) for the ids already in the store."""
+        state: dict[str, tuple] = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for r in self.conn.execute(
+                    f"SELECT id, {', '.join(TRACKED_FIELDS)} FROM listings WHERE id IN ({marks})", chunk):
+                state[r[0]] = tuple(r[1:])
+        return state
+
+    # ── Queries ────────────────────────────────────────────────────────────────
+    def __contains__(self, lid: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM listings WHERE id = ?", (lid,)).fetchone() is not None
+
+    def ids(self):
+        """Every stored listing id (streamed)."""
+        return (row[0] for row in self.conn.execute("SELECT id FROM listings"))
+
+    def price_rows(self):
+        """make / model / year / km_num / price_clp of every stored listing that
+        isn't a repost, oldest first (streamed) — rebuilds the price index."""
+        return (dict(row) for row in self.conn.execute(
+            "SELECT make, model, year, km_num, price_clp FROM listings "
+            "WHERE make IS NOT NULL AND (canonical_id IS NULL OR canonical_id = id) ORDER BY first_seen"))
+
+    def in_run(self, lid: str) -> bool:
+        """Was `lid` stored or refreshed by the current run? (ListingSink's exact check)"""
+        return self.conn.execute("SELECT 1 FROM listings WHERE id = ? AND last_run = ?",
+                                 (lid, self.run_id)).fetchone() is not None
+
+    def mark_in_run(self, ids):
+        """Count listings as observed by the current run without touching their
+        fields — the rows a resumed run already has in its output."""
+        ids = list(ids)
+        with self.conn:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                self.conn.execute(f"UPDATE listings SET last_run = ? WHERE id IN ({','.join('?' * len(chunk))})",
+                                  [self.run_id, *chunk])
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def new_in_run(self, run_id: int, *, qualifying_only: bool = False) -> list[sqlite3.Row]:
+        """Listings first seen during `run_id` (uses idx_listings_first_run)."""
+        sql = "SELECT * FROM listings WHERE first_run = ?"
+        if qualifying_only:
+            # Reposts of an earlier listing are not new leads
+            sql += " AND qualifies = 1 AND (canonical_id IS NULL OR canonical_id = id)"
+        return self.conn.execute(sql, (run_id,)).fetchall()
+
+    def price_drops(self, min_pct: float, *, run_id: int | None = None, since: str | None = None,
+                    qualifying_only: bool = False) -> list[sqlite3.Row]:
+        """Price drops of at least `min_pct` percent, biggest first — the hottest
+        leads. Filter by the run that observed them or an ISO `since` timestamp."""
+        sql = """
+            SELECT h.listing_id AS id, h.observed_at, h.old_price_clp, h.new_price_clp,
+                   h.price_drop_pct, l.title, l.price, l.city, l.km, l.seller, l.url, l.qualifies
+            FROM listing_history h JOIN listings l ON l.id = h.listing_id
+            WHERE h.price_drop_pct >= ?
+        """
+        params: list = [min_pct]
+        if run_id is not None:
+            sql += " AND h.run_id = ?"
+            params.append(run_id)
+        if since is not None:
+            sql += " AND h.observed_at >= ?"
+            params.append(since)
+        if qualifying_only:
+            sql += " AND l.qualifies = 1"
+        sql += " ORDER BY h.price_drop_pct DESC"
+        return self.conn.execute(sql, params).fetchall()
+
+    def history(self, lid: str) -> list[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT * FROM listing_history WHERE listing_id = ? ORDER BY observed_at", (lid,)).fetchall()
+
+    def new_since_last_run(self, *, qualifying_only: bool = False) -> list[sqlite3.Row]:
+        """Listings first seen in the most recent run."""
+        run_id = self.last_run_id()
+        return self.new_in_run(run_id, qualifying_only=qualifying_only) if run_id else []
@@ -0,0 +1,393 @@
+"""
+Local stand-in for Facebook Marketplace, for end-to-end scraper load tests
+(no network, no account, no Facebook).
+
+Serves, on 127.0.0.1:
+
+  /marketplace/{location}/search/?minPrice=…   an infinite-scroll page: its
+        script POSTs /api/graphql (form-encoded doc_id / variables / friendly
+        name, like the real feed) whenever the window nears the bottom and
+        appends one card per listing, so the DOM grows as it does on FB
+  /api/graphql    marketplace_search feed pages in the confirmed shape
+        data.marketplace_search.feed_units.edges[].node.listing, with
+        page_info.end_cursor / has_next_page (cursor mode works too), and the
+        item-page details query used by listing_enricher.py
+  /marketplace/item/{id}/   item page that fetches its details over GraphQL
+  /photos/{id}-{n}.gif      small, distinct images for photo_downloader.py
+  /stats                    JSON counters (requests, edges served, errors)
+
+Every knob is a flag: catalogue size, page size, response latency (+ jitter),
+the share of edges that repeat earlier listings, and injected HTTP errors.
+Listings are generated deterministically from (seed, index), so a repeat has
+the same content and two runs see the same catalogue. --new-per-minute keeps
+"posting" listings while the server runs; searches with
+sortBy=creation_time_descend get the newest first (for scrape_daemon.py).
+
+Point the scraper at it with FB_HOME (login and the session cache are skipped
+when FB_HOME is not facebook.com); raise TARGET_LEADS / MAX_SCROLLS in
+scrape_marketplace.py to run through the whole catalogue:
+
+    python mock_marketplace_server.py --listings 20000 --latency 0.3 --dup-rate 0.2 --error-rate 0.02
+    FB_HOME=http://127.0.0.1:8765 python scrape_marketplace.py
+"""
+
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+HOST = "127.0.0.1"
+PORT = 8765
+LISTINGS = 10_000            # catalogue size (before price filtering)
+PAGE_SIZE = 24               # edges per feed response (what FB returns per request)
+LATENCY = 0.25               # seconds before each GraphQL response …
+JITTER = 0.15                # … plus up to this much, uniformly
+DUP_RATE = 0.15              # share of edges that repeat an earlier listing of the same feed
+ERROR_RATE = 0.0             # share of GraphQL requests answered with ERROR_STATUS
+ERROR_STATUS = 500           # e.g. 429 to look like throttling
+NEW_PER_MINUTE = 0.0         # listings added to the catalogue per minute while serving
+SEED = 7
+
+FEED_QUERY = "MarketplaceSearchFeedPaginationQuery"
+FEED_DOC_ID = "7111939778879383"
+DETAIL_QUERY = "MarketplacePDPContainerQuery"
+DETAIL_DOC_ID = "6909186805789163"
+FIRST_ID = 10**15
+
+CITIES = ["Viña del Mar", "Valparaíso", "Quilpué", "Villa Alemana", "Concón", "Quillota",
+          "Santiago", "Providencia", "Concepción", "Rancagua", "Talca", "La Serena"]
+VEHICLES = [("Toyota", "Hilux"), ("Toyota", "RAV4"), ("Suzuki", "Swift"), ("Kia", "Morning"),
+            ("Hyundai", "Tucson"), ("Chevrolet", "Sail"), ("Nissan", "Versa"), ("Mazda", "CX-5"),
+            ("Mitsubishi", "L200"), ("Peugeot", "208"), ("Ford", "Ranger"), ("Honda", "CR-V")]
+TRANSMISSIONS = ["MANUAL", "AUTOMATIC"]
+FUELS = ["GASOLINE", "DIESEL", "HYBRID"]
+PHOTOS_PER_LISTING = 4
+# 1×1 GIF; a per-listing trailer after the GIF terminator makes each image distinct
+_GIF = bytes.fromhex("47494638396101000100800000000000ffffff21f90401000000002c00000000010001000002024401003b")
+
+
+# ─── Catalogue ──────────────────────────────────────────────────────────────────
+class Catalogue:
+    """Deterministic listings: index → listing node, same content every time."""
+
+    def __init__(self, size: int = LISTINGS, seed: int = SEED, base_url: str = "",
+                 new_per_minute: float = NEW_PER_MINUTE):
+        self.initial_size = size
+        self.seed = seed
+        self.base_url = base_url
+        self.new_per_minute = new_per_minute
+        self.started = time.monotonic()
+
+    @property
+    def size(self) -> int:
+        return self.initial_size + int((time.monotonic() - self.started) / 60 * self.new_per_minute)
+
+    def _rng(self, index: int) -> random.Random:
+        return random.Random(self.seed * 1_000_003 + index)
+
+    def price(self, index: int) -> int:
+        return self._rng(index).randrange(1_500_000, 35_000_000, 10_000)
+
+    def listing(self, index: int) -> dict:
+        rng = self._rng(index)
+        price = rng.randrange(1_500_000, 35_000_000, 10_000)    # == self.price(index)
+        make, model = rng.choice(VEHICLES)
+        lid = str(FIRST_ID + index)
+        return {
+            "id": lid,
+            "marketplace_listing_title": f"{make} {model} {rng.randrange(2005, 2025)}",
+            "listing_price": {"amount": str(price), "formatted_amount": f"${price:,}".replace(",", ".")},
+            "location": {"reverse_geocode": {"city": rng.choice(CITIES)}},
+            "custom_sub_titles_with_rendering_flags": [
+                {"subtitle": f"{rng.randrange(5, 250)}.{rng.randrange(0, 1000):03d} km"}],
+            "marketplace_listing_seller": {"name": f"Vendedor {rng.randrange(1, self.initial_size // 3 + 2)}"},
+            "primary_listing_photo": {"image": {"uri": self.photo_url(lid, 0)}},
+            "is_sold": False,
+        }
+
+    def details(self, lid: str) -> dict:
+        rng = self._rng(int(lid) - FIRST_ID)
+        return {
+            "id": lid,
+            "redacted_description": {"text": f"Vendo auto en buen estado, mantenciones al día. Ref {lid}."},
+            "vehicle_transmission_type": rng.choice(TRANSMISSIONS),
+            "vehicle_fuel_type": rng.choice(FUELS),
+            "vehicle_number_of_owners": str(rng.randrange(1, 4)),
+            "listing_photos": [{"image": {"uri": self.photo_url(lid, n)}} for n in range(PHOTOS_PER_LISTING)],
+        }
+
+    def photo_url(self, lid: str, n: int) -> str:
+        # The query string mimics FB's expiring CDN signature
+        return f"{self.base_url}/photos/{lid}-{n}.gif?oh={random.Random(lid).getrandbits(32):08x}"
+
+    def feed_page(self, offset: int, variables: dict, page_size: int, dup_rate: float,
+                  size: int) -> tuple[list, int]:
+        """(listing nodes, next offset) of the feed page starting at feed position
+        `offset`. Newest-first feeds count positions down from the newest listing
+        (`size` is pinned by the cursor, so later posts don't shift pages).
+        At most `page_size` repeats are drawn per page, so any dup_rate — or a
+        band that rejects every repeat — still makes progress."""
+        lo = variables.get("price_lower_bound") or 0
+        hi = variables.get("price_upper_bound") or float("inf")
+        newest_first = variables.get("sort") == "creation_time_descend"
+        at = (lambda pos: size - 1 - pos) if newest_first else (lambda pos: pos)
+        rng = random.Random(f"{self.seed}:{offset}:{lo}:{hi}:{size}")
+        nodes, pos, repeats = [], offset, 0
+        while len(nodes) < page_size and pos < size:
+            if offset and repeats < page_size and rng.random() < dup_rate:
+                repeats += 1
+                repeat = at(rng.randrange(0, offset))
+                if lo <= self.price(repeat) <= hi:
+                    nodes.append(self.listing(repeat))
+                continue
+            if lo <= self.price(at(pos)) <= hi:
+                nodes.append(self.listing(at(pos)))
+            pos += 1
+        return nodes, pos
+
+
+def encode_cursor(offset: int, size: int) -> str:
+    return base64.urlsafe_b64encode(f"mock:{offset}:{size}".encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> tuple[int, int | None]:
+    """(feed position, catalogue size when the feed was first requested)."""
+    if not cursor:
+        return 0, None
+    try:
+        _, offset, size = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return int(offset), int(size)
+    except ValueError:
+        return 0, None
+
+
+# ─── Pages ──────────────────────────────────────────────────────────────────────
+SEARCH_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Marketplace (mock)</title>
+<style>.card{height:280px;border-bottom:1px solid #ddd;font:14px sans-serif;padding:8px}</style></head>
+<body><div id="feed"></div>
+<script>
+const qs = new URLSearchParams(location.search);
+const filters = {};
+if (qs.get("minPrice")) filters.price_lower_bound = Number(qs.get("minPrice"));
+if (qs.get("maxPrice")) filters.price_upper_bound = Number(qs.get("maxPrice"));
+if (qs.get("sortBy")) filters.sort = qs.get("sortBy");
+let cursor = null, hasNext = true, loading = false;
+async function loadMore() {
+  if (loading || !hasNext) return;
+  loading = true;
+  const variables = {count: 24, cursor: cursor, query: qs.get("query") || "", ...filters};
+  const body = new URLSearchParams({fb_api_req_friendly_name: "%(feed_query)s", doc_id: "%(feed_doc_id)s",
+                                    variables: JSON.stringify(variables)});
+  try {
+    const r = await fetch("/api/graphql/", {method: "POST", body: body,
+                                            headers: {"x-fb-friendly-name": "%(feed_query)s"}});
+    if (r.ok) {
+      const data = JSON.parse((await r.text()).replace(/^for \\(;;\\);/, ""));
+      const units = data.data.marketplace_search.feed_units;
+      const feed = document.getElementById("feed");
+      for (const e of units.edges) {
+        const l = e.node.listing, div = document.createElement("div");
+        div.className = "card";
+        div.textContent = `${l.marketplace_listing_title} — ${l.listing_price.formatted_amount} — ${l.location.reverse_geocode.city}`;
+        feed.appendChild(div);
+      }
+      cursor = units.page_info.end_cursor;
+      hasNext = units.page_info.has_next_page;
+    }
+  } finally {
+    loading = false;
+  }
+}
+window.addEventListener("scroll", () => {
+  if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 1500) loadMore();
+});
+loadMore();
+</script></body></html>
+"""
+
+ITEM_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Item %(lid)s (mock)</title></head><body>
+<script>
+fetch("/api/graphql/", {method: "POST", headers: {"x-fb-friendly-name": "%(detail_query)s"},
+  body: new URLSearchParams({fb_api_req_friendly_name: "%(detail_query)s", doc_id: "%(detail_doc_id)s",
+                             variables: JSON.stringify({targetId: "%(lid)s"})})});
+</script></body></html>
+"""
+
+
+# ─── Server ─────────────────────────────────────────────────────────────────────
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.feed_requests = 0
+        self.detail_requests = 0
+        self.edges = 0
+        self.errors = 0
+        self.photos = 0
+        self.started = time.monotonic()
+
+    def add(self, **counts):
+        with self.lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {"feed_requests": self.feed_requests, "detail_requests": self.detail_requests,
+                    "edges": self.edges, "errors": self.errors, "photos": self.photos,
+                    "uptime_s": round(time.monotonic() - self.started, 1)}
+
+
+class MockMarketplaceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = HOST, port: int = PORT, *, listings: int = LISTINGS,
+                 page_size: int = PAGE_SIZE, latency: float = LATENCY, jitter: float = JITTER,
+                 dup_rate: float = DUP_RATE, error_rate: float = ERROR_RATE,
+                 error_status: int = ERROR_STATUS, new_per_minute: float = NEW_PER_MINUTE, seed: int = SEED):
+        super().__init__((host, port), _Handler)
+        self.catalogue = Catalogue(listings, seed, base_url=self.base_url, new_per_minute=new_per_minute)
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.dup_rate = dup_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stats = MockStats()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def random(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    def start_in_thread(self) -> threading.Thread:
+        """Serve in a daemon thread (for scripted load tests); stop with shutdown()."""
+        thread = threading.Thread(target=self.serve_forever, name="mock-marketplace", daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockMarketplaceServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass      # one line per request would dominate a load test
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, payload, *, xssi: bool = False):
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._send(200, (b"for (;;);" if xssi else b"") + body, "application/json; charset=utf-8")
+
+    # ── GET ────────────────────────────────────────────────────────────────────
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        parts = [p for p in path.split("/") if p]
+        if path == "/stats":
+            self._send_json(self.server.stats.as_dict())
+        elif parts[:1] == ["marketplace"] and "search" in parts:
+            page = SEARCH_PAGE % {"feed_query": FEED_QUERY, "feed_doc_id": FEED_DOC_ID}
+            self._send(200, page.encode("utf-8"), "text/html; charset=utf-8")
+        elif parts[:2] == ["marketplace", "item"] and len(parts) >= 3 and parts[2].isdigit():
+            page = ITEM_PAGE % {"lid": parts[2], "detail_query": DETAIL_QUERY, "detail_doc_id": DETAIL_DOC_ID}
+            self._send(200, page.encode("utf-8"), "text/html; charset=utf-8")
+        elif parts[:1] == ["photos"] and len(parts) == 2:
+            self.server.stats.add(photos=1)
+            self._send(200, _GIF + parts[1].encode(), "image/gif")
+        elif not parts:
+            self._send(200, b"<!DOCTYPE html><html><body>Mock Marketplace</body></html>", "text/html")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    # ── POST /api/graphql ──────────────────────────────────────────────────────
+    def do_POST(self):
+        if not urlsplit(self.path).path.rstrip("/").endswith("/api/graphql"):
+            self._send(404, b"not found", "text/plain")
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        form = dict(parse_qsl(self.rfile.read(length).decode("utf-8"), keep_blank_values=True))
+        try:
+            variables = json.loads(form.get("variables") or "{}")
+        except json.JSONDecodeError:
+            variables = {}
+        srv = self.server
+        time.sleep(srv.latency + srv.jitter * srv.random())
+        if srv.error_rate and srv.random() < srv.error_rate:
+            srv.stats.add(errors=1)
+            self._send(srv.error_status, b'{"error":1357004,"errorSummary":"mock error"}', "application/json")
+            return
+        if form.get("doc_id") == DETAIL_DOC_ID:
+            srv.stats.add(detail_requests=1)
+            lid = str(variables.get("targetId", ""))
+            self._send_json({"data": {"viewer": {"marketplace_product_details_page": {
+                "target": srv.catalogue.details(lid) if lid.isdigit() else None}}}})
+            return
+        self._feed(variables)
+
+    def _feed(self, variables: dict):
+        srv = self.server
+        offset, size = decode_cursor(variables.get("cursor"))
+        size = size or srv.catalogue.size
+        nodes, next_offset = srv.catalogue.feed_page(offset, variables, srv.page_size, srv.dup_rate, size)
+        has_next = next_offset < size
+        srv.stats.add(feed_requests=1, edges=len(nodes))
+        self._send_json({"data": {"marketplace_search": {"feed_units": {
+            "edges": [{"node": {"__typename": "MarketplaceFeedListingStoryObject", "listing": node}}
+                      for node in nodes],
+            "page_info": {"end_cursor": encode_cursor(next_offset, size) if has_next else None,
+                          "has_next_page": has_next},
+        }}}}, xssi=True)
+
+
+# ─── CLI ────────────────────────────────────────────────────────────────────────
+def main():
+    ap = argparse.ArgumentParser(description="Local mock Marketplace server for scraper load tests")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--listings", type=int, default=LISTINGS, help="catalogue size")
+    ap.add_argument("--page-size", type=int, default=PAGE_SIZE, help="edges per feed response")
+    ap.add_argument("--latency", type=float, default=LATENCY, help="seconds per GraphQL response")
+    ap.add_argument("--jitter", type=float, default=JITTER, help="extra random latency, up to this")
+    ap.add_argument("--dup-rate", type=float, default=DUP_RATE, help="share of edges repeating earlier ones")
+    ap.add_argument("--error-rate", type=float, default=ERROR_RATE, help="share of GraphQL requests that fail")
+    ap.add_argument("--error-status", type=int, default=ERROR_STATUS)
+    ap.add_argument("--new-per-minute", type=float, default=NEW_PER_MINUTE, help="listings posted per minute")
+    ap.add_argument("--seed", type=int, default=SEED)
+    args = ap.parse_args()
+
+    server = MockMarketplaceServer(
+        args.host, args.port, listings=args.listings, page_size=args.page_size, latency=args.latency,
+        jitter=args.jitter, dup_rate=args.dup_rate, error_rate=args.error_rate,
+        error_status=args.error_status, new_per_minute=args.new_per_minute, seed=args.seed)
+    print(f"🧪 Mock Marketplace on {server.base_url} — {args.listings} listings, {args.page_size}/page, "
+          f"{args.latency:g}s +≤{args.jitter:g}s latency, {args.dup_rate:.0%} repeats, "
+          f"{args.error_rate:.0%} HTTP {args.error_status}")
+    print(f"   FB_HOME={server.base_url} python scrape_marketplace.py")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n📊 {server.stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
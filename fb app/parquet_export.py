@@ -0,0 +1,240 @@
+"""
+Typed, compressed, columnar export of scraped listings (Parquet via pyarrow).
+
+The CSV outputs are untyped: price_clp comes back as a string and v_region /
+qualifies as "True"/"False", so every analysis re-reads and re-casts whole
+files. ParquetExporter writes the same rows into a Hive-partitioned dataset
+
+    marketplace_dataset/scrape_date=2026-10-17/region=Valparaíso/part-r42-0003.parquet
+
+with a fixed Arrow SCHEMA (ints, bools, timestamps) and zstd compression.
+Rows are buffered and flushed every FLUSH_ROWS as new part files, so each run
+only appends its own files — nothing already written is rewritten. Readers
+prune partitions and columns, so a month of scrapes loads in well under a
+second:
+
+    table = load(DATASET_DIR, columns=["price_clp"],
+                 filter=(ds.field("commune") == "Viña del Mar") & (ds.field("year") == 2018))
+
+Requires pyarrow (pip install pyarrow); without it the export is disabled.
+
+Usage:
+    python parquet_export.py backfill facebook_graphql_vehicles.csv [--date 2026-10-01]
+    python parquet_export.py median --commune "Viña del Mar" --year 2018 [--make Toyota --model RAV4]
+"""
+
+import argparse
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:      # optional — no columnar export without it
+    pa = None
+
+DATASET_DIR = Path(__file__).parent / "marketplace_dataset"
+FLUSH_ROWS = 5_000           # rows buffered before a part file is written
+COMPRESSION = "zstd"
+UNKNOWN_REGION = "unknown"   # partition for cities outside the gazetteer
+
+# Column → Arrow type name (the partition columns scrape_date / region are
+# encoded in the directory names, not stored in the files)
+COLUMNS = {
+    "id": "string", "title": "string", "price": "string", "price_clp": "int64",
+    "city": "string", "commune": "string", "km": "string", "km_num": "int64",
+    "year": "int16", "make": "string", "model": "string", "seller": "string",
+    "url": "string", "v_region": "bool", "qualifies": "bool", "canonical_id": "string",
+    "market_price": "int64", "deal_score": "float64", "run_id": "int64", "scraped_at": "timestamp",
+}
+_INTS = {c for c, t in COLUMNS.items() if t.startswith("int")}
+_BOOLS = {c for c, t in COLUMNS.items() if t == "bool"}
+_FLOATS = {c for c, t in COLUMNS.items() if t.startswith("float")}
+
+
+def available() -> bool:
+    if pa is None:
+        print("  ℹ️  Parquet export disabled (pip install pyarrow to enable).")
+        return False
+    return True
+
+
+def schema():
+    types = {"string": pa.string(), "int64": pa.int64(), "int16": pa.int16(),
+             "float64": pa.float64(), "bool": pa.bool_(), "timestamp": pa.timestamp("s", tz="UTC")}
+    return pa.schema([(name, types[t]) for name, t in COLUMNS.items()])
+
+
+def _to_int(value) -> int | None:
+    if value in (None, ""):
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value) -> float | None:
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_bool(value) -> bool | None:
+    if value in (None, ""):
+        return None
+    if isinstance(value, str):
+        return value.strip().lower() in {"true", "1", "yes"}
+    return bool(value)
+
+
+def typed_row(row: dict, run_id: int | None, scraped_at: datetime) -> dict:
+    """Cast one sink row (native or CSV strings) to the export schema."""
+    out = {}
+    for col in COLUMNS:
+        value = row.get(col)
+        if col in _INTS:
+            value = _to_int(value)
+        elif col in _FLOATS:
+            value = _to_float(value)
+        elif col in _BOOLS:
+            value = _to_bool(value)
+        elif value is not None:
+            value = str(value)
+        out[col] = value
+    out["run_id"] = run_id
+    out["scraped_at"] = scraped_at
+    return out
+
+
+class ParquetExporter:
+    """Buffered writer of one run's rows into the partitioned dataset."""
+
+    def __init__(self, root: Path = DATASET_DIR, *, run_id: int | None = None,
+                 scrape_date: date | None = None, flush_rows: int = FLUSH_ROWS):
+        self.root = Path(root)
+        self.run_id = run_id
+        self.scrape_date = scrape_date or date.today()
+        self.flush_rows = flush_rows
+        self.schema = schema()
+        self.rows_written = 0
+        self.files_written = 0
+        self._tag = f"r{run_id}" if run_id is not None else f"t{int(time.time())}"
+        self._buffer: dict[str, list[dict]] = {}
+        self._buffered = 0
+
+    def add_many(self, rows: list[dict]):
+        scraped_at = datetime.now(timezone.utc).replace(microsecond=0)
+        for row in rows:
+            region = row.get("region") or UNKNOWN_REGION
+            self._buffer.setdefault(region, []).append(typed_row(row, self.run_id, scraped_at))
+        self._buffered += len(rows)
+        if self._buffered >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered region as a new part file."""
+        for region, rows in self._buffer.items():
+            part = self.root / f"scrape_date={self.scrape_date.isoformat()}" / f"region={region}"
+            part.mkdir(parents=True, exist_ok=True)
+            path = part / f"part-{self._tag}-{self.files_written:04d}.parquet"
+            table = pa.Table.from_pylist(rows, schema=self.schema)
+            tmp = path.with_name(path.name + ".tmp")
+            pq.write_table(table, tmp, compression=COMPRESSION)
+            tmp.replace(path)
+            self.rows_written += len(rows)
+            self.files_written += 1
+        self._buffer.clear()
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+
+
+# ─── Reading ────────────────────────────────────────────────────────────────────
+def dataset(root: Path = DATASET_DIR):
+    """The whole partitioned dataset (scrape_date and region come from the paths)."""
+    partitioning = ds.partitioning(
+        pa.schema([("scrape_date", pa.date32()), ("region", pa.string())]), flavor="hive")
+    return ds.dataset(Path(root), format="parquet", partitioning=partitioning,
+                      exclude_invalid_files=True)
+
+
+def load(root: Path = DATASET_DIR, *, columns: list[str] | None = None, filter=None):
+    """Read the columns / rows you need; partition filters skip whole directories."""
+    return dataset(root).to_table(columns=columns, filter=filter)
+
+
+def median_price(root: Path = DATASET_DIR, *, since: date | None = None, **equals) -> tuple[int, float | None]:
+    """(listings, median price_clp) for rows matching `column=value` filters,
+    taking each listing's most recently scraped price."""
+    expr = ds.field("price_clp") > 0
+    if since:
+        expr &= ds.field("scrape_date") >= pa.scalar(since, pa.date32())
+    for col, value in equals.items():
+        if value is not None:
+            expr &= ds.field(col) == value
+    prices = load(root, columns=["id", "price_clp", "scrape_date", "scraped_at"], filter=expr)
+    if not prices.num_rows:
+        return 0, None
+    # The same listing is re-scraped daily — count each id once, at its latest price
+    prices = prices.sort_by([("scrape_date", "ascending"), ("scraped_at", "ascending")])
+    unique = prices.group_by("id", use_threads=False).aggregate([("price_clp", "last")])
+    return unique.num_rows, pc.approximate_median(unique["price_clp_last"]).as_py()
+
+
+# ─── CLI ────────────────────────────────────────────────────────────────────────
+def backfill(path: Path, root: Path, scrape_date: date | None):
+    """Export an existing CSV / NDJSON listing stream into the dataset."""
+    from listing_sink import ListingSink
+
+    if scrape_date is None:
+        scrape_date = datetime.fromtimestamp(path.stat().st_mtime).date()
+    reader = ListingSink(path, path.with_name(path.name + ".unused"))
+    exporter = ParquetExporter(root, scrape_date=scrape_date)
+    batch = []
+    for row in reader.iter_rows():
+        batch.append(row)
+        if len(batch) >= FLUSH_ROWS:
+            exporter.add_many(batch)
+            batch = []
+    exporter.add_many(batch)
+    exporter.close()
+    print(f"💾 {exporter.rows_written} rows → {exporter.files_written} part files under {root}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar (Parquet) export of scraped listings")
+    parser.add_argument("--root", type=Path, default=DATASET_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("backfill", help="export an existing CSV / NDJSON output")
+    b.add_argument("file", type=Path)
+    b.add_argument("--date", type=date.fromisoformat, help="scrape_date partition (default: file mtime)")
+    m = sub.add_parser("median", help="median price_clp of matching listings")
+    for col in ("region", "commune", "make", "model"):
+        m.add_argument(f"--{col}")
+    m.add_argument("--year", type=int)
+    m.add_argument("--since", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    if not available():
+        raise SystemExit(1)
+    if args.command == "backfill":
+        backfill(args.file, args.root, args.date)
+    else:
+        t0 = time.perf_counter()
+        n, median = median_price(args.root, since=args.since, region=args.region, commune=args.commune,
+                                 make=args.make, model=args.model, year=args.year)
+        elapsed = time.perf_counter() - t0
+        shown = f"{median:,.0f} CLP" if median is not None else "—"
+        print(f"📊 {n} listings, median price {shown}  ({elapsed * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
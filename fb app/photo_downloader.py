@@ -0,0 +1,384 @@
+"""
+Content-addressed photo downloader for Marketplace leads.
+
+Photo URIs come from the feed (`primary_listing_photo`) and, once a lead has
+been enriched, from its full `listing_photos` list. PhotoDownloader takes
+them off a queue that drains on its own — submit() never blocks the scroll
+loop:
+
+  • WORKERS async workers fetch images through a thread (urllib), with
+    retries; the event loop only schedules them
+  • each image is stored by the sha256 of its bytes,
+        photos/ab/cd/abcd….jpg
+    so an image shared by several listings (reposts!) is stored once
+  • the photo_files table maps every URL (minus its expiring CDN query
+    string) to its hash, and listing_photos maps listings to hashes, so a
+    resumed run skips everything already on disk
+  • a listing's photos are deduped by file name when submitted and by
+    content hash once fetched; positions are handed out only after that, in
+    submission order and without gaps — the feed's primary photo keeps
+    position 0 and the enriched list's copy of it is neither downloaded
+    again nor re-linked. A listing's state is dropped once everything
+    submitted for it is linked (reloaded from the database if more arrive)
+  • a process pool turns each new image into a THUMB_SIZE WebP thumbnail
+    next to it (thumbs/ab/cd/abcd….webp) — needs Pillow (pip install
+    pillow); without it only the originals are kept
+
+    downloader = PhotoDownloader(PHOTO_DIR, store.conn)
+    downloader.start()
+    downloader.submit(lid, photo_urls(listing))
+    await downloader.close(drain_timeout=60)
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import run_log
+
+try:
+    from PIL import Image
+except ImportError:      # optional — originals only, no thumbnails
+    Image = None
+
+WORKERS = 4                  # concurrent downloads
+THUMB_WORKERS = 1            # processes generating thumbnails
+THUMB_SIZE = (320, 320)      # bounding box, aspect ratio kept
+THUMB_QUALITY = 70
+RETRIES = 2
+TIMEOUT = 20.0
+MAX_BYTES = 15 * 1024 * 1024   # refuse anything bigger (not a listing photo)
+USER_AGENT = ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0 Safari/537.36")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photo_files (
+    url_key    TEXT PRIMARY KEY,      -- scheme://host/path (CDN signature stripped)
+    sha256     TEXT NOT NULL,
+    suffix     TEXT NOT NULL,         -- from the image bytes: .jpg .png .webp .gif
+    bytes      INTEGER,
+    fetched_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_photo_files_sha ON photo_files(sha256);
+CREATE TABLE IF NOT EXISTS listing_photos (
+    listing_id TEXT NOT NULL,
+    position   INTEGER NOT NULL,
+    sha256     TEXT NOT NULL,
+    PRIMARY KEY (listing_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_listing_photos_sha ON listing_photos(sha256);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def photo_urls(listing: dict) -> list[str]:
+    """Image URIs of a feed listing node (primary photo first)."""
+    urls = []
+    primary = ((listing.get("primary_listing_photo") or {}).get("image") or {}).get("uri")
+    if primary:
+        urls.append(primary)
+    for photo in listing.get("listing_photos") or []:
+        uri = ((photo or {}).get("image") or {}).get("uri")
+        if uri and uri not in urls:
+            urls.append(uri)
+    return urls
+
+
+def url_key(url: str) -> str:
+    """The same image is served with changing signed query strings."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+def photo_name(url: str) -> str:
+    """File name of an image URL — the same photo in another CDN rendition
+    keeps it."""
+    return urlsplit(url).path.rsplit("/", 1)[-1]
+
+
+def _suffix(data: bytes) -> str:
+    """File suffix from the image's magic bytes (CDN URLs don't say)."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return ".png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    if data[:4] == b"GIF8":
+        return ".gif"
+    return ".jpg"
+
+
+def content_path(root: Path, digest: str, suffix: str) -> Path:
+    return root / digest[:2] / digest[2:4] / f"{digest}{suffix}"
+
+
+def _fetch(url: str) -> bytes:
+    """Blocking download (runs in a thread)."""
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+        data = response.read(MAX_BYTES + 1)
+    if len(data) > MAX_BYTES:
+        raise ValueError(f"image larger than {MAX_BYTES} bytes")
+    return data
+
+
+def _write_once(path: Path, data: bytes) -> bool:
+    """Atomically create `path` unless it exists (same hash → same bytes)."""
+    if path.exists():
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
+def make_thumbnail(src: str, dst: str, size: tuple[int, int] = THUMB_SIZE,
+                   quality: int = THUMB_QUALITY) -> bool:
+    """Runs in a worker process: write a WebP thumbnail of `src` to `dst`."""
+    dst_path = Path(dst)
+    if dst_path.exists():
+        return False
+    dst_path.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(src) as im:
+        im.thumbnail(size)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGB")
+        tmp = dst_path.with_name(f"{dst_path.name}.{os.getpid()}.tmp")
+        im.save(tmp, "WEBP", quality=quality)
+    os.replace(tmp, dst_path)
+    return True
+
+
+class _ListingPhotos:
+    """What a listing already has: photo file names, content hashes and the
+    next free position — plus its submitted photos, in order, until each is
+    fetched (or has failed) and can be linked."""
+
+    __slots__ = ("names", "digests", "next_position", "submitted", "linked", "fetched")
+
+    def __init__(self):
+        self.names: set[str] = set()
+        self.digests: set[str] = set()
+        self.next_position = 0
+        self.submitted = 0                       # photos queued or resolved, in submission order
+        self.linked = 0                          # … of which handled in order so far
+        self.fetched: dict[int, str | None] = {}   # submission index → digest (None: failed)
+
+    @property
+    def done(self) -> bool:
+        return self.linked == self.submitted
+
+
+class PhotoDownloader:
+    """Self-draining download queue with content-addressed storage."""
+
+    def __init__(self, root: Path, conn: sqlite3.Connection | None = None, *,
+                 workers: int = WORKERS, thumbnails: bool = True):
+        self.root = Path(root)
+        self.originals = self.root / "photos"
+        self.thumbs = self.root / "thumbs"
+        self.conn = conn or sqlite3.connect(":memory:")
+        self.conn.executescript(SCHEMA)
+        self.workers = workers
+        self.thumbnails = thumbnails and Image is not None
+        if thumbnails and Image is None:
+            print("  ℹ️  Photo thumbnails disabled (pip install pillow to enable).")
+        self.queue: asyncio.Queue[tuple[str, int, str]] = asyncio.Queue()
+        self._listings: dict[str, _ListingPhotos] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._thumb_pool: ProcessPoolExecutor | None = None
+        self._thumb_jobs: set[asyncio.Future] = set()
+
+        self.downloaded = 0
+        self.deduped = 0          # new URL, bytes already stored
+        self.skipped = 0          # URL already downloaded (resume)
+        self.failed = 0
+        self.thumbs_made = 0
+        self.bytes = 0
+
+    # ── Lifecycle ──────────────────────────────────────────────────────────────
+    def start(self):
+        if self.thumbnails:
+            self._thumb_pool = ProcessPoolExecutor(max_workers=THUMB_WORKERS)
+        for n in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"photos-{n}"))
+
+    async def close(self, drain_timeout: float | None = None):
+        """Let queued downloads finish (up to `drain_timeout` seconds), then stop."""
+        if drain_timeout and self._tasks:
+            if self.queue.qsize():
+                run_log.say(f"  ⏳ Photos: waiting up to {drain_timeout:.0f}s for {self.queue.qsize()} queued downloads…")
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._thumb_jobs:
+            await asyncio.gather(*self._thumb_jobs, return_exceptions=True)
+        if self._thumb_pool:
+            self._thumb_pool.shutdown(wait=True)
+            self._thumb_pool = None
+
+    # ── Producer side ──────────────────────────────────────────────────────────
+    def submit(self, lid: str, urls: list[str]) -> int:
+        """Queue a listing's photos (non-blocking). Returns how many were queued.
+        Photos the listing already has keep their position; new ones are
+        appended after them."""
+        photos = self._photos(lid)
+        queued = 0
+        for url in urls:
+            name = photo_name(url)
+            if name in photos.names:
+                continue
+            photos.names.add(name)
+            index = photos.submitted
+            photos.submitted += 1
+            digest = self._stored(url_key(url))
+            if digest:
+                self._settle(lid, photos, index, digest)
+                continue
+            self.queue.put_nowait((lid, index, url))
+            queued += 1
+        if photos.done:
+            del self._listings[lid]
+        return queued
+
+    def _photos(self, lid: str) -> _ListingPhotos:
+        """The listing's photo state, loaded from the database on first use."""
+        photos = self._listings.get(lid)
+        if photos is None:
+            photos = self._listings[lid] = _ListingPhotos()
+            rows = self.conn.execute(
+                """
+                SELECT lp.position, lp.sha256, pf.url_key FROM listing_photos lp
+                LEFT JOIN photo_files pf ON pf.sha256 = lp.sha256 WHERE lp.listing_id = ?
+                """, (lid,)).fetchall()
+            for position, digest, key in rows:
+                photos.digests.add(digest)
+                if key:
+                    photos.names.add(photo_name(key))
+                photos.next_position = max(photos.next_position, position + 1)
+        return photos
+
+    def _stored(self, key: str) -> str | None:
+        """Digest of an already downloaded URL whose file is still on disk."""
+        known = self.conn.execute("SELECT sha256, suffix FROM photo_files WHERE url_key = ?", (key,)).fetchone()
+        if known and content_path(self.originals, *known).exists():
+            self.skipped += 1
+            return known[0]
+        return None
+
+    def photos_of(self, lid: str) -> list[Path]:
+        rows = self.conn.execute(
+            """
+            SELECT lp.sha256, (SELECT suffix FROM photo_files pf WHERE pf.sha256 = lp.sha256 LIMIT 1)
+            FROM listing_photos lp WHERE lp.listing_id = ? ORDER BY lp.position
+            """, (lid,)).fetchall()
+        return [content_path(self.originals, sha, suffix) for sha, suffix in rows if suffix]
+
+    # ── Workers ────────────────────────────────────────────────────────────────
+    async def _worker(self):
+        while True:
+            lid, index, url = await self.queue.get()
+            digest = None
+            try:
+                digest = await self._download(lid, url)
+            finally:
+                self._resolve(lid, index, digest)
+                self.queue.task_done()
+
+    async def _download(self, lid: str, url: str) -> str | None:
+        """Fetch and store one image. Returns its digest (None on failure)."""
+        # Another listing may have fetched the same image since it was queued
+        digest = self._stored(url_key(url))
+        if digest:
+            return digest
+        delay = 2.0
+        for attempt in range(RETRIES + 1):
+            try:
+                data = await asyncio.to_thread(_fetch, url)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if attempt == RETRIES:
+                    self.failed += 1
+                    run_log.event("photo_failed", id=lid, url=url_key(url))
+                    return None
+                await asyncio.sleep(delay)
+                delay *= 2
+
+        digest = hashlib.sha256(data).hexdigest()
+        suffix = _suffix(data)
+        path = content_path(self.originals, digest, suffix)
+        if await asyncio.to_thread(_write_once, path, data):
+            self.downloaded += 1
+            self.bytes += len(data)
+            self._thumbnail(path, digest)
+        else:
+            self.deduped += 1
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO photo_files VALUES (?, ?, ?, ?, ?)",
+                (url_key(url), digest, suffix, len(data), _now()))
+        return digest
+
+    def _resolve(self, lid: str, index: int, digest: str | None):
+        """A queued photo was fetched (or failed): link what is now in order and
+        drop the listing's state once nothing of it is outstanding."""
+        photos = self._listings.get(lid)
+        if photos is None:
+            return
+        self._settle(lid, photos, index, digest)
+        if photos.done:
+            del self._listings[lid]
+
+    def _settle(self, lid: str, photos: _ListingPhotos, index: int, digest: str | None):
+        """Record the outcome of the listing's `index`-th submitted photo and
+        link every photo that is next in submission order."""
+        photos.fetched[index] = digest
+        while photos.linked in photos.fetched:
+            digest = photos.fetched.pop(photos.linked)
+            photos.linked += 1
+            self._link(lid, photos, digest)
+
+    def _link(self, lid: str, photos: _ListingPhotos, digest: str | None):
+        """Attach an image at the next position, unless it failed or the listing
+        already has the same bytes (another rendition of a photo it has)."""
+        if digest is None or digest in photos.digests:
+            return
+        photos.digests.add(digest)
+        position = photos.next_position
+        photos.next_position += 1
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO listing_photos VALUES (?, ?, ?)", (lid, position, digest))
+
+    def _thumbnail(self, path: Path, digest: str):
+        if not self._thumb_pool:
+            return
+        dst = content_path(self.thumbs, digest, ".webp")
+        job = asyncio.get_running_loop().run_in_executor(self._thumb_pool, make_thumbnail, str(path), str(dst))
+        self._thumb_jobs.add(job)
+        job.add_done_callback(self._thumb_done)
+
+    def _thumb_done(self, job: asyncio.Future):
+        self._thumb_jobs.discard(job)
+        if not job.cancelled() and job.exception() is None and job.result():
+            self.thumbs_made += 1
+
+    def summary(self) -> str:
+        return (f"{self.downloaded} downloaded ({self.bytes / 1e6:.1f} MB), {self.deduped} shared, "
+                f"{self.skipped} already on disk, {self.failed} failed, {self.thumbs_made} thumbnails, "
+                f"{self.queue.qsize()} still queued")
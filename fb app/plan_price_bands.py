@@ -0,0 +1,109 @@
+"""
+Adaptive price-band planner for scrape_marketplace.py.
+
+A single `minPrice=4000000` search saturates: after a while the feed keeps
+re-serving listings it already showed and most of the market is never
+reached. The planner splits the price space into minPrice/maxPrice bands:
+
+  1. Scrape the whole range [PRICE_FLOOR, PRICE_CEILING] as one band.
+  2. A band is *saturated* when its feed served at least
+     BAND_SATURATION_MIN_UNIQUE distinct listings and at least
+     BAND_SATURATION_REPEAT_RATIO of its edges were repeats.
+  3. Saturated bands are bisected (at the geometric midpoint, prices are
+     roughly log-distributed) and both halves are scraped, down to
+     MIN_BAND_WIDTH / MAX_DEPTH.
+
+All bands share scrape_marketplace's deduplicating sink/store for writing,
+but each band paces and stops on its own novelty (SearchRun.track_band): a
+listing the parent band already collected still counts as new the first
+time the child's feed serves it, so children aren't cut off by
+END_OF_FEED_EMPTY_PAGES or the marginal-yield stop before they get past the
+parent's listings. The report shows, per band, the distinct listings its
+feed served per request and how many of them no earlier band had collected,
+next to the first full-range sweep for comparison.
+
+Usage:
+    python plan_price_bands.py
+"""
+
+import asyncio
+import math
+
+import scrape_marketplace as sm
+
+BASE_SEARCH = {k: v for k, v in sm.SEARCHES[0].items() if k not in {"min_price", "max_price", "name"}}
+PRICE_FLOOR = sm.MIN_PRICE
+PRICE_CEILING = 60_000_000
+MIN_BAND_WIDTH = 500_000
+MAX_DEPTH = 5
+BAND_SATURATION_MIN_UNIQUE = 150
+BAND_SATURATION_REPEAT_RATIO = 0.5
+PRICE_STEP = 100_000          # band edges are rounded to this
+
+
+class Band:
+    def __init__(self, lo: int, hi: int, depth: int = 0):
+        self.lo, self.hi, self.depth = lo, hi, depth
+        self.run = sm.SearchRun({
+            **BASE_SEARCH,
+            "name": f"{lo / 1e6:g}-{hi / 1e6:g}M",
+            "min_price": lo,
+            "max_price": hi,
+        })
+        self.run.track_band()
+
+    @property
+    def saturated(self) -> bool:
+        run = self.run
+        if run.stop_reason == "target reached" or run.stop_reason.startswith("error"):
+            return False
+        return (run.served >= BAND_SATURATION_MIN_UNIQUE
+                and run.repeat_ratio >= BAND_SATURATION_REPEAT_RATIO)
+
+    def split(self) -> list["Band"]:
+        mid = round(math.sqrt(self.lo * self.hi) / PRICE_STEP) * PRICE_STEP
+        if self.hi - self.lo < 2 * MIN_BAND_WIDTH or self.depth >= MAX_DEPTH or not self.lo < mid < self.hi:
+            return []
+        return [Band(self.lo, mid, self.depth + 1), Band(mid, self.hi, self.depth + 1)]
+
+    def report(self) -> str:
+        run = self.run
+        pages = run.scheduler.pages
+        per_request = run.served / pages if pages else 0.0
+        flag = "🔀 split" if self.saturated and self.split() else ""
+        return (f"{'  ' * self.depth}{run.name:<14} | {pages:>5} req | {run.served:>5} unique "
+                f"| {run.repeat_ratio:>4.0%} repeats | {run.new:>5} new to run | {per_request:>5.2f} unique/req {flag}")
+
+
+async def plan_bands(context, runs: list):
+    """scrape_marketplace.main() driver: breadth-first band bisection."""
+    slots = asyncio.Semaphore(sm.MAX_CONCURRENT_PAGES)
+    level = [Band(PRICE_FLOOR, PRICE_CEILING)]
+    done: list[Band] = []
+    print(f"\n🧭 Price-band planner: {PRICE_FLOOR:,} – {PRICE_CEILING:,} CLP, "
+          f"target {sm.TARGET_LEADS} qualifying leads\n")
+    try:
+        while level and not sm._target_reached():
+            runs.extend(band.run for band in level)
+            await asyncio.gather(*(sm.scrape_search(context, band.run, slots) for band in level))
+            done.extend(level)
+            level = [child for band in level if band.saturated for child in band.split()]
+            if level:
+                print(f"\n🔀 Bisecting into {len(level)} bands: {', '.join(b.run.name for b in level)}")
+    finally:
+        print("\n📊 Price bands (unique = distinct listings the band's feed served, "
+              "new to run = … that no earlier band had collected):")
+        for band in sorted(done, key=lambda b: (b.lo, b.depth)):
+            print(f"   {band.report()}")
+        if done:
+            sweep = done[0].run
+            total_pages = sum(b.run.scheduler.pages for b in done)
+            total_new = sum(b.run.new for b in done)
+            sweep_rate = sweep.new / sweep.scheduler.pages if sweep.scheduler.pages else 0.0
+            plan_rate = total_new / total_pages if total_pages else 0.0
+            print(f"\n   Single sweep: {sweep.new} unique in {sweep.scheduler.pages} requests ({sweep_rate:.2f}/req)")
+            print(f"   Planner:      {total_new} unique in {total_pages} requests ({plan_rate:.2f}/req)")
+
+
+if __name__ == "__main__":
+    asyncio.run(sm.main(driver=plan_bands))
@@ -0,0 +1,255 @@
+"""
+Market-price index and deal scoring for scraped listings.
+
+`qualifies` only says "target region and ≥ MIN_PRICE". PriceIndex says whether
+the car is cheap for what it is: it keeps the most recent SAMPLE_SIZE prices
+per comparable group and scores every new batch against the group's median,
+
+    deal_score = (market_price − price_clp) / market_price × 100
+
+(+20 → 20 % below the market, −10 → 10 % above). Groups fall back from the
+most to the least specific until one has MIN_SAMPLES comparables:
+
+    make | model | year | km bucket (KM_BUCKET km)  →  make | model | year  →  make | model
+
+The index updates incrementally: add_many() appends the batch's prices to
+bounded per-group samples and marks only those groups dirty; their
+percentiles (p25 / median / p75) are recomputed before the next scoring, so
+the cost per batch depends on the batch, not on the history. Scoring a batch
+is a handful of numpy array operations over a (rows × levels) slot matrix.
+
+Batches are scored before they are added, so a listing is never compared
+with itself; only listings new to the store (and not reposts) are added, so
+re-sightings don't skew the medians. The samples are saved to INDEX_FILE
+and loaded at start, or rebuilt once from the listing store.
+
+Requires numpy (pip install numpy); without it deal scoring is disabled.
+
+Usage:
+    python price_index.py rebuild            # from marketplace_listings.db
+    python price_index.py show Toyota RAV4 2018 [--km 90000]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:      # optional — no deal scores without it
+    np = None
+
+INDEX_FILE = Path(__file__).parent / "price_index.json"
+KM_BUCKET = 40_000           # km band width within a make/model/year
+MAX_KM_BUCKET = 6            # ≥ 240 000 km share the last band
+SAMPLE_SIZE = 200            # most recent prices kept per group
+MIN_SAMPLES = 5              # comparables needed before a group sets the market price
+PRICE_RANGE = (500_000, 300_000_000)   # CLP; outside this it's a typo, a part or a rental
+PERCENTILES = (25, 50, 75)
+LEVELS = 3                   # key levels, most specific first
+
+_N, _P25, _P50, _P75 = range(4)
+
+
+def available() -> bool:
+    if np is None:
+        print("  ℹ️  Deal scoring disabled (pip install numpy to enable).")
+        return False
+    return True
+
+
+def group_keys(make, model, year, km_num) -> list[str | None]:
+    """Comparable-group keys, most specific first (None where a field is missing)."""
+    if not make or not model:
+        return [None] * LEVELS
+    base = f"{make}|{model}"
+    if not year:
+        return [None, None, base]
+    bucket = min(int(km_num) // KM_BUCKET, MAX_KM_BUCKET) if km_num not in (None, "") else None
+    return [f"{base}|{year}|{bucket}" if bucket is not None else None, f"{base}|{year}", base]
+
+
+def _price(row) -> int | None:
+    try:
+        price = int(row.get("price_clp") or 0)
+    except (TypeError, ValueError):
+        return None
+    return price if PRICE_RANGE[0] <= price <= PRICE_RANGE[1] else None
+
+
+class PriceIndex:
+    """Bounded price samples per comparable group, with cached percentiles."""
+
+    def __init__(self, *, sample_size: int = SAMPLE_SIZE, min_samples: int = MIN_SAMPLES):
+        self.sample_size = sample_size
+        self.min_samples = min_samples
+        self.samples: dict[str, deque] = {}
+        self._slots: dict[str, int] = {}           # group key → row of _stats
+        self._keys: list[str] = []                 # row of _stats → group key
+        self._stats = np.zeros((1024, 4))          # n, p25, median, p75 per slot
+        self._dirty: set[int] = set()
+        self.added = 0
+        self.scored = 0
+        self.load_ms = 0.0
+
+    # ── Updating ───────────────────────────────────────────────────────────────
+    def _slot(self, key: str) -> int:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = len(self._keys)
+            self._keys.append(key)
+            self.samples[key] = deque(maxlen=self.sample_size)
+            if slot >= len(self._stats):
+                self._stats = np.vstack([self._stats, np.zeros_like(self._stats)])
+        return slot
+
+    def add(self, make, model, year, km_num, price: int):
+        for key in group_keys(make, model, year, km_num):
+            if key:
+                slot = self._slot(key)
+                self.samples[key].append(price)
+                self._dirty.add(slot)
+        self.added += 1
+
+    def add_many(self, rows):
+        for row in rows:
+            price = _price(row)
+            if price is not None:
+                self.add(row.get("make"), row.get("model"), row.get("year"), row.get("km_num"), price)
+
+    def _refresh(self):
+        """Recompute percentiles of the groups that changed since the last refresh."""
+        if not self._dirty:
+            return
+        for slot in self._dirty:
+            values = np.fromiter(self.samples[self._keys[slot]], dtype=np.float64)
+            self._stats[slot, _N] = len(values)
+            self._stats[slot, _P25:] = np.percentile(values, PERCENTILES)
+        self._dirty.clear()
+
+    # ── Scoring ────────────────────────────────────────────────────────────────
+    def score_many(self, rows: list[dict]):
+        """Set market_price / deal_score on every row (None without enough comparables)."""
+        if not rows:
+            return
+        self._refresh()
+        slots = np.array([[self._slots.get(key, -1) if key else -1
+                           for key in group_keys(r.get("make"), r.get("model"), r.get("year"), r.get("km_num"))]
+                          for r in rows], dtype=np.int64)
+        prices = np.array([_price(r) or 0 for r in rows], dtype=np.float64)
+
+        counts = np.where(slots >= 0, self._stats[slots, _N], 0)     # rows × levels
+        enough = counts >= self.min_samples
+        level = enough.argmax(axis=1)                                # most specific group that qualifies
+        chosen = slots[np.arange(len(rows)), level]
+        scored = enough.any(axis=1) & (prices > 0)
+        median = np.where(scored, self._stats[chosen, _P50], np.nan)
+        deal = np.round((median - prices) / median * 100, 1)
+
+        for row, ok, m, d in zip(rows, scored.tolist(), median.tolist(), deal.tolist()):
+            row["market_price"] = int(round(m, -3)) if ok else None
+            row["deal_score"] = d if ok else None
+        self.scored += int(scored.sum())
+
+    def lookup(self, make, model, year=None, km_num=None) -> dict | None:
+        """Percentiles of the most specific group with enough comparables."""
+        self._refresh()
+        for key in group_keys(make, model, year, km_num):
+            slot = self._slots.get(key) if key else None
+            if slot is not None and self._stats[slot, _N] >= self.min_samples:
+                n, p25, p50, p75 = self._stats[slot].tolist()
+                return {"group": key, "n": int(n), "p25": p25, "median": p50, "p75": p75}
+        return None
+
+    # ── Persistence ────────────────────────────────────────────────────────────
+    def save(self, path: Path):
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        payload = {"sample_size": self.sample_size, "km_bucket": KM_BUCKET,
+                   "samples": {key: list(values) for key, values in self.samples.items()}}
+        tmp.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, **kwargs) -> "PriceIndex | None":
+        t0 = time.perf_counter()
+        try:
+            payload = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if payload.get("km_bucket") != KM_BUCKET:
+            return None      # grouped differently — rebuild
+        index = cls(**kwargs)
+        for key, values in payload.get("samples", {}).items():
+            slot = index._slot(key)
+            index.samples[key].extend(values)
+            index._dirty.add(slot)
+        index.load_ms = (time.perf_counter() - t0) * 1000
+        return index
+
+    @classmethod
+    def build(cls, rows, **kwargs) -> "PriceIndex":
+        """A new index from `rows` (make, model, year, km_num and price_clp,
+        oldest first)."""
+        t0 = time.perf_counter()
+        index = cls(**kwargs)
+        index.add_many(rows)
+        index.load_ms = (time.perf_counter() - t0) * 1000
+        return index
+
+    @classmethod
+    def open(cls, path: Path, *, rebuild=None, **kwargs) -> "PriceIndex":
+        """Load the saved index, or build it from `rebuild()` when there is none."""
+        index = cls.load(path, **kwargs)
+        if index is not None:
+            return index
+        return cls.build(rebuild() if rebuild is not None else (), **kwargs)
+
+    def summary(self) -> str:
+        groups = sum(1 for values in self.samples.values() if len(values) >= self.min_samples)
+        return (f"{len(self.samples)} groups ({groups} with ≥{self.min_samples} prices), "
+                f"{self.added} prices added, {self.scored} listings scored, loaded in {self.load_ms:.0f} ms")
+
+
+# ─── CLI ────────────────────────────────────────────────────────────────────────
+def main():
+    from listing_store import ListingStore
+
+    ap = argparse.ArgumentParser(description="Market-price index over scraped listings")
+    ap.add_argument("--index", type=Path, default=INDEX_FILE)
+    ap.add_argument("--store", type=Path, default=Path(__file__).parent / "marketplace_listings.db")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="rebuild the index from the listing store")
+    s = sub.add_parser("show", help="market price of a make / model / year")
+    s.add_argument("make")
+    s.add_argument("model")
+    s.add_argument("year", type=int, nargs="?")
+    s.add_argument("--km", type=int)
+    args = ap.parse_args()
+
+    if not available():
+        raise SystemExit(1)
+    if args.command == "rebuild":
+        store = ListingStore(args.store)
+        index = PriceIndex.build(store.price_rows())
+        store.close()
+        index.save(args.index)
+        print(f"📈 {index.summary()} → {args.index}")
+        return
+    index = PriceIndex.load(args.index)
+    if index is None:
+        print(f"❌ No index at {args.index} — run `python price_index.py rebuild` first.")
+        raise SystemExit(1)
+    found = index.lookup(args.make, args.model, args.year, args.km)
+    if not found:
+        print("— not enough comparables")
+        return
+    print(f"📊 {found['group']}: {found['n']} prices — p25 {found['p25']:,.0f} / "
+          f"median {found['median']:,.0f} / p75 {found['p75']:,.0f} CLP")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Offline GraphQL replay + parser benchmark harness (no browser, no login).
+
+  replay   Runs a directory of captured /api/graphql responses (the
+           graphql_response_NN.json files written by debug_graphql.py, or a
+           compressed capture ring — see graphql_capture.py) through
+           scrape_marketplace.parse_feed_units and checks the resulting rows
+           against a golden NDJSON file. Exit code 1 on any difference, so it
+           can run in CI to catch Facebook schema drift.
+
+  bench    Generates synthetic marketplace_search feeds (10k → 1M edges, with a
+           configurable duplicate rate) and measures edges parsed per second,
+           to see where parsing and dedup stop scaling.
+
+Usage:
+    python replay_graphql.py replay captures/ --golden golden_rows.ndjson
+    python replay_graphql.py replay captures/ --golden golden_rows.ndjson --update-golden
+    python replay_graphql.py bench --sizes 10000 100000 1000000 --dup-rate 0.3
+"""
+
+import argparse
+import contextlib
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import graphql_capture
+import scrape_marketplace as sm
+from graphql_prefilter import decode_graphql
+from listing_sink import ListingSink
+
+PAGE_SIZE = 24          # edges per synthetic feed page (what FB returns per request)
+
+CITIES = ["Viña del Mar", "Valparaíso", "Quilpué", "Santiago", "Concepción", "Rancagua", "Talca"]
+MODELS = ["Toyota Hilux", "Suzuki Swift", "Kia Morning", "Hyundai Tucson", "Chevrolet Sail", "Nissan Versa"]
+
+
+class _NullWriter:
+    def write(self, _):
+        return 0
+
+    def flush(self):
+        pass
+
+
+# ─── Corpus ─────────────────────────────────────────────────────────────────────
+def iter_corpus(directory: Path):
+    """Yield decoded payloads from every capture file in `directory`, in name
+    order, or from every record of a capture ring, oldest first."""
+    if graphql_capture.segments(directory):
+        for record in graphql_capture.iter_records(directory):
+            try:
+                yield f"#{record['seq']} {record.get('friendly_name') or '?'}", decode_graphql(record["body"])
+            except ValueError:
+                continue
+        return
+    for path in sorted(directory.glob("graphql_response_*.json")):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        try:
+            yield path.name, decode_graphql(text)
+        except ValueError:
+            continue
+
+
+def _fresh_sink(tmp: Path) -> ListingSink:
+    sink = ListingSink(tmp / "rows.ndjson", tmp / "qualified.ndjson", resume=False)
+    sink.open()
+    sm.reset_run_state(sink)
+    return sink
+
+
+def _rows(sink: ListingSink) -> list[dict]:
+    sink.close()
+    return sorted(sink.iter_rows(), key=lambda r: r["id"])
+
+
+def replay(directory: Path, golden: Path | None, update_golden: bool) -> int:
+    with tempfile.TemporaryDirectory(prefix="fb_replay_") as tmp:
+        sink = _fresh_sink(Path(tmp))
+        files = feed_pages = edges = 0
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(_NullWriter()):
+            for _, data in iter_corpus(directory):
+                files += 1
+                result = sm.parse_feed_units(data)
+                if result:
+                    feed_pages += 1
+                    edges += result[0]
+        elapsed = time.perf_counter() - t0
+        rows = _rows(sink)
+
+    print(f"📂 {files} captures → {feed_pages} feed pages, {edges} edges, {len(rows)} unique rows")
+    print(f"⏱️  {elapsed * 1000:.1f} ms ({edges / elapsed if elapsed else 0:,.0f} edges/s)")
+    if files and not feed_pages:
+        print("⚠️  No capture contained data.marketplace_search.feed_units — schema drift?")
+
+    if not golden:
+        return 0
+    if update_golden or not golden.exists():
+        with open(golden, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False, sort_keys=True) + "\n")
+        print(f"💾 Golden output written → {golden}")
+        return 0
+
+    with open(golden, encoding="utf-8") as f:
+        expected = [json.loads(line) for line in f if line.strip()]
+    return _diff_rows(expected, rows)
+
+
+def _diff_rows(expected: list[dict], actual: list[dict]) -> int:
+    exp = {r["id"]: r for r in expected}
+    act = {r["id"]: r for r in actual}
+    missing = sorted(exp.keys() - act.keys())
+    extra = sorted(act.keys() - exp.keys())
+    changed = [lid for lid in sorted(exp.keys() & act.keys()) if exp[lid] != act[lid]]
+    if not (missing or extra or changed):
+        print(f"✅ Matches golden output ({len(expected)} rows)")
+        return 0
+    print(f"❌ Golden mismatch: {len(missing)} missing, {len(extra)} extra, {len(changed)} changed")
+    for lid in changed[:10]:
+        diff = {k: (exp[lid].get(k), act[lid].get(k))
+                for k in exp[lid].keys() | act[lid].keys() if exp[lid].get(k) != act[lid].get(k)}
+        print(f"   {lid}: {diff}")
+    for lid in missing[:10]:
+        print(f"   missing: {lid}")
+    for lid in extra[:10]:
+        print(f"   extra:   {lid}")
+    return 1
+
+
+# ─── Synthetic feeds ────────────────────────────────────────────────────────────
+def _synthetic_listing(lid: int, rng: random.Random) -> dict:
+    price = rng.randrange(1_500_000, 35_000_000, 10_000)
+    return {
+        "id": str(lid),
+        "marketplace_listing_title": f"{rng.randrange(2005, 2025)} {rng.choice(MODELS)}",
+        "listing_price": {"amount": str(price), "formatted_amount": f"${price:,}".replace(",", ".")},
+        "location": {"reverse_geocode": {"city": rng.choice(CITIES)}},
+        "custom_sub_titles_with_rendering_flags": [{"subtitle": f"{rng.randrange(5, 250)} mil km"}],
+        "marketplace_listing_seller": {"name": f"Seller {lid % 5000}"},
+    }
+
+
+def synthetic_pages(n_edges: int, dup_rate: float, seed: int = 7):
+    """Yield feed payloads totalling `n_edges` edges; `dup_rate` of them repeat earlier ids."""
+    rng = random.Random(seed)
+    next_id = 10**15
+    edges = []
+    for _ in range(n_edges):
+        if next_id > 10**15 and rng.random() < dup_rate:
+            lid = rng.randrange(10**15, next_id)
+        else:
+            lid = next_id
+            next_id += 1
+        edges.append({"node": {"listing": _synthetic_listing(lid, rng)}})
+        if len(edges) == PAGE_SIZE:
+            yield {"data": {"marketplace_search": {"feed_units": {"edges": edges}}}}
+            edges = []
+    if edges:
+        yield {"data": {"marketplace_search": {"feed_units": {"edges": edges}}}}
+
+
+def bench(sizes: list[int], dup_rate: float):
+    print(f"{'edges':>10} | {'unique':>9} | {'parse s':>8} | {'edges/s':>10} | {'µs/edge':>8}")
+    print("-" * 58)
+    for n in sizes:
+        pages = list(synthetic_pages(n, dup_rate))
+        with tempfile.TemporaryDirectory(prefix="fb_bench_") as tmp:
+            sink = _fresh_sink(Path(tmp))
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(_NullWriter()):
+                for data in pages:
+                    sm.parse_feed_units(data)
+            elapsed = time.perf_counter() - t0
+            unique = len(sink)
+            sink.close()
+        print(f"{n:>10,} | {unique:>9,} | {elapsed:>8.2f} | {n / elapsed:>10,.0f} | {elapsed / n * 1e6:>8.1f}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("replay", help="run captured responses through parse_feed_units")
+    r.add_argument("directory", type=Path)
+    r.add_argument("--golden", type=Path, help="NDJSON file of expected rows")
+    r.add_argument("--update-golden", action="store_true", help="rewrite the golden file")
+
+    b = sub.add_parser("bench", help="benchmark the parser on synthetic feeds")
+    b.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    b.add_argument("--dup-rate", type=float, default=0.3)
+
+    args = ap.parse_args(argv)
+    if args.cmd == "replay":
+        return replay(args.directory, args.golden, args.update_golden)
+    bench(args.sizes, args.dup_rate)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Near-duplicate repost detection for the Marketplace scraper.
+
+Sellers delete and repost the same car, so one vehicle shows up under several
+listing ids with slightly different titles. RepostIndex groups those ids into
+one canonical vehicle as rows stream in, without comparing every pair:
+
+  1. The title is normalized and shingled (words + word bigrams) and reduced to
+     a NUM_PERM-value MinHash signature.
+  2. The signature is cut into BANDS bands of ROWS values; each band hashes,
+     together with the seller, to an LSH bucket key. Listings sharing any
+     bucket are the only candidates (titles with Jaccard ≳ 0.6 collide with
+     high probability). Keying by seller keeps buckets small even for titles
+     every dealer uses ("2015 Toyota Yaris") — a repost comes from the same
+     account anyway.
+  3. Each candidate is verified on the other fields — same city, price_clp
+     within tolerance, estimated title Jaccard ≥ MIN_JACCARD, and the same
+     car: km known on both sides and within tolerance, or else the same
+     year / make / model (listing_fields.py) known on both sides. A candidate
+     seen live in the same run is never a repost — the seller has both
+     listings up at once, so they are two cars.
+  4. A match joins the candidate's group (canonical_id = the first id seen);
+     otherwise the listing starts its own group.
+
+Buckets and groups live in SQLite (the listing store's database when there is
+one), so lookups are a handful of indexed reads per listing — the cost doesn't
+grow with the number of rows — and grouping carries over between runs.
+MinHash is pure Python, so the permuted hashes of recent shingles are cached
+and the scraper only assigns qualifying rows (the only ones that can be leads).
+
+    index = RepostIndex(store.conn)
+    canonical_ids = index.assign_many(rows, run=store.run_id)   # == row["id"] unless it is a repost
+"""
+
+import random
+import sqlite3
+import zlib
+from array import array
+from functools import lru_cache
+
+from chile_communes import normalize
+from listing_fields import parse_km
+
+NUM_PERM = 32                # MinHash values per title
+BANDS = 8                    # LSH bands (BANDS × ROWS == NUM_PERM)
+ROWS = 4
+MIN_JACCARD = 0.5            # estimated title similarity a candidate must reach
+PRICE_TOLERANCE = 0.15       # relative price difference still treated as the same car
+KM_TOLERANCE = 0.10          # relative odometer difference (sellers round differently)
+MAX_CANDIDATES = 64          # most recent bucket members verified per listing
+FEATURE_CACHE = 20_000       # shingles whose permuted hashes are kept (~200 bytes each)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repost_groups (
+    listing_id   TEXT PRIMARY KEY,
+    canonical_id TEXT NOT NULL,
+    price_clp    INTEGER,
+    km_num       INTEGER,
+    seller       TEXT,
+    city         TEXT,
+    signature    BLOB,
+    vehicle      TEXT,
+    last_run     INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_repost_groups_canonical ON repost_groups(canonical_id);
+
+CREATE TABLE IF NOT EXISTS repost_bands (
+    band_key   INTEGER NOT NULL,
+    listing_id TEXT NOT NULL,
+    PRIMARY KEY (band_key, listing_id)
+) WITHOUT ROWID;
+"""
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed → signatures stay comparable across runs
+_rng = random.Random(0x5EED)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(title: str) -> set[str]:
+    """Words and word bigrams of the normalized title."""
+    words = normalize(title or "").split()
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+@lru_cache(maxsize=FEATURE_CACHE)
+def _permuted(feature: str) -> array:
+    """The NUM_PERM permuted hashes of one shingle (makes, models and years repeat a lot)."""
+    h = zlib.crc32(feature.encode("utf-8"))
+    return array("I", [((a * h + b) % _PRIME) & _MAX_HASH for a, b in _PERMS])
+
+
+def minhash(features: set[str]) -> array:
+    """NUM_PERM-value MinHash signature (crc32 base hash, universal permutations)."""
+    if not features:
+        return array("I", [_MAX_HASH] * NUM_PERM)
+    return array("I", map(min, zip(*map(_permuted, features))))
+
+
+def band_keys(sig: array, seller: str = "") -> list[int]:
+    """One integer bucket key per band (band number in the high bits)."""
+    salt = zlib.crc32(seller.encode("utf-8"))
+    keys = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS:(band + 1) * ROWS]
+        h = zlib.crc32(chunk.tobytes(), salt) | (band << 32)
+        keys.append(h)
+    return keys
+
+
+def jaccard(a: array, b: array) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _close(a: int | None, b: int | None, tolerance: float) -> bool:
+    """Within relative tolerance; unknown values don't veto a match."""
+    if not a or not b:
+        return True
+    return abs(a - b) <= tolerance * max(a, b)
+
+
+def vehicle_key(row: dict) -> str | None:
+    """make | model | year, or None unless all three are known."""
+    if row.get("make") and row.get("model") and row.get("year"):
+        return f"{row['make']}|{row['model']}|{row['year']}"
+    return None
+
+
+def _same_car(km: int | None, c_km: int | None, vehicle: str | None, c_vehicle: str | None) -> bool:
+    """Positive evidence that two listings describe one car: both odometers
+    known and close, or (without them) the same known year / make / model."""
+    if vehicle and c_vehicle and vehicle != c_vehicle:
+        return False
+    if km and c_km:
+        return _close(km, c_km, KM_TOLERANCE)
+    return bool(vehicle) and vehicle == c_vehicle
+
+
+class RepostIndex:
+    """MinHash-LSH index grouping reposted listings under one canonical id."""
+
+    def __init__(self, conn: sqlite3.Connection | None = None):
+        self.conn = conn or sqlite3.connect(":memory:")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self.reposts = 0          # listings assigned to an existing group this session
+
+    def _migrate(self):
+        """Add columns introduced after a database was created."""
+        have = {r[1] for r in self.conn.execute("PRAGMA table_info(repost_groups)")}
+        with self.conn:
+            for col, sql_type in (("vehicle", "TEXT"), ("last_run", "INTEGER")):
+                if col not in have:
+                    self.conn.execute(f"ALTER TABLE repost_groups ADD COLUMN {col} {sql_type}")
+
+    def assign_many(self, rows: list[dict], run: int = 0) -> list[str]:
+        """Canonical ids for a batch of rows seen live in `run` (one transaction
+        per feed page). Listings of the same run never group with each other."""
+        if not rows:
+            return []
+        with self.conn:
+            known = self._known([row["id"] for row in rows])
+            self._mark_live(known, run)
+            return [known.get(row["id"]) or self.assign(row, run) for row in rows]
+
+    def seen_live(self, ids, run: int = 0):
+        """Record that indexed listings were re-sighted in `run` (not assigned again)."""
+        with self.conn:
+            self._mark_live(ids, run)
+
+    def _mark_live(self, ids, run: int):
+        self.conn.executemany("UPDATE repost_groups SET last_run = ? WHERE listing_id = ?",
+                              [(run, lid) for lid in ids])
+
+    def _known(self, ids: list[str]) -> dict[str, str]:
+        """listing id → canonical id for the ids already in the index."""
+        marks = ",".join("?" * len(ids))
+        return dict(self.conn.execute(
+            f"SELECT listing_id, canonical_id FROM repost_groups WHERE listing_id IN ({marks})", ids))
+
+    def assign(self, row: dict, run: int = 0) -> str:
+        """Return the canonical id for `row` (not in the index yet), registering it."""
+        lid = row["id"]
+        seller = normalize(row.get("seller") or "")
+        sig = minhash(shingles(row.get("title", "")))
+        keys = band_keys(sig, seller)
+        km_num = row["km_num"] if "km_num" in row else parse_km(row.get("km", ""))
+        fields = (row.get("price_clp") or None, km_num,
+                  seller, normalize(row.get("city") or ""))
+        vehicle = vehicle_key(row)
+        canonical = self._best_match(keys, sig, fields, vehicle, run) or lid
+        if canonical != lid:
+            self.reposts += 1
+
+        self.conn.execute(
+            "INSERT INTO repost_groups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (lid, canonical, *fields, sig.tobytes(), vehicle, run),
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO repost_bands VALUES (?, ?)", [(k, lid) for k in keys])
+        return canonical
+
+    def _best_match(self, keys: list[int], sig: array, fields: tuple, vehicle: str | None,
+                    run: int) -> str | None:
+        marks = ",".join("?" * len(keys))
+        candidates = self.conn.execute(
+            f"""
+            SELECT g.canonical_id, g.price_clp, g.km_num, g.seller, g.city, g.signature, g.vehicle
+            FROM repost_groups g
+            WHERE g.listing_id IN (SELECT listing_id FROM repost_bands WHERE band_key IN ({marks}))
+              AND g.last_run IS NOT ?
+            ORDER BY g.rowid DESC LIMIT {MAX_CANDIDATES}
+            """,
+            (*keys, run),
+        ).fetchall()
+        price, km, seller, city = fields
+        best, best_score = None, MIN_JACCARD
+        for canonical, c_price, c_km, c_seller, c_city, c_sig, c_vehicle in candidates:
+            if seller and c_seller and seller != c_seller:
+                continue
+            if city and c_city and city != c_city:
+                continue
+            if not (_close(price, c_price, PRICE_TOLERANCE) and _same_car(km, c_km, vehicle, c_vehicle)):
+                continue
+            score = jaccard(sig, array("I", c_sig))
+            if score >= best_score:
+                best, best_score = canonical, score
+        return best
+
+    def group(self, canonical_id: str) -> list[str]:
+        """All listing ids grouped under `canonical_id`."""
+        return [r[0] for r in self.conn.execute(
+            "SELECT listing_id FROM repost_groups WHERE canonical_id = ?", (canonical_id,))]
@@ -0,0 +1,87 @@
+"""
+Opt-in request router that aborts traffic the scrapers never use.
+
+The scrapers only read /api/graphql JSON, yet every scroll pulls full-size
+listing photos, video previews, fonts and tracking beacons. This installs a
+`route("**/*")` handler that aborts image / media / font requests and known
+analytics endpoints, and lets documents, scripts, XHR/fetch (GraphQL) and
+everything else through.
+
+Aborted requests never report a size, so "bytes saved" is an estimate: the
+number of blocked requests of each type × a typical size for that type.
+
+    stats = await install_resource_blocker(page)   # or a BrowserContext
+    …
+    print(stats.summary())
+"""
+
+from collections import Counter
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+# Hosts / path fragments of analytics & tracking requests
+BLOCKED_URL_PARTS = (
+    "facebook.com/tr/", "facebook.com/tr?",
+    "/ajax/bz", "/ajax/bnzai", "/ajax/webstorage/process_keys",
+    "/security/hsts-pixel",
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+)
+
+# Never block these, whatever their resource type
+ALLOWED_URL_PARTS = ("/api/graphql",)
+
+# Typical transfer sizes used to estimate bytes saved (bytes)
+TYPICAL_BYTES = {
+    "image": 60_000,
+    "media": 400_000,
+    "font": 40_000,
+    "tracking": 1_000,
+}
+
+
+class BlockStats:
+    def __init__(self):
+        self.blocked: Counter[str] = Counter()
+        self.allowed = 0
+
+    @property
+    def total_blocked(self) -> int:
+        return sum(self.blocked.values())
+
+    @property
+    def bytes_saved(self) -> int:
+        return sum(TYPICAL_BYTES.get(kind, 0) * n for kind, n in self.blocked.items())
+
+    def summary(self) -> str:
+        parts = ", ".join(f"{kind}={n}" for kind, n in self.blocked.most_common())
+        return (f"blocked {self.total_blocked} requests ({parts or 'none'}) "
+                f"≈ {self.bytes_saved / 1_048_576:.1f} MB saved")
+
+
+def classify(url: str, resource_type: str) -> str | None:
+    """Return the block category for a request, or None to let it through."""
+    if any(part in url for part in ALLOWED_URL_PARTS):
+        return None
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return resource_type
+    if any(part in url for part in BLOCKED_URL_PARTS):
+        return "tracking"
+    return None
+
+
+async def install_resource_blocker(target) -> BlockStats:
+    """Route every request of `target` (Page or BrowserContext) through the filter."""
+    stats = BlockStats()
+
+    async def _route(route):
+        request = route.request
+        kind = classify(request.url, request.resource_type)
+        if kind:
+            stats.blocked[kind] += 1
+            await route.abort()
+        else:
+            stats.allowed += 1
+            await route.continue_()
+
+    await target.route("**/*", _route)
+    return stats
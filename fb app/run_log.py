@@ -0,0 +1,174 @@
+"""
+Non-blocking event log and live status line for the Marketplace scraper.
+
+Printing a formatted line for every listing and every scroll is synchronous
+terminal I/O on the same event loop that handles GraphQL responses. This
+module splits that output in two:
+
+  • event(kind, **fields) — per-listing / per-scroll records. The call only
+    puts the record on a queue (logging.QueueHandler); a background
+    QueueListener thread serializes it to NDJSON in a rotating file
+    (EVENT_LOG_FILE, max_bytes × backups).
+  • status(text) — one live console line, redrawn in place with `\\r` at most
+    every `status_interval` seconds (a plain line every NON_TTY_INTERVAL
+    seconds when stdout is not a terminal, e.g. under cron).
+
+say(msg) is for the occasional message (navigation, end of feed, summary):
+it clears the status line first so the two don't interleave. In quiet mode
+status() and echo() print nothing, so the hot path does no console I/O at
+all; say() still prints.
+
+    run_log.configure(EVENT_LOG_FILE, quiet=QUIET)
+    run_log.event("listing", id=lid, qualifies=True)
+    run_log.status("Scroll 12 — 40/500 qualifying …")
+    run_log.shutdown()
+"""
+
+import json
+import logging
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+MAX_BYTES = 20 * 1024 * 1024   # rotate the event log at this size
+BACKUPS = 5                    # rotated files kept
+STATUS_INTERVAL = 0.5          # seconds between status-line redraws on a terminal
+NON_TTY_INTERVAL = 10.0        # seconds between status lines when not on a terminal
+
+_LOGGER_NAME = "fb_marketplace.events"
+
+
+class _NdjsonFormatter(logging.Formatter):
+    """Runs on the listener thread: one JSON object per event."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        ts = datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds")
+        return json.dumps({"ts": ts, **record.msg}, ensure_ascii=False, default=str)
+
+
+class _PassThroughQueueHandler(QueueHandler):
+    """Queue the record as-is — formatting happens on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class RunLog:
+    def __init__(self, path: Path | None = None, *, quiet: bool = False, max_bytes: int = MAX_BYTES,
+                 backups: int = BACKUPS, status_interval: float = STATUS_INTERVAL, stream=None):
+        self.path = Path(path) if path else None
+        self.quiet = quiet
+        self.status_interval = status_interval
+        self._stream = stream
+        self.events = 0
+        self._last_status = 0.0
+        self._status_shown = False
+        self._listener: QueueListener | None = None
+        self._file_handler: RotatingFileHandler | None = None
+        self._logger = logging.getLogger(_LOGGER_NAME)
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        if self.path:
+            self._file_handler = RotatingFileHandler(self.path, maxBytes=max_bytes, backupCount=backups,
+                                                     encoding="utf-8")
+            self._file_handler.setFormatter(_NdjsonFormatter())
+            q: queue.SimpleQueue = queue.SimpleQueue()
+            self._handler = _PassThroughQueueHandler(q)
+            self._logger.addHandler(self._handler)
+            self._listener = QueueListener(q, self._file_handler)
+            self._listener.start()
+
+    @property
+    def stream(self):
+        # Resolved on each use so contextlib.redirect_stdout still applies
+        return self._stream or sys.stdout
+
+    @property
+    def tty(self) -> bool:
+        isatty = getattr(self.stream, "isatty", None)
+        return bool(isatty and isatty())
+
+    def event(self, kind: str, **fields):
+        """Queue one structured event for the background writer (never blocks)."""
+        if self._listener:
+            self.events += 1
+            self._logger.info({"kind": kind, **fields})
+
+    def status(self, text: str, *, force: bool = False):
+        """Redraw the live status line (rate limited)."""
+        if self.quiet:
+            return
+        now = time.monotonic()
+        interval = self.status_interval if self.tty else NON_TTY_INTERVAL
+        if not force and now - self._last_status < interval:
+            return
+        self._last_status = now
+        if self.tty:
+            self.stream.write(f"\r\x1b[K{text}")
+            self._status_shown = True
+        else:
+            self.stream.write(text + "\n")
+        self.stream.flush()
+
+    def echo(self, msg: str):
+        """Hot-path console line (e.g. a qualifying lead) — silent in quiet mode."""
+        if not self.quiet:
+            self.say(msg)
+
+    def say(self, msg: str):
+        """Print a message above the status line."""
+        if self._status_shown:
+            self.stream.write("\r\x1b[K")
+            self._status_shown = False
+            self._last_status = 0.0
+        self.stream.write(msg + "\n")
+        self.stream.flush()
+
+    def shutdown(self):
+        if self._status_shown:
+            self.stream.write("\n")
+            self._status_shown = False
+        if self._listener:
+            self._listener.stop()       # drains the queue, then joins the thread
+            self._listener = None
+            self._logger.removeHandler(self._handler)
+            self._file_handler.close()
+
+
+# ─── Module-level default (like `logging`) ──────────────────────────────────────
+_current = RunLog()
+
+
+def configure(path: Path | None = None, **kwargs) -> RunLog:
+    """Replace the default console-only log; returns the new RunLog."""
+    global _current
+    _current.shutdown()
+    _current = RunLog(path, **kwargs)
+    return _current
+
+
+def current() -> RunLog:
+    return _current
+
+
+def event(kind: str, **fields):
+    _current.event(kind, **fields)
+
+
+def status(text: str, *, force: bool = False):
+    _current.status(text, force=force)
+
+
+def echo(msg: str):
+    _current.echo(msg)
+
+
+def say(msg: str):
+    _current.say(msg)
+
+
+def shutdown():
+    _current.shutdown()
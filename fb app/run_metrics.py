@@ -0,0 +1,234 @@
+"""
+Run metrics for the Marketplace scraper: counters, gauges and histograms,
+exported per run as a Prometheus text file and as one JSON line.
+
+Recorded by scrape_marketplace.py:
+
+  scroll_response_latency_seconds   scroll → first feed page parsed (histogram)
+  scroll_timeouts_total             scrolls with no feed page within PAGE_TIMEOUT
+  graphql_payload_bytes             body size of feed-candidate responses (histogram)
+  parse_seconds                     decode + parse time per feed response (histogram)
+  new_listings_per_page             listings new to the run per feed page (histogram)
+  feed_edges_total / feed_edges_duplicate_total
+                                    → dedup hit rate (duplicate / total)
+  graphql_http_errors_total         non-2xx /api/graphql responses (throttling shows here)
+  browser_js_heap_bytes             per-tab JS heap, sampled over CDP (gauge, peak kept)
+  browser_dom_nodes                 per-tab DOM node count (gauge, peak kept)
+
+The Prometheus file is written atomically (node_exporter's textfile collector
+can pick it up); the JSON line per run, with p50/p95/max per histogram, is
+what you diff between runs to prove a tuning change helped.
+"""
+
+import bisect
+import json
+import os
+import random
+import time
+from pathlib import Path
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20)
+BYTES_BUCKETS = (4_096, 16_384, 65_536, 131_072, 262_144, 524_288, 1_048_576, 2_097_152, 4_194_304)
+PARSE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 12, 16, 24, 32, 48)
+PREFIX = "fb_marketplace_"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def total(self) -> float:
+        return sum(self.values.values())
+
+    def exposition(self) -> list[str]:
+        return [f"{PREFIX}{self.name}{_labels(dict(k))} {v:g}" for k, v in self.values.items()]
+
+    def summary(self):
+        return self.total()
+
+
+class Gauge(Counter):
+    """Last value per label set, plus the peak seen during the run."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self.peak: float | None = None
+
+    def set(self, value: float, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+        self.peak = value if self.peak is None else max(self.peak, value)
+
+    def summary(self):
+        last = {",".join(f"{k}={v}" for k, v in key): v for key, v in self.values.items()}
+        return {"last": last, "peak": self.peak}
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus semantics). A uniform sample of the
+    raw observations is kept too (reservoir sampling, at most `keep`), so the
+    run summary's quantiles cover the whole run, exactly up to `keep`
+    observations and as estimates beyond; max is always exact."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple, keep: int = 50_000):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.keep = keep
+        self.samples: list[float] = []
+        self.max: float | None = None
+        self._rng = random.Random(0)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.samples) < self.keep:
+            self.samples.append(value)
+        else:
+            # Algorithm R: every observation so far is kept with probability keep / count
+            slot = self._rng.randrange(self.count)
+            if slot < self.keep:
+                self.samples[slot] = value
+
+    def quantile(self, q: float) -> float | None:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def exposition(self) -> list[str]:
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            lines.append(f'{PREFIX}{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{PREFIX}{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{PREFIX}{self.name}_sum {self.sum:g}")
+        lines.append(f"{PREFIX}{self.name}_count {self.count}")
+        return lines
+
+    def summary(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "mean": round(self.sum / self.count, 6),
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "max": self.max}
+
+
+class RunMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self.scroll_latency = Histogram("scroll_response_latency_seconds",
+                                        "Scroll to first parsed feed page", LATENCY_BUCKETS)
+        self.scroll_timeouts = Counter("scroll_timeouts_total", "Scrolls with no feed page in time")
+        self.payload_bytes = Histogram("graphql_payload_bytes", "Feed-candidate GraphQL body size",
+                                       BYTES_BUCKETS)
+        self.parse_seconds = Histogram("parse_seconds", "Decode + parse time per feed response",
+                                       PARSE_BUCKETS)
+        self.new_per_page = Histogram("new_listings_per_page", "Listings new to the run per feed page",
+                                      COUNT_BUCKETS)
+        self.edges = Counter("feed_edges_total", "Feed edges parsed")
+        self.duplicate_edges = Counter("feed_edges_duplicate_total", "Feed edges already seen this run")
+        self.http_errors = Counter("graphql_http_errors_total", "Non-2xx /api/graphql responses")
+        self.js_heap = Gauge("browser_js_heap_bytes", "JS heap used per tab (CDP Performance)")
+        self.dom_nodes = Gauge("browser_dom_nodes", "DOM nodes per tab (CDP Performance)")
+        self.info: dict = {}
+        self.exported = False      # written to the metric files already
+
+    def all(self):
+        return [self.scroll_latency, self.scroll_timeouts, self.payload_bytes, self.parse_seconds,
+                self.new_per_page, self.edges, self.duplicate_edges, self.http_errors,
+                self.js_heap, self.dom_nodes]
+
+    @property
+    def dedup_hit_rate(self) -> float:
+        total = self.edges.total()
+        return self.duplicate_edges.total() / total if total else 0.0
+
+    def page_parsed(self, edges: int, new: int):
+        self.edges.inc(edges)
+        self.duplicate_edges.inc(edges - new)
+        self.new_per_page.observe(new)
+
+    async def sample_browser(self, cdp, search: str):
+        """Record one tab's JS heap / DOM size from a CDP session (Chromium only)."""
+        try:
+            result = await cdp.send("Performance.getMetrics")
+        except Exception:
+            return
+        values = {m["name"]: m["value"] for m in result.get("metrics", [])}
+        if "JSHeapUsedSize" in values:
+            self.js_heap.set(values["JSHeapUsedSize"], search=search)
+        if "Nodes" in values:
+            self.dom_nodes.set(values["Nodes"], search=search)
+
+    # ── Export ─────────────────────────────────────────────────────────────────
+    def prometheus(self) -> str:
+        lines = []
+        for metric in self.all():
+            lines.append(f"# HELP {PREFIX}{metric.name} {metric.help}")
+            lines.append(f"# TYPE {PREFIX}{metric.name} {metric.kind}")
+            lines.extend(metric.exposition())
+        lines.append(f"# TYPE {PREFIX}dedup_hit_ratio gauge")
+        lines.append(f"{PREFIX}dedup_hit_ratio {self.dedup_hit_rate:.4f}")
+        lines.append(f"# TYPE {PREFIX}run_info gauge")
+        lines.append(f"{PREFIX}run_info{_labels(self.info)} 1")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path):
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(self.prometheus(), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def summary(self) -> dict:
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "duration_s": round(time.time() - self.started, 1),
+            **self.info,
+            "dedup_hit_rate": round(self.dedup_hit_rate, 4),
+            **{metric.name: metric.summary() for metric in self.all()},
+        }
+
+    def append_json(self, path: Path):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.summary(), ensure_ascii=False) + "\n")
+
+    def report(self) -> str:
+        lat = self.scroll_latency.summary()
+        parse = self.parse_seconds.summary()
+        size = self.payload_bytes.summary()
+        parts = [f"dedup hit rate {self.dedup_hit_rate:.0%}"]
+        if lat["count"]:
+            parts.append(f"scroll→page p50 {lat['p50']:.2f}s / p95 {lat['p95']:.2f}s")
+        parts.append(f"{self.scroll_timeouts.total():g} scroll timeouts")
+        if parse["count"]:
+            parts.append(f"parse p95 {parse['p95'] * 1000:.1f} ms")
+        if size["count"]:
+            parts.append(f"payload p50 {size['p50'] / 1024:.0f} KiB")
+        if self.js_heap.peak is not None:
+            parts.append(f"peak JS heap {self.js_heap.peak / 1e6:.0f} MB")
+        if self.http_errors.total():
+            parts.append(f"{self.http_errors.total():g} GraphQL HTTP errors")
+        return ", ".join(parts)
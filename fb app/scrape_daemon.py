@@ -0,0 +1,255 @@
+"""
+Long-running incremental scrape scheduler for scrape_marketplace.py.
+
+Instead of one manual run a day, the daemon keeps one warm browser (the
+session from scrape_marketplace.main — log in once) and runs the configured
+SEARCHES every INTERVAL_MINUTES, newest listings first:
+
+  • listings the store already has are not new (SKIP_KNOWN: the persisted
+    Bloom filter of seen ids answers most edges, possible hits are checked
+    against the store): they only get a cheap refresh of price / title / km
+    and last_seen in the store, so price history and drop alerts keep
+    working, but they are not exported, scored or enriched again
+  • each search remembers the first FIRST_IDS_KEPT listings it served (the
+    newest, given SORT) as its high-water mark; the next cycle stops that
+    search once HIGH_WATER_HITS of them come back — it has read down to
+    where the previous cycle started. END_OF_FEED_EMPTY_PAGES pages with
+    nothing new stop it too, when the mark has scrolled out of the feed
+  • every cycle is its own run in the listing store, with its own Parquet
+    part files (run_id, scrape_date), metrics and counters; its new
+    qualifying leads go to LEADS_DIR/leads-<time>-c<cycle>.csv and its
+    price drops of at least PRICE_DROP_ALERT_PCT to
+    LEADS_DIR/drops-<time>-c<cycle>.csv (nothing is written when a cycle
+    finds none). Per-run state is dropped at the end of each cycle, so
+    memory doesn't grow with the daemon's uptime
+  • the schedule, per-search results and high-water marks are checkpointed
+    to STATE_FILE, and the seen-id filter and price index to
+    SEEN_FILTER_FILE / PRICE_INDEX_FILE, after every cycle, so a restarted
+    daemon keeps its cycle numbering and waits for the next slot instead
+    of scraping again straight away
+  • cycles only start within ACTIVE_HOURS; the interval is jittered by
+    INTERVAL_JITTER so requests don't arrive on the minute
+  • the daemon stops when the session expires (a person has to log in again)
+    or after MAX_FAILURES cycles in a row fail — run it under systemd /
+    launchd to have it restarted
+
+Usage:
+    python scrape_daemon.py [--interval 10] [--cycles 0]
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import parquet_export
+import run_log
+import scrape_marketplace as sm
+import session_cache
+
+INTERVAL_MINUTES = 10        # cycle start to cycle start
+INTERVAL_JITTER = 0.2        # ± this share of the interval
+ACTIVE_HOURS = (7, 23)       # local hours [start, end) in which cycles start (None → always)
+SORT = "creation_time_descend"   # feed order for incremental cycles (newest first)
+MAX_CYCLES = 0               # 0 → run until stopped
+MAX_FAILURES = 3             # consecutive failed cycles before the daemon gives up
+STATE_FILE = Path(__file__).parent / "scrape_daemon_state.json"
+LEADS_DIR = Path(__file__).parent / "daemon_leads"
+HIGH_WATER_HITS = 3          # previous cycle's newest listings to see again before a search stops
+
+
+# ─── Checkpoint ─────────────────────────────────────────────────────────────────
+def load_state() -> dict:
+    try:
+        return json.loads(STATE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict):
+    tmp = STATE_FILE.with_name(STATE_FILE.name + ".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, STATE_FILE)
+
+
+# ─── Schedule ───────────────────────────────────────────────────────────────────
+def next_slot(after: float) -> float:
+    """Epoch time of the next cycle start: one jittered interval after `after`,
+    pushed to the start of ACTIVE_HOURS when it falls outside them."""
+    jitter = 1 + random.uniform(-INTERVAL_JITTER, INTERVAL_JITTER)
+    when = datetime.fromtimestamp(after + INTERVAL_MINUTES * 60 * jitter)
+    if ACTIVE_HOURS:
+        start, end = ACTIVE_HOURS
+        if when.hour >= end:
+            when = (when + timedelta(days=1)).replace(hour=start, minute=0, second=0, microsecond=0)
+        elif when.hour < start:
+            when = when.replace(hour=start, minute=0, second=0, microsecond=0)
+    return when.timestamp()
+
+
+async def _sleep_until(when: float):
+    delay = when - time.time()
+    if delay > 0:
+        run_log.say(f"💤 Next cycle at {datetime.fromtimestamp(when):%H:%M:%S} "
+                    f"({delay / 60:.1f} min)")
+        await asyncio.sleep(delay)
+
+
+# ─── Cycle ──────────────────────────────────────────────────────────────────────
+def write_leads(cycle: int, leads, kind: str = "leads") -> Path | None:
+    """This cycle's store rows (new leads, price drops) as one CSV (None when there are none)."""
+    if not leads:
+        return None
+    LEADS_DIR.mkdir(parents=True, exist_ok=True)
+    path = LEADS_DIR / f"{kind}-{datetime.now():%Y%m%d-%H%M%S}-c{cycle:05d}.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(leads[0].keys())
+        writer.writerows(tuple(row) for row in leads)
+    return path
+
+
+async def _session_valid(context) -> bool:
+    if not sm._is_facebook(sm.FB_HOME):
+        return True
+    page = await context.new_page()
+    try:
+        return await session_cache.is_logged_in(context, page, sm.FB_HOME)
+    finally:
+        await page.close()
+
+
+def _start_cycle_run():
+    """Open the next store run and give it its own exporter and metrics."""
+    sm.store.start_run()
+    if sm.exporter:
+        sm.exporter.close()
+        sm.exporter = parquet_export.ParquetExporter(sm.PARQUET_DIR, run_id=sm.store.run_id)
+    sm.metrics = sm.new_run_metrics()
+    sm.graphql_count = 0
+
+
+def _end_cycle_run():
+    """Drop per-run state that would otherwise grow for as long as the daemon
+    runs. SearchRuns (with their band filters) are new every cycle, and the
+    photo downloader and enricher forget a listing once it is done."""
+    if sm.capture_ring:
+        sm.capture_ring.write_urls(reset=True)
+
+
+async def run_cycle(context, cycle: int, first: bool, high_water: dict) -> tuple[list, dict]:
+    """Run every search once, newest first. Returns (SearchRuns, cycle record).
+    `high_water` maps search name → first ids of its last cycle and is updated."""
+    store = sm.store
+    if not first:
+        _start_cycle_run()
+    sm.qualifying_count = sm.qualifying_at_start = 0
+    sm.new_count = 0
+    sm.run_clock = time.monotonic()
+    seen_before = len(sm.sink)
+    started = time.time()
+
+    runs = [sm.SearchRun({**search, "sort": search.get("sort") or SORT}) for search in sm.SEARCHES]
+    for run in runs:
+        run.stop_at = set(high_water.get(run.name, ()))
+        run.stop_at_hits = HIGH_WATER_HITS
+    slots = asyncio.Semaphore(sm.MAX_CONCURRENT_PAGES)
+    await asyncio.gather(*(sm.scrape_search(context, run, slots) for run in runs))
+
+    stop_reason = sm._overall_stop_reason(runs)
+    leads = store.new_in_run(store.run_id, qualifying_only=True)
+    drops = store.price_drops(sm.PRICE_DROP_ALERT_PCT, run_id=store.run_id)
+    store.finish_run(seen=len(sm.sink) - seen_before, new=sm.new_count, stop_reason=stop_reason)
+    for run in runs:
+        if run.first_ids:           # keep the old mark when the feed served nothing
+            high_water[run.name] = run.first_ids
+    if sm.exporter:
+        sm.exporter.flush()
+    sm.write_metrics(stop_reason)
+    _end_cycle_run()
+    if sm.seen is not None:
+        sm.seen.save(sm.SEEN_FILTER_FILE)
+    if sm.market is not None:
+        sm.market.save(sm.PRICE_INDEX_FILE)
+    path = write_leads(cycle, leads)
+    drops_path = write_leads(cycle, drops, "drops")
+    record = {
+        "cycle": cycle,
+        "run_id": store.run_id,
+        "started_at": datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+        "duration_s": round(time.time() - started, 1),
+        "parsed": len(sm.sink) - seen_before,
+        "new": sm.new_count,
+        "new_leads": len(leads),
+        "leads_file": path.name if path else None,
+        "refreshed": sum(run.refreshed for run in runs),
+        "price_drops": len(drops),
+        "drops_file": drops_path.name if drops_path else None,
+        "searches": {run.name: {"pages": run.scheduler.pages, "new": run.new, "refreshed": run.refreshed,
+                                "stop_reason": run.stop_reason}
+                     for run in runs},
+    }
+    run_log.event("cycle", **record)
+    shown = f" → {path}" if path else ""
+    run_log.say(f"🕒 Cycle {cycle}: {record['parsed']} unseen listings, {sm.new_count} new to the store, "
+                f"{record['refreshed']} refreshed, {len(leads)} new leads{shown}, {len(drops)} price drops "
+                f"({record['duration_s']:.0f}s)")
+    return runs, record
+
+
+async def daemon(context, runs: list):
+    """scrape_marketplace.main() driver: incremental cycles on a schedule."""
+    if sm.store is None:
+        run_log.say("❌ The daemon needs the listing store (STORE_FILE) to tell new listings from seen ones.")
+        return
+    state = load_state()
+    cycle = state.get("cycle", 0)
+    sm.SKIP_KNOWN = True
+    run_log.say(f"\n🔁 Daemon: every {INTERVAL_MINUTES:g} min (±{INTERVAL_JITTER:.0%}), "
+                f"{len(sm.SEARCHES)} searches, only refreshing the {sm.store.count()} listings already stored "
+                f"— resuming after cycle {cycle}")
+
+    first, failures, done = True, 0, 0
+    while not MAX_CYCLES or done < MAX_CYCLES:
+        await _sleep_until(state.get("next_run_at", 0))
+        if not await _session_valid(context):
+            run_log.say("⚠️  Facebook session expired — log in again and restart the daemon.")
+            return
+        cycle += 1
+        started = time.time()
+        try:
+            cycle_runs, record = await run_cycle(context, cycle, first, state.setdefault("high_water", {}))
+            runs[:] = cycle_runs            # main()'s final report shows the last cycle
+            state["last_cycle"] = record
+            failures = 0
+        except Exception as e:
+            failures += 1
+            run_log.say(f"  ⚠️  Cycle {cycle} failed ({failures}/{MAX_FAILURES}): {e}")
+            if failures >= MAX_FAILURES:
+                raise
+        first = False
+        done += 1
+        state.update(cycle=cycle, next_run_at=next_slot(started))
+        save_state(state)
+
+
+def main():
+    global INTERVAL_MINUTES, MAX_CYCLES
+    ap = argparse.ArgumentParser(description="Incremental Marketplace scrapes on a schedule")
+    ap.add_argument("--interval", type=float, default=INTERVAL_MINUTES, help="minutes between cycles")
+    ap.add_argument("--cycles", type=int, default=MAX_CYCLES, help="stop after this many cycles (0 → never)")
+    args = ap.parse_args()
+    INTERVAL_MINUTES, MAX_CYCLES = args.interval, args.cycles
+    try:
+        asyncio.run(sm.main(driver=daemon))
+    except KeyboardInterrupt:
+        print("\n👋 Daemon stopped.")
+
+
+if __name__ == "__main__":
+    main()
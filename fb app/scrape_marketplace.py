@@ -1,60 +1,242 @@
 """
-Facebook Marketplace - GraphQL Scraper (smart V-Region filtering)
+Facebook Marketplace - GraphQL Scraper (smart region filtering)
 Uses Playwright to intercept /api/graphql/ responses from FB Marketplace
 and parse the confirmed structure:
   data.marketplace_search.feed_units.edges[].node.listing
 
-SMART STOP: Stops when 500 qualifying V-Region leads (≥4M CLP) are found,
-            or after 2000 scrolls (safety limit).
+SMART STOP: Stops when 500 qualifying target-region leads (≥4M CLP) are found,
+            when the feed runs dry, when the marginal yield of qualifying leads
+            drops below MIN_MARGINAL_YIELD, or after 2000 scrolls (safety limit).
 
-REQUIREMENT: Close Google Chrome before running (profile must not be locked).
+REQUIREMENT: For the profile-copy fallback, close Google Chrome before running
+             (profile must not be locked).
 """
 
 import asyncio
 import csv
 import json
+import os
 import shutil
 import tempfile
+import time
 from pathlib import Path
-from playwright.async_api import async_playwright
+from urllib.parse import urlencode, urlsplit
+
+import graphql_capture
+import parquet_export
+import photo_downloader
+import price_index
+import run_log
+import session_cache
+from chile_communes import RegionFilter
+from cursor_pagination import MarketplaceQueryCapture
+from graphql_prefilter import FeedDecoder, is_candidate_request, looks_like_feed, request_names
+from listing_enricher import ListingEnricher
+from listing_fields import FieldExtractor
+from listing_sink import ListingSink
+from listing_store import ListingStore
+from repost_index import RepostIndex
+from resource_blocker import install_resource_blocker
+from run_metrics import RunMetrics
+from scroll_scheduler import AdaptiveScrollScheduler, MarginalYieldStop
+from seen_filter import SeenFilter
 
 # ─── Config ─────────────────────────────────────────────────────────────────────
-TARGET_URL = (
-    "https://www.facebook.com/marketplace/106647439372422/search/"
-    "?minPrice=4000000&query=Vehicles&exact=false&radius=20"
-)
-OUTPUT_FILE  = Path(__file__).parent / "facebook_graphql_vehicles.csv"
+# Each search runs in its own tab; all feed the same dedup store.
+# Keys: name, location_id, query, min_price, max_price, radius (km),
+#       sort (e.g. "creation_time_descend" — newest first)
+SEARCHES = [
+    {"name": "vehicles", "location_id": "106647439372422", "query": "Vehicles",
+     "min_price": 4_000_000, "radius": 20},
+    # {"name": "suv", "location_id": "106647439372422", "query": "SUV",
+    #  "min_price": 4_000_000, "max_price": 15_000_000, "radius": 40},
+    # {"name": "camioneta", "location_id": "106647439372422", "query": "camioneta",
+    #  "min_price": 4_000_000, "radius": 60},
+]
+MAX_CONCURRENT_PAGES = 3     # searches scraped at the same time (one tab each)
+OUTPUT_FILE  = Path(__file__).parent / "facebook_graphql_vehicles.csv"   # .ndjson → NDJSON stream
+QUALIFIED_FILE = OUTPUT_FILE.with_name("facebook_qualified_v_region" + OUTPUT_FILE.suffix)
+RESUME       = True          # pick up from the last flushed record of a previous run
+STORE_FILE   = Path(__file__).parent / "marketplace_listings.db"   # None → no cross-run store
+SEEN_FILTER_FILE = Path(__file__).parent / "seen_ids.bloom"   # Bloom filter of stored ids (None → off)
+PRICE_INDEX_FILE = price_index.INDEX_FILE   # market prices for deal_score (None → off; needs numpy)
+SKIP_KNOWN   = False         # only refresh listings the store already has (scrape_daemon.py turns this on)
+FIRST_IDS_KEPT = 24          # first distinct ids recorded per search (scrape_daemon.py high-water mark)
+PRICE_DROP_ALERT_PCT = 5.0   # report re-sighted listings whose price fell at least this much (%)
+PRICE_DROP_FILE = Path(__file__).parent / "facebook_price_drops.csv"   # this run's drops (None → skip)
+PARQUET_DIR  = parquet_export.DATASET_DIR   # typed columnar export (None → off; needs pyarrow)
+ENRICH_DETAILS = True        # visit qualifying listings' item pages for details (listing_enricher.py)
+ENRICH_WORKERS = 2           # item-page tabs, on top of the search tabs
+ENRICH_RATE_PER_MINUTE = 20  # item-page visits per minute, all workers together
+ENRICH_DRAIN_TIMEOUT = 120   # after the feed is done, keep enriching queued leads this many seconds
+DOWNLOAD_PHOTOS = True       # download qualifying leads' photos (photo_downloader.py)
+PHOTO_DIR    = Path(__file__).parent / "lead_photos"
+PHOTO_WORKERS = 4            # concurrent image downloads
+PHOTO_DRAIN_TIMEOUT = 60     # after the feed (and enrichment) is done, keep downloading this long
+DETECT_REPOSTS = True        # group reposted cars under one canonical_id (repost_index.py)
 MAX_SCROLLS  = 2000          # safety cap — never scroll more than this
 TARGET_LEADS = 500           # stop early when we reach this many qualifying leads
 MIN_PRICE    = 4_000_000     # 4 million CLP minimum
 SCROLL_PX    = 1200
-SCROLL_DELAY = 2.5
+SCROLL_MIN_PAUSE = 0.3       # pause after a scroll that produced new listings
+SCROLL_MAX_PAUSE = 10.0      # exponential back-off ceiling when nothing new arrives
+PAGE_TIMEOUT = 6.0           # how long to wait for a feed response after each scroll
+END_OF_FEED_EMPTY_PAGES = 6  # feed pages in a row with no new listings → end of feed
+END_OF_FEED_IDLE_SCROLLS = 15  # scrolls in a row with no feed response → end of feed
+YIELD_WINDOW_STEPS = 40      # sliding window (scrolls / replayed pages) for the marginal-yield stop
+YIELD_MIN_PAGES = 10         # … judged only once the window holds this many feed pages
+MIN_MARGINAL_YIELD = 0.05    # stop a search below this many new qualifying leads per feed page
+BAND_FILTER_CAPACITY = 100_000  # distinct ids per price band tracked at ~0.1% false positives (plan_price_bands.py)
+RUN_SUMMARY_FILE = Path(__file__).parent / "scrape_runs.ndjson"   # one JSON line per run
+EVENT_LOG_FILE = Path(__file__).parent / "scrape_events.ndjson"   # per-listing / per-scroll events (None → off)
+QUIET        = False         # no status line and no per-lead lines on the console
+METRICS_PROM_FILE = Path(__file__).parent / "scrape_metrics.prom"     # latest run (None → off)
+METRICS_JSON_FILE = Path(__file__).parent / "scrape_metrics.ndjson"   # one line per run (None → off)
+MEMORY_SAMPLE_EVERY = 25     # sample each tab's JS heap / DOM size every this many scrolls / pages
+PAGINATION_MODE = "scroll"   # "scroll" → DOM scrolling | "cursor" → replay GraphQL with end_cursor
+BLOCK_RESOURCES = False      # abort images / media / fonts / analytics (GraphQL + documents still load)
+CAPTURE_SCROLLS = 20         # cursor mode: scrolls allowed to capture the first feed request
+REPLAY_DELAY = 0.5           # cursor mode: pause between replayed pages (politeness)
+GRAPHQL_CAPTURE_DIR = graphql_capture.CAPTURE_DIR   # ring of raw feed responses (None → off)
+GRAPHQL_CAPTURE_MAX_BYTES = 256 * 1024 * 1024      # … oldest segments deleted beyond this
+OFFLOAD_BYTES = 512 * 1024   # GraphQL bodies larger than this are decoded in a worker process
 CHROME_USER_DATA = Path.home() / "Library/Application Support/Google/Chrome"
+SESSION_CACHE_FILE = Path(__file__).parent / ".fb_session.enc"   # None → always copy the profile
+FB_HOME = os.environ.get("FB_HOME", "https://www.facebook.com").rstrip("/")   # mock_marketplace_server.py for load tests
+LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled"]
+VIEWPORT = {"width": 1280, "height": 900}
 
-# ─── V Region communes (lowercase) ─────────────────────────────────────────────
-V_REGION_COMMUNES = {
-    "viña del mar", "vina del mar", "concón", "concon",
-    "valparaíso", "valparaiso", "quilpué", "quilpue",
-    "villa alemana", "quintero", "limache", "olmué", "olmue",
-    "casablanca", "quillota", "la cruz", "puchuncaví", "puchuncavi",
-    "calera", "nogales", "hijuelas", "algarrobo",
-    "el quisco", "el tabo", "san antonio", "cartagena", "santo domingo",
-}
+# ─── Target regions ────────────────────────────────────────────────────────────
+# Region names or codes from chile_communes.GAZETTEER / REGION_CODES, e.g.
+# {"Valparaíso"}, {"V", "RM", "Biobío"}. The `v_region` column means "in a
+# target region".
+TARGET_REGIONS = {"Valparaíso"}
 
 # ─── Global store ───────────────────────────────────────────────────────────────
-vehicles: dict[str, dict] = {}
-qualifying_count = 0          # V-Region + ≥4M CLP
+sink = ListingSink(OUTPUT_FILE, QUALIFIED_FILE, resume=RESUME)
+store: ListingStore | None = None
+exporter: parquet_export.ParquetExporter | None = None
+enricher: ListingEnricher | None = None
+downloader: photo_downloader.PhotoDownloader | None = None
+capture_ring: graphql_capture.CaptureRing | None = None
+region_filter = RegionFilter(TARGET_REGIONS)
+fields = FieldExtractor()
+decoder = FeedDecoder(offload_bytes=OFFLOAD_BYTES)
+metrics = RunMetrics()
+reposts: RepostIndex | None = RepostIndex() if DETECT_REPOSTS else None
+seen: SeenFilter | None = None
+market: price_index.PriceIndex | None = None
+qualifying_count = 0          # target region + ≥ MIN_PRICE
+new_count = 0                 # listings the store had never seen before this run
 graphql_count = 0
-
-# ─── Helpers ────────────────────────────────────────────────────────────────────
-def _is_v_region(city: str) -> bool:
-    """Check if the city belongs to V Region."""
-    if not city:
-        return False
-    loc = city.lower().strip()
-    return any(commune in loc for commune in V_REGION_COMMUNES)
+qualifying_at_start = 0       # for the ETA: leads gained since the run started
+run_clock = time.monotonic()
+
+
+def reset_run_state(new_sink: ListingSink, new_store: ListingStore | None = None):
+    """Point the parser at a fresh sink/store and zero the counters.
+    Used by replay_graphql.py to run captured responses without a browser."""
+    global sink, store, reposts, metrics, seen, market, qualifying_count, new_count, graphql_count
+    sink, store = new_sink, new_store
+    metrics = RunMetrics()
+    seen = market = None
+    if DETECT_REPOSTS:
+        reposts = RepostIndex(new_store.conn if new_store else None)
+    qualifying_count = new_sink.qualifying
+    new_count = graphql_count = 0
+
+
+# ─── Searches ───────────────────────────────────────────────────────────────────
+def build_search_url(search: dict) -> str:
+    """Marketplace search URL for one SEARCHES entry."""
+    params = {}
+    if search.get("min_price") is not None:
+        params["minPrice"] = search["min_price"]
+    if search.get("max_price") is not None:
+        params["maxPrice"] = search["max_price"]
+    params["query"] = search.get("query", "Vehicles")
+    params["exact"] = "false"
+    if search.get("radius") is not None:
+        params["radius"] = search["radius"]
+    if search.get("sort"):
+        params["sortBy"] = search["sort"]
+    return f"{FB_HOME}/marketplace/{search['location_id']}/search/?{urlencode(params)}"
+
+
+class SearchRun:
+    """Per-search (per-tab) state: its own scheduler, cursor capture and yield."""
+
+    def __init__(self, search: dict):
+        self.search = search
+        self.name = search.get("name") or search.get("query", "search")
+        self.url = build_search_url(search)
+        self.capture = MarketplaceQueryCapture()
+        self.scheduler = AdaptiveScrollScheduler(
+            min_pause=SCROLL_MIN_PAUSE, max_pause=SCROLL_MAX_PAUSE, page_timeout=PAGE_TIMEOUT,
+            end_after_empty=END_OF_FEED_EMPTY_PAGES, end_after_idle=END_OF_FEED_IDLE_SCROLLS,
+        )
+        self.graphql = 0
+        self.edges = 0          # listings returned by this search's feed
+        self.new = 0            # … not already collected by any search this run
+        self.qualifying = 0
+        self.band_ids: SeenFilter | None = None   # track_band(): ids this search's feed returned
+        self.served = 0                   # … distinct (price bands only)
+        self.band_qualifying = 0          # … of which qualifying
+        self.refreshed = 0                # SKIP_KNOWN: stored listings re-sighted (store refresh only)
+        self.first_ids: list[str] = []    # first FIRST_IDS_KEPT distinct ids the feed served
+        self.stop_at: set[str] = set()    # scrape_daemon: the previous cycle's first_ids …
+        self.stop_at_hits = 0             # … stop once this many of them came back
+        self.stop_at_seen: set[str] = set()
+        self.yield_stop = MarginalYieldStop(
+            window=YIELD_WINDOW_STEPS, min_pages=YIELD_MIN_PAGES, min_yield=MIN_MARGINAL_YIELD,
+        )
+        self._step_mark = (0, 0)          # (qualifying, pages) at the previous step
+        self.stop_reason = ""
+        self.cdp = None                   # CDP session for memory sampling (Chromium)
+
+    def track_band(self):
+        """Pace and stop on this feed's own novelty (plan_price_bands.py) —
+        listings it serves for the first time, whoever collected them."""
+        self.band_ids = SeenFilter(BAND_FILTER_CAPACITY, 0.001)
+
+    @property
+    def band_local(self) -> bool:
+        return self.band_ids is not None
+
+    def end_step(self):
+        """Feed this step's qualifying leads / feed pages into the yield window
+        (with band_local: qualifying listings this feed served first, even if
+        another search had already collected them)."""
+        qualifying = self.band_qualifying if self.band_local else self.qualifying
+        q0, p0 = self._step_mark
+        self._step_mark = (qualifying, self.scheduler.pages)
+        self.yield_stop.record(qualifying - q0, self.scheduler.pages - p0)
+
+    def summary(self) -> dict:
+        return {
+            "name": self.name, "url": self.url, "pages": self.scheduler.pages,
+            "edges": self.edges, "served": self.served if self.band_local else None, "new": self.new,
+            "qualifying": self.qualifying, "stop_reason": self.stop_reason,
+        }
+
+    @property
+    def repeat_ratio(self) -> float:
+        """Share of returned edges that repeated an id this feed had already served
+        (price bands only)."""
+        return 1 - self.served / self.edges if self.edges else 0.0
+
+    def report(self) -> str:
+        pages = self.scheduler.pages
+        per_page = self.new / pages if pages else 0.0
+        return (f"{self.name:<16} | {pages:>5} pages | {self.edges:>6} edges | {self.new:>5} new "
+                f"| {self.qualifying:>4} qualifying | {per_page:>5.1f} new/page | {self.stop_reason}")
+
+
+def _target_reached() -> bool:
+    return qualifying_count >= TARGET_LEADS
 
 
+# ─── Helpers ────────────────────────────────────────────────────────────────────
 def _parse_price_clp(formatted: str) -> int:
     """Extract numeric CLP value from strings like 'CLP 5.500.000' or '$5.500.000'."""
     if not formatted:
@@ -64,80 +246,389 @@ def _parse_price_clp(formatted: str) -> int:
 
 
 # ─── Parser — confirmed structure ───────────────────────────────────────────────
-def parse_feed_units(data: dict):
-    global qualifying_count
+def _listing_price(listing: dict) -> int:
+    """Price in CLP (prefer the raw amount, fall back to parsing the formatted one)."""
+    price = listing.get("listing_price") or {}
+    price_raw = int(price.get("amount", "0") or "0")
+    return price_raw if price_raw > 0 else _parse_price_clp(price.get("formatted_amount", ""))
+
+
+def _qualifies(listing: dict) -> bool:
+    """The `qualifies` rule on a raw feed node, without building its row."""
+    city = ((listing.get("location") or {}).get("reverse_geocode") or {}).get("city", "")
+    return region_filter.locate(city)[2] and _listing_price(listing) >= MIN_PRICE
+
+
+def _listing_row(listing: dict) -> dict | None:
+    """Build the output row for one `edge.node.listing` (None if id/title missing)."""
+    lid = str(listing.get("id", ""))
+    title = listing.get("marketplace_listing_title") or listing.get("custom_title", "")
+    if not lid or not title:
+        return None
+    price_fmt = (listing.get("listing_price") or {}).get("formatted_amount", "")
+    city = (
+        (listing.get("location") or {})
+        .get("reverse_geocode", {})
+        .get("city", "")
+    )
+    km_list = listing.get("custom_sub_titles_with_rendering_flags") or []
+    km = km_list[0].get("subtitle", "") if km_list else ""
+    seller = (listing.get("marketplace_listing_seller") or {}).get("name", "")
+
+    price_num = _listing_price(listing)
+    region, commune, is_v = region_filter.locate(city)
+    return {
+        "id": lid,
+        "title": title,
+        "price": price_fmt,
+        "price_clp": price_num,
+        "city": city,
+        "region": region,
+        "commune": commune,
+        "km": km,
+        **fields.extract(title, km),      # km_num, year, make, model
+        "seller": seller,
+        "url": f"https://www.facebook.com/marketplace/item/{lid}/",
+        "v_region": is_v,
+        "qualifies": is_v and price_num >= MIN_PRICE,
+        "canonical_id": lid,
+        "market_price": None,            # set by price_index when there are comparables
+        "deal_score": None,
+    }
+
+
+def _is_known(lid: str) -> bool:
+    """SKIP_KNOWN: is `lid` already in the store (so it only needs a refresh)?
+    The Bloom filter rules out almost every new id; only its possible hits
+    pay for the SQLite lookup."""
+    if not SKIP_KNOWN or store is None:
+        return False
+    if seen is not None and lid not in seen:
+        return False
+    return lid in store
+
+
+def _watch_high_water(run: SearchRun, lid: str):
+    """scrape_daemon: remember the first ids this feed serves, and which of
+    the previous cycle's first ids came back."""
+    if len(run.first_ids) < FIRST_IDS_KEPT and lid and lid not in run.first_ids:
+        run.first_ids.append(lid)
+    if lid in run.stop_at:
+        run.stop_at_seen.add(lid)
+
+
+def _band_novelty(run: SearchRun, edges: list, batch: list[dict], nodes: dict) -> int:
+    """Listings this band's feed serves for the first time — they count even
+    when another search (a parent band) collected them. Returns how many."""
+    leads = {row["id"] for row in batch if row["qualifies"] and row["canonical_id"] == row["id"]}
+    band_new = 0
+    for edge in edges:
+        try:
+            listing = edge["node"]["listing"]
+            lid = str(listing["id"])
+        except (KeyError, TypeError):
+            continue
+        if lid in run.band_ids:
+            continue
+        run.band_ids.add(lid)
+        band_new += 1
+        run.band_qualifying += lid in leads if lid in nodes else _qualifies(listing)
+    run.served += band_new
+    return band_new
+
+
+def parse_feed_units(data: dict, run: SearchRun | None = None) -> tuple[int, int] | None:
+    """Parse one feed page (from `run`'s search, if given). Returns (edges,
+    listings new to this run), or None if the payload is not a feed."""
+    global qualifying_count, new_count
     try:
         edges = data["data"]["marketplace_search"]["feed_units"]["edges"]
     except (KeyError, TypeError):
-        return
+        return None
 
+    batch, nodes, known = [], {}, {}
     for edge in edges:
         try:
             listing = edge["node"]["listing"]
             lid = str(listing.get("id", ""))
-            title = listing.get("marketplace_listing_title") or listing.get("custom_title", "")
-            price_fmt = (listing.get("listing_price") or {}).get("formatted_amount", "")
-            price_raw = int((listing.get("listing_price") or {}).get("amount", "0") or "0")
-            city = (
-                (listing.get("location") or {})
-                .get("reverse_geocode", {})
-                .get("city", "")
-            )
-            km_list = listing.get("custom_sub_titles_with_rendering_flags") or []
-            km = km_list[0].get("subtitle", "") if km_list else ""
-            seller = (listing.get("marketplace_listing_seller") or {}).get("name", "")
-            listing_url = f"https://www.facebook.com/marketplace/item/{lid}/"
-
-            if lid and title and lid not in vehicles:
-                # Determine price (prefer raw amount, fallback to parsing formatted)
-                price_num = price_raw if price_raw > 0 else _parse_price_clp(price_fmt)
-                is_v = _is_v_region(city)
-                qualifies = is_v and price_num >= MIN_PRICE
-
-                vehicles[lid] = {
-                    "id": lid,
-                    "title": title,
-                    "price": price_fmt,
-                    "price_clp": price_num,
-                    "city": city,
-                    "km": km,
-                    "seller": seller,
-                    "url": listing_url,
-                    "v_region": is_v,
-                    "qualifies": qualifies,
-                }
-
-                if qualifies:
-                    qualifying_count += 1
-                    tag = f"🟢 Q{qualifying_count:>3}/{TARGET_LEADS}"
-                else:
-                    tag = "⚪ skip"
-
-                print(f"  {tag} [{len(vehicles):>4}] {title[:45]:<45} | {price_fmt:<18} | {city:<20} | {km}")
+            if run and (run.stop_at or len(run.first_ids) < FIRST_IDS_KEPT):
+                _watch_high_water(run, lid)
+            if not lid or lid in sink or lid in nodes or lid in known:
+                continue
+            row = _listing_row(listing)
+            if row is None:
+                continue
+            if _is_known(lid):
+                known[lid] = row
+                continue
+            batch.append(row)
+            nodes[lid] = listing
         except Exception:
             continue
 
+    if reposts and batch:
+        # Only leads need a canonical id — MinHash is too slow for every edge
+        candidates = [row for row in batch if row["qualifies"]]
+        for row, canonical in zip(candidates, reposts.assign_many(candidates, run=store.run_id if store else 0)):
+            row["canonical_id"] = canonical
+    if market and batch:
+        market.score_many(batch)
+    for row in batch:
+        sink.write(row)
+    if exporter:
+        exporter.add_many(batch)
+    for row in batch:
+        if row["qualifies"] and row["canonical_id"] == row["id"]:
+            if enricher:
+                enricher.submit(row)
+            if downloader:
+                downloader.submit(row["id"], photo_downloader.photo_urls(nodes[row["id"]]))
+
+    # One store transaction per GraphQL page
+    if known:
+        # Re-sightings still feed listing_history / price drops
+        store.refresh_many(list(known.values()))
+        if reposts:
+            # A live listing is nobody's repost this run
+            reposts.seen_live([lid for lid, row in known.items() if row["qualifies"]], store.run_id)
+    new_ids = store.upsert_many(batch) if store else {r["id"] for r in batch}
+    new_count += len(new_ids)
+    if seen is not None:
+        seen.add_many(new_ids)
+    if market:
+        # Re-sightings and reposts would count the same car twice
+        market.add_many(r for r in batch if r["id"] in new_ids and r["canonical_id"] == r["id"])
+
+    prefix = f"[{run.name}] " if run and len(SEARCHES) > 1 else ""
+    # Each row's position in the stream, as when it was written
+    for n, row in enumerate(batch, len(sink) - len(batch) + 1):
+        repost = row["canonical_id"] != row["id"]
+        lead = row["qualifies"] and not repost
+        if lead:
+            qualifying_count += 1
+            if run:
+                run.qualifying += 1
+        run_log.event("listing", search=run.name if run else None, id=row["id"], title=row["title"],
+                      price_clp=row["price_clp"], city=row["city"], km=row["km"], qualifies=row["qualifies"],
+                      deal_score=row["deal_score"], lead=lead, known=row["id"] not in new_ids, repost_of=row["canonical_id"] if repost else None)
+        if lead:
+            tag = f"🟢 Q{qualifying_count:>3}/{TARGET_LEADS}" + ("" if row["id"] in new_ids else " (known)")
+            deal = f" | deal {row['deal_score']:+.0f}%" if row["deal_score"] is not None else ""
+            run_log.echo(f"  {prefix}{tag} [{n:>4}] {row['title'][:45]:<45} | {row['price']:<18} "
+                         f"| {row['city']:<20} | {row['km']}{deal}")
+
+    if run:
+        run.edges += len(edges)
+        run.new += len(batch)
+        run.refreshed += len(known)
+        novel = _band_novelty(run, edges, batch, nodes) if run.band_local else len(batch)
+        run.scheduler.page_parsed(len(edges), novel)
+    metrics.page_parsed(len(edges), len(batch))
+    return len(edges), len(batch)
+
 
 # ─── Response handler ────────────────────────────────────────────────────────────
-async def handle_response(response):
+async def handle_response(response, run: SearchRun | None = None):
     global graphql_count
+    if capture_ring:
+        capture_ring.see(response.url)
     if "/api/graphql" not in response.url:
         return
     graphql_count += 1
+    if response.status >= 400:
+        metrics.http_errors.inc(status=response.status)
+    if run:
+        run.graphql += 1
+    capture = run.capture if run else None
+    stats = decoder.stats
+    stats.seen += 1
     try:
-        text = await response.text()
-        data = json.loads(text)
-        parse_feed_units(data)
+        # Gate 1: request metadata — no body transfer for non-Marketplace queries
+        if not is_candidate_request(response.request, capture.doc_id if capture else None):
+            stats.skipped_by_name += 1
+            return
+        body = await response.body()
+        metrics.payload_bytes.observe(len(body))
+        # Gate 2: byte prefix scan — no decoding unless it mentions the feed
+        if not looks_like_feed(body):
+            stats.skipped_by_scan += 1
+            return
+        if capture_ring:
+            name, doc_id = request_names(response.request)
+            capture_ring.add(response.url, body, status=response.status, friendly_name=name, doc_id=doc_id)
+        t0 = time.perf_counter()
+        data = await decoder.decode(body)
+        if not data:
+            return
+        parse_feed_units(data, run)
+        metrics.parse_seconds.observe(time.perf_counter() - t0)
+        if capture and PAGINATION_MODE == "cursor" and "marketplace_search" in (data.get("data") or {}):
+            await capture.observe(response.request, data)
     except Exception:
         pass
 
 
-# ─── Main ────────────────────────────────────────────────────────────────────────
-async def main():
-    if not CHROME_USER_DATA.exists():
-        print("❌ Chrome user data directory not found!")
+# ─── Feed drivers ────────────────────────────────────────────────────────────────
+def _eta() -> str:
+    """Time to TARGET_LEADS at this run's qualifying-lead rate so far."""
+    gained = qualifying_count - qualifying_at_start
+    elapsed = time.monotonic() - run_clock
+    if gained <= 0 or elapsed <= 0:
+        return "ETA —"
+    seconds = max(TARGET_LEADS - qualifying_count, 0) / (gained / elapsed)
+    return f"ETA {seconds / 60:.0f} min" if seconds >= 60 else f"ETA {seconds:.0f}s"
+
+
+def _status(run: SearchRun, label: str) -> str:
+    return (f"  [{run.name}] {label} — {qualifying_count}/{TARGET_LEADS} qualifying | {len(sink)} total "
+            f"| {graphql_count} GraphQL | {run.scheduler.pages_per_minute:.1f} pages/min | {_eta()}")
+
+
+def _should_stop(run: SearchRun) -> bool:
+    """Called once per scroll / replayed page."""
+    run.end_step()
+    # ── Smart stop: we have enough qualifying leads (across all searches) ──
+    if _target_reached():
+        run.stop_reason = "target reached"
+        return True
+    # ── Incremental cycles: back at the newest listings of the previous one ──
+    if run.stop_at and len(run.stop_at_seen) >= min(run.stop_at_hits, len(run.stop_at)):
+        run.stop_reason = f"caught up ({len(run.stop_at_seen)} of the previous cycle's newest listings)"
+        run_log.say(f"\n🏁 [{run.name}] Caught up with the previous cycle.")
+        return True
+    if run.scheduler.feed_ended:
+        run.stop_reason = f"end of feed ({run.scheduler.end_reason})"
+        run_log.say(f"\n🏁 [{run.name}] End of feed: {run.scheduler.end_reason}.")
+        return True
+    # ── Marginal yield: the feed still serves pages, but no longer pays ──
+    if run.yield_stop.should_stop:
+        run.stop_reason = run.yield_stop.reason
+        run_log.say(f"\n📉 [{run.name}] Stopping: {run.stop_reason}.")
+        return True
+    return False
+
+
+def _overall_stop_reason(runs: list[SearchRun]) -> str:
+    if _target_reached():
+        return f"target reached ({qualifying_count}/{TARGET_LEADS} qualifying)"
+    return "; ".join(f"{run.name}: {run.stop_reason or 'interrupted'}" for run in runs) or "interrupted"
+
+
+def write_run_summary(runs: list[SearchRun], started_at: float, stop_reason: str):
+    """Append one JSON line describing this run to RUN_SUMMARY_FILE."""
+    if not RUN_SUMMARY_FILE:
         return
-
+    summary = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started_at)),
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration_s": round(time.time() - started_at, 1),
+        "store_run_id": store.run_id if store else None,
+        "total": len(sink),
+        "new_this_run": len(sink) - sink.resumed_total,
+        "new_since_last_run": new_count,
+        "qualifying": qualifying_count,
+        "graphql_responses": graphql_count,
+        "stop_reason": stop_reason,
+        "searches": [run.summary() for run in runs],
+    }
+    with open(RUN_SUMMARY_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+
+
+async def _sample_memory(run: SearchRun, step: int):
+    if run.cdp and step % MEMORY_SAMPLE_EVERY == 0:
+        await metrics.sample_browser(run.cdp, run.name)
+
+
+async def scroll_feed(page, run: SearchRun, first_scroll: int = 1):
+    """Classic mode: scroll the page and let handle_response pick up the feed."""
+    sched = run.scheduler
+    for i in range(first_scroll, MAX_SCROLLS + 1):
+        new = await sched.after_scroll(page.evaluate(f"window.scrollBy(0, {SCROLL_PX})"))
+        if sched.last_latency is None:
+            metrics.scroll_timeouts.inc()
+        else:
+            metrics.scroll_latency.observe(sched.last_latency)
+        await _sample_memory(run, i)
+        run_log.event("scroll", search=run.name, step=i, new=new, pause=round(sched.pause, 2),
+                      pages=sched.pages, qualifying=qualifying_count)
+        run_log.status(_status(run, f"Scroll {i:>4}/{MAX_SCROLLS} (+{new}, next in {sched.pause:.1f}s)"))
+        if _should_stop(run):
+            return
+    run.stop_reason = "max scrolls"
+
+
+async def paginate_feed(page, context, run: SearchRun):
+    """Cursor mode: scroll just until the first feed request is captured, then
+    replay it with each next end_cursor — no more DOM scrolling."""
+    capture = run.capture
+    for i in range(1, CAPTURE_SCROLLS + 1):
+        if capture.ready.is_set():
+            break
+        await page.evaluate(f"window.scrollBy(0, {SCROLL_PX})")
+        try:
+            await asyncio.wait_for(capture.ready.wait(), timeout=PAGE_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+    else:
+        if not capture.ready.is_set():
+            run_log.say(f"  ⚠️  [{run.name}] No marketplace_search request captured — falling back to scrolling.")
+            await scroll_feed(page, run, first_scroll=CAPTURE_SCROLLS + 1)
+            return
+
+    pages = 0
+    async for data in capture.replay(context, max_pages=MAX_SCROLLS, delay=REPLAY_DELAY):
+        pages += 1
+        t0 = time.perf_counter()
+        parse_feed_units(data, run)
+        metrics.parse_seconds.observe(time.perf_counter() - t0)
+        await _sample_memory(run, pages)
+        run_log.event("page", search=run.name, step=pages, pages=run.scheduler.pages,
+                      qualifying=qualifying_count)
+        run_log.status(_status(run, f"Page {pages:>4}/{MAX_SCROLLS}"))
+        if _should_stop(run):
+            return
+    run.stop_reason = "no further pages" if not capture.replay_has_next else "replay stopped"
+    run_log.say(f"\n🏁 [{run.name}] Feed: {run.stop_reason}.")
+
+
+async def scrape_search(context, run: SearchRun, slots: asyncio.Semaphore):
+    """Scrape one search in its own tab (waits for a free concurrency slot)."""
+    async with slots:
+        if _target_reached():
+            run.stop_reason = "target reached"
+            return
+        page = await context.new_page()
+
+        async def on_response(response):
+            await handle_response(response, run)
+
+        page.on("response", on_response)
+        try:
+            # Chromium only — browser memory metrics are skipped elsewhere
+            run.cdp = await context.new_cdp_session(page)
+            await run.cdp.send("Performance.enable")
+        except Exception:
+            run.cdp = None
+        try:
+            run_log.say(f"\n🌐 [{run.name}] Navigating to {run.url}")
+            await page.goto(run.url, wait_until="domcontentloaded", timeout=60_000)
+            await asyncio.sleep(5)
+            if PAGINATION_MODE == "cursor":
+                await paginate_feed(page, context, run)
+            else:
+                await scroll_feed(page, run)
+            await asyncio.sleep(3)
+        except Exception as e:
+            # One failing tab must not take the other searches down
+            run.stop_reason = f"error: {e}"
+            run_log.say(f"  ⚠️  [{run.name}] {run.stop_reason}")
+        finally:
+            await page.close()
+
+
+# ─── Browser session ─────────────────────────────────────────────────────────────
+def _copy_chrome_profile() -> Path:
     print("📂 Copying Chrome profile to temp directory…")
     tmp_dir = Path(tempfile.mkdtemp(prefix="fb_chrome_"))
     default_src = CHROME_USER_DATA / "Default"
@@ -153,75 +644,252 @@ async def main():
     if local_state.exists():
         shutil.copy2(local_state, tmp_dir / "Local State")
     print(f"✅ Profile ready at: {tmp_dir}")
+    return tmp_dir
+
+
+def _is_facebook(url: str) -> bool:
+    host = urlsplit(url).hostname or ""
+    return host == "facebook.com" or host.endswith(".facebook.com")
+
+
+async def open_logged_in_context(p):
+    """Return (context, page, close) for a logged-in Facebook session, or None.
+
+    Tries the encrypted session cache first (clean lightweight context); falls
+    back to copying the Chrome profile, and refreshes the cache after login.
+    A non-Facebook FB_HOME (load tests) just gets a fresh headless browser."""
+    if not _is_facebook(FB_HOME):
+        print(f"🧪 FB_HOME is {FB_HOME} — fresh headless browser, no login.")
+        browser = await p.chromium.launch(headless=True, channel="chromium", args=LAUNCH_ARGS)
+        context = await browser.new_context(viewport=VIEWPORT)
+        return context, await context.new_page(), browser.close
+
+    if SESSION_CACHE_FILE:
+        state = session_cache.load_state(SESSION_CACHE_FILE)
+        if state:
+            print("🔑 Starting from cached session…")
+            browser = await p.chromium.launch(headless=False, channel="chromium", args=LAUNCH_ARGS)
+            context = await browser.new_context(storage_state=state, viewport=VIEWPORT)
+            page = await context.new_page()
+            if await session_cache.is_logged_in(context, page, FB_HOME):
+                print("✅ Cached session is valid — skipping profile copy.")
+                return context, page, browser.close
+            print("⚠️  Cached session expired — falling back to Chrome profile copy.")
+            await browser.close()
 
-    async with async_playwright() as p:
-        context = await p.chromium.launch_persistent_context(
-            user_data_dir=str(tmp_dir),
-            headless=False,
-            channel="chromium",
-            args=["--disable-blink-features=AutomationControlled"],
-            viewport={"width": 1280, "height": 900},
-        )
-        page = context.pages[0] if context.pages else await context.new_page()
-        page.on("response", handle_response)
-
-        print("🌐 Opening Facebook…")
-        await page.goto("https://www.facebook.com", wait_until="domcontentloaded", timeout=30_000)
-        await asyncio.sleep(3)
-
-        if "login" in page.url or "checkpoint" in page.url:
-            print("\n⚠️  Not logged in. Log in manually — waiting 90s…\n")
-            for _ in range(90):
-                await asyncio.sleep(1)
-                if "login" not in page.url and "checkpoint" not in page.url:
-                    print("✅ Logged in!")
-                    break
-        else:
-            print("✅ Already logged in!")
+    if not CHROME_USER_DATA.exists():
+        print("❌ Chrome user data directory not found!")
+        return None
+
+    tmp_dir = _copy_chrome_profile()
+    context = await p.chromium.launch_persistent_context(
+        user_data_dir=str(tmp_dir),
+        headless=False,
+        channel="chromium",
+        args=LAUNCH_ARGS,
+        viewport=VIEWPORT,
+    )
+    page = context.pages[0] if context.pages else await context.new_page()
+
+    async def close():
+        await context.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        print("🗑️  Temp profile cleaned up.")
+
+    print("🌐 Opening Facebook…")
+    await page.goto(FB_HOME, wait_until="domcontentloaded", timeout=30_000)
+    await asyncio.sleep(3)
+
+    if session_cache.on_login_page(page.url):
+        print("\n⚠️  Not logged in. Log in manually — waiting 90s…\n")
+        for _ in range(90):
+            await asyncio.sleep(1)
+            if not session_cache.on_login_page(page.url):
+                print("✅ Logged in!")
+                break
+    else:
+        print("✅ Already logged in!")
 
-        print(f"\n🌐 Navigating to marketplace…")
-        await page.goto(TARGET_URL, wait_until="domcontentloaded", timeout=60_000)
-        await asyncio.sleep(5)
+    if SESSION_CACHE_FILE and not session_cache.on_login_page(page.url):
+        session_cache.save_state(SESSION_CACHE_FILE, await context.storage_state())
+        if SESSION_CACHE_FILE.exists():
+            print(f"🔑 Session cached → {SESSION_CACHE_FILE.name}")
+    return context, page, close
 
-        print(f"\n🔄 Smart scraping: target {TARGET_LEADS} qualifying V-Region leads (max {MAX_SCROLLS} scrolls)…\n")
-        for i in range(1, MAX_SCROLLS + 1):
-            await page.evaluate(f"window.scrollBy(0, {SCROLL_PX})")
-            print(f"  Scroll {i:>4}/{MAX_SCROLLS} — {qualifying_count}/{TARGET_LEADS} qualifying | {len(vehicles)} total | {graphql_count} GraphQL")
-            await asyncio.sleep(SCROLL_DELAY)
 
-            # ── Smart stop: we have enough qualifying leads ──
-            if qualifying_count >= TARGET_LEADS:
-                print(f"\n🎯 Reached {qualifying_count} qualifying V-Region leads! Stopping early.")
-                break
+# ─── Main ────────────────────────────────────────────────────────────────────────
+async def run_searches(context, runs: list[SearchRun]):
+    """Default driver: every SEARCHES entry in its own tab, bounded concurrency."""
+    runs.extend(SearchRun(search) for search in SEARCHES)
+    slots = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+    print(f"\n🔄 Smart scraping ({PAGINATION_MODE} mode, {len(runs)} searches, "
+          f"{min(len(runs), MAX_CONCURRENT_PAGES)} at a time): target {TARGET_LEADS} "
+          f"qualifying target-region leads (max {MAX_SCROLLS} pages each)…\n")
+    await asyncio.gather(*(scrape_search(context, run, slots) for run in runs))
+
+
+def new_run_metrics() -> RunMetrics:
+    run_metrics = RunMetrics()
+    run_metrics.info = {"mode": PAGINATION_MODE, "searches": len(SEARCHES), "block_resources": BLOCK_RESOURCES}
+    if store and store.run_id:
+        run_metrics.info["run_id"] = store.run_id
+    return run_metrics
+
+
+def write_metrics(stop_reason: str):
+    """Write this run's metrics to METRICS_PROM_FILE / METRICS_JSON_FILE (once per run)."""
+    if metrics.exported:
+        return
+    metrics.info["stop_reason"] = stop_reason
+    if METRICS_PROM_FILE:
+        metrics.write_prometheus(METRICS_PROM_FILE)
+    if METRICS_JSON_FILE:
+        metrics.append_json(METRICS_JSON_FILE)
+    metrics.exported = True
+
+
+def write_price_drops(drops):
+    """Write this run's price-drop leads (biggest drop first) to PRICE_DROP_FILE."""
+    with open(PRICE_DROP_FILE, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(drops[0].keys())
+        writer.writerows(tuple(r) for r in drops)
+
+
+async def main(driver=None):
+    """Open the session, run `driver(context, runs)` (default: run_searches) and
+    report. Drivers append every SearchRun they start to `runs`."""
+    # Imported here so the parser can be used offline without Playwright installed
+    from playwright.async_api import async_playwright
+
+    global qualifying_count, qualifying_at_start, run_clock, store, reposts, exporter, enricher, downloader, metrics, capture_ring, seen, market
+    started_at = time.time()
+    run_log.configure(EVENT_LOG_FILE, quiet=QUIET)
+    sink.open()
+    qualifying_count = qualifying_at_start = sink.qualifying
+    run_clock = time.monotonic()
+    metrics = new_run_metrics()
+    if sink.resumed_total:
+        print(f"↩️  Resuming: {sink.resumed_total} listings ({qualifying_count} qualifying) already in {sink.path.name}")
+    if STORE_FILE:
+        store = ListingStore(STORE_FILE)
+        store.start_run()
+        # Resumed rows belong to this run; from here the store confirms the sink's filter hits
+        store.mark_in_run(sink.exact_ids)
+        sink.confirm_with(store.in_run)
+        if DETECT_REPOSTS:
+            # Keep repost groups next to the listings so they carry over between runs
+            reposts = RepostIndex(store.conn)
+        print(f"🗄️  Listing store: {store.count()} known listings in {STORE_FILE.name} (run #{store.run_id})")
+        metrics.info["run_id"] = store.run_id
+        if SEEN_FILTER_FILE:
+            seen = SeenFilter.open(SEEN_FILTER_FILE, rebuild=store.ids, min_count=store.count())
+            print(f"🧮 Seen-id filter: {seen.summary()}")
+    if PRICE_INDEX_FILE and price_index.available():
+        market = price_index.PriceIndex.open(PRICE_INDEX_FILE, rebuild=store.price_rows if store else None)
+        print(f"📈 Price index: {market.summary()}")
+    if GRAPHQL_CAPTURE_DIR:
+        capture_ring = graphql_capture.CaptureRing(GRAPHQL_CAPTURE_DIR, max_bytes=GRAPHQL_CAPTURE_MAX_BYTES)
+    if PARQUET_DIR and parquet_export.available():
+        exporter = parquet_export.ParquetExporter(PARQUET_DIR, run_id=store.run_id if store else None)
 
-        await asyncio.sleep(3)
-
-        # ── Save ALL vehicles (full CSV) ──
-        print(f"\n💾 Saving {len(vehicles)} total vehicles → {OUTPUT_FILE}")
-        fieldnames = ["id", "title", "price", "price_clp", "city", "km", "seller", "url", "v_region", "qualifies"]
-        with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(vehicles.values())
-
-        # ── Also save QUALIFYING only ──
-        qualified_file = OUTPUT_FILE.with_name("facebook_qualified_v_region.csv")
-        qualified = [v for v in vehicles.values() if v["qualifies"]]
-        with open(qualified_file, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(qualified)
-
-        print(f"\n✅ Done!")
-        print(f"   Total vehicles scraped:    {len(vehicles)}")
-        print(f"   Qualifying V-Region leads: {qualifying_count}")
-        print(f"   All vehicles →             {OUTPUT_FILE}")
-        print(f"   Qualified only →           {qualified_file}")
-        print(f"   GraphQL responses:         {graphql_count}")
-        await context.close()
+    async with async_playwright() as p:
+        session = await open_logged_in_context(p)
+        if session is None:
+            sink.close()
+            if exporter:
+                exporter.close()
+            if store:
+                store.close()
+            if capture_ring:
+                capture_ring.close()
+            run_log.shutdown()
+            return
+        context, _, close_session = session
+        # Routing on the context applies to every search tab
+        block_stats = await install_resource_blocker(context) if BLOCK_RESOURCES else None
+        if DOWNLOAD_PHOTOS:
+            downloader = photo_downloader.PhotoDownloader(PHOTO_DIR, store.conn if store else None,
+                                                          workers=PHOTO_WORKERS)
+            downloader.start()
+        if ENRICH_DETAILS:
+            enricher = ListingEnricher(
+                context, store.conn if store else None, workers=ENRICH_WORKERS,
+                rate_per_minute=ENRICH_RATE_PER_MINUTE, item_url=FB_HOME + "/marketplace/item/{lid}/",
+                on_details=(lambda lid, d: downloader.submit(lid, d.get("photos") or [])) if downloader else None,
+            )
+            await enricher.start()
 
-    shutil.rmtree(tmp_dir, ignore_errors=True)
-    print("🗑️  Temp profile cleaned up.")
+        runs: list[SearchRun] = []
+        try:
+            await (driver or run_searches)(context, runs)
+            if enricher:
+                await enricher.close(drain_timeout=ENRICH_DRAIN_TIMEOUT)
+            if downloader:
+                await downloader.close(drain_timeout=PHOTO_DRAIN_TIMEOUT)
+            sink.mark_complete()
+        finally:
+            if enricher:
+                await enricher.close()
+            if downloader:
+                await downloader.close()
+            # Rows are already on disk — closing just flushes the last buffers
+            sink.close()
+            stop_reason = _overall_stop_reason(runs)
+            run_log.say(f"\n✅ Done! Stop reason: {stop_reason}")
+            print(f"   Total vehicles scraped:    {len(sink)}  ({len(sink) - sink.resumed_total} this run)")
+            print(f"   Qualifying region leads:   {qualifying_count}")
+            if reposts:
+                print(f"   Reposts grouped:           {reposts.reposts}")
+            if enricher:
+                print(f"   Detail enrichment:         {enricher.summary()}")
+            if downloader:
+                print(f"   Lead photos:               {downloader.summary()} → {PHOTO_DIR}")
+            if store:
+                if store.run_open:
+                    # scrape_daemon.py closes a run per cycle itself
+                    store.finish_run(seen=len(sink) - sink.resumed_total, new=new_count, stop_reason=stop_reason)
+                new_leads = store.new_in_run(store.run_id, qualifying_only=True)
+                print(f"   New since last run:        {new_count} ({len(new_leads)} qualifying)")
+                drops = store.price_drops(PRICE_DROP_ALERT_PCT, run_id=store.run_id)
+                print(f"   Changed since last seen:   {store.changed} ({store.price_drops_seen} price drops, "
+                      f"{len(drops)} ≥ {PRICE_DROP_ALERT_PCT:g}%)")
+                if drops and PRICE_DROP_FILE:
+                    write_price_drops(drops)
+                    print(f"   Price drops →              {PRICE_DROP_FILE}")
+                print(f"   Listing store →            {STORE_FILE}")
+                if seen is not None:
+                    seen.save(SEEN_FILTER_FILE)
+                store.close()
+            if market:
+                market.save(PRICE_INDEX_FILE)
+                print(f"   Price index:               {market.summary()}")
+            if exporter:
+                exporter.close()
+                print(f"   Parquet dataset →          {PARQUET_DIR} ({exporter.rows_written} rows, "
+                      f"{exporter.files_written} part files)")
+            print(f"   All vehicles →             {sink.path}")
+            print(f"   Qualified only →           {sink.qualified_path}")
+            print(f"   GraphQL responses:         {graphql_count}")
+            print(f"   GraphQL prefilter:         {decoder.stats.summary()}")
+            print(f"   Metrics:                   {metrics.report()}")
+            write_metrics(stop_reason)
+            decoder.close()
+            if capture_ring:
+                capture_ring.close()
+                print(f"   GraphQL capture ring:      {capture_ring.summary()}")
+            if block_stats:
+                print(f"   Resource blocker:          {block_stats.summary()}")
+            print("\n   Yield per search:")
+            for run in runs:
+                print(f"     {run.report()}")
+            write_run_summary(runs, started_at, stop_reason)
+            if RUN_SUMMARY_FILE:
+                print(f"\n   Run summary →              {RUN_SUMMARY_FILE}")
+            if EVENT_LOG_FILE:
+                print(f"   Event log →                {EVENT_LOG_FILE} ({run_log.current().events} events)")
+            run_log.shutdown()
+            await close_session()
 
 
 if __name__ == "__main__":
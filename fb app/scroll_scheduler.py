@@ -0,0 +1,158 @@
+"""
+Event-driven scroll scheduler for the Marketplace scraper.
+
+Replaces the fixed `asyncio.sleep(SCROLL_DELAY)` between scrolls. The response
+handler calls `page_parsed()` every time a feed page has been parsed, which
+sets an asyncio.Event the scroll loop is waiting on:
+
+  • a page with new edges arrived  → scroll again right away (after min_pause)
+  • a page with no new edges / no page before `page_timeout`
+                                     → back off exponentially up to max_pause
+  • `end_after_empty` empty pages or `end_after_idle` scrolls with no response
+    in a row                         → end of feed
+
+So wall time follows Facebook's real latency instead of a guess. Every
+scroll is timestamped; pages that arrive while the loop is pausing (before
+the next scroll) are not lost — their listings count towards the next
+scroll — but they don't end its wait or set its latency, which is measured
+from the scroll to the first page parsed after it.
+
+MarginalYieldStop is the companion stop policy: it ends a search whose
+sliding-window yield of new qualifying leads per feed page has dropped below
+a threshold, even while the feed itself keeps serving pages.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+
+class AdaptiveScrollScheduler:
+    def __init__(self, *, min_pause: float = 0.3, max_pause: float = 10.0,
+                 page_timeout: float = 6.0, backoff: float = 2.0,
+                 end_after_empty: int = 6, end_after_idle: int = 15):
+        self.min_pause = min_pause
+        self.max_pause = max_pause
+        self.page_timeout = page_timeout
+        self.backoff = backoff
+        self.end_after_empty = end_after_empty
+        self.end_after_idle = end_after_idle
+
+        self.pages = 0
+        self.empty_streak = 0
+        self.idle_streak = 0
+        self.pause = min_pause
+        self.started = time.monotonic()
+        self.last_latency: float | None = None   # scroll → first feed page, None on timeout
+        self.early_pages = 0                      # pages parsed during a pause, before the next scroll
+        self._scrolled_at: float | None = None    # set while a scroll waits for its response
+        self._first_page_at: float | None = None
+
+        self._event = asyncio.Event()
+        self._pending_fresh = 0
+        self._pending_new = 0
+
+    # ── Called from the response handler ───────────────────────────────────────
+    def page_parsed(self, edges: int, new: int):
+        """A feed page was parsed: `edges` listings in it, `new` never seen before."""
+        self.pages += 1
+        self._pending_new += new
+        if self._scrolled_at is None:
+            # Late page from an earlier scroll: keep its listings, not its timing
+            self.early_pages += 1
+            return
+        if self._first_page_at is None:
+            self._first_page_at = time.monotonic()
+        self._pending_fresh += 1
+        self._event.set()
+
+    # ── Called from the scroll loop ────────────────────────────────────────────
+    async def after_scroll(self, scroll_coro):
+        """Run one scroll and wait for its outcome, then pause adaptively.
+
+        Returns the number of new listings that arrived for this scroll
+        (including pages that came in during the previous pause)."""
+        scrolled_at = self._scrolled_at = time.monotonic()
+        await scroll_coro
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=self.page_timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        # Take the counters and reset them with no await in between, so a page
+        # parsed from here on (e.g. during the pause below) counts next time
+        fresh, new, first_at = self._pending_fresh, self._pending_new, self._first_page_at
+        self._pending_fresh = self._pending_new = 0
+        self._scrolled_at = self._first_page_at = None
+        self._event.clear()
+        self.last_latency = first_at - scrolled_at if first_at is not None else None
+
+        if new:
+            self.empty_streak = 0
+            self.idle_streak = 0
+            self.pause = self.min_pause
+        else:
+            if fresh:
+                self.empty_streak += 1
+                self.idle_streak = 0
+            else:
+                self.idle_streak += 1
+            self.pause = min(self.pause * self.backoff, self.max_pause)
+        await asyncio.sleep(self.pause)
+        return new
+
+    @property
+    def feed_ended(self) -> bool:
+        return self.empty_streak >= self.end_after_empty or self.idle_streak >= self.end_after_idle
+
+    @property
+    def end_reason(self) -> str:
+        if self.empty_streak >= self.end_after_empty:
+            return f"{self.empty_streak} feed pages in a row with no new listings"
+        return f"{self.idle_streak} scrolls in a row without a feed response"
+
+    @property
+    def pages_per_minute(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.pages / (elapsed / 60) if elapsed > 0 else 0.0
+
+
+class MarginalYieldStop:
+    """Stop policy: give up on a search when it stops paying.
+
+    Each step (one scroll, or one replayed page in cursor mode) records how
+    many new qualifying leads it produced and how many feed pages arrived.
+    Once `window` steps are recorded and at least `min_pages` feed pages fall
+    inside the window, the search stops if the window's yield — qualifying
+    leads per feed page — is below `min_yield`.
+    """
+
+    def __init__(self, *, window: int = 40, min_pages: int = 10, min_yield: float = 0.05):
+        self.window = window
+        self.min_pages = min_pages
+        self.min_yield = min_yield
+        self._steps: deque[tuple[int, int]] = deque(maxlen=window)
+
+    def record(self, qualifying_new: int, pages: int):
+        self._steps.append((qualifying_new, pages))
+
+    @property
+    def window_yield(self) -> float:
+        leads = sum(q for q, _ in self._steps)
+        pages = sum(p for _, p in self._steps)
+        return leads / pages if pages else 0.0
+
+    @property
+    def should_stop(self) -> bool:
+        if len(self._steps) < self.window:
+            return False
+        if sum(p for _, p in self._steps) < self.min_pages:
+            return False
+        return self.window_yield < self.min_yield
+
+    @property
+    def reason(self) -> str:
+        leads = sum(q for q, _ in self._steps)
+        pages = sum(p for _, p in self._steps)
+        return (f"marginal yield {leads} qualifying in last {pages} pages / {len(self._steps)} steps "
+                f"({self.window_yield:.3f}/page < {self.min_yield})")
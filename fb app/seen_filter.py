@@ -0,0 +1,139 @@
+"""
+Persisted Bloom filter of listing ids already in the listing store.
+
+"Is this id new?" is asked for every feed edge. Answering it exactly means
+either a set of every id ever seen in memory (hundreds of MB after a few
+million listings, rebuilt on every start) or a SQLite lookup per edge.
+SeenFilter answers "definitely not seen" from a fixed-size bit array —
+CAPACITY ids at ERROR_RATE false positives is about 1.8 bytes per id
+(9 MB for 5 million at 0.1%) — so only possible hits need the exact check:
+
+    seen = SeenFilter.open(SEEN_FILTER_FILE, rebuild=store_ids)   # ms to load
+    if lid in seen and lid in store: …skip…                      # exact check on hits only
+    seen.add(lid)
+    seen.save(SEEN_FILTER_FILE)
+
+The file is a small header (magic, bit count, hash count, ids added,
+capacity, error rate) followed by the raw bit array, written atomically.
+Bit positions come from one blake2b digest per id (double hashing). When
+more than `capacity` ids have been added the false-positive rate climbs;
+open() then rebuilds the filter, twice as large, from `rebuild` — as it does
+when the filter holds fewer ids than the store (a run that died before
+saving it).
+"""
+
+import hashlib
+import math
+import os
+import struct
+import time
+from pathlib import Path
+
+CAPACITY = 5_000_000         # ids before the filter is rebuilt larger
+ERROR_RATE = 0.001           # false-positive rate at capacity
+
+_MAGIC = b"FBSEEN01"
+_HEADER = struct.Struct("<8sQIQQd")     # magic, bits, hashes, count, capacity, error rate
+
+
+def _sizing(capacity: int, error_rate: float) -> tuple[int, int]:
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    bits = (bits + 7) // 8 * 8
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class SeenFilter:
+    """Bloom filter over listing-id strings."""
+
+    def __init__(self, capacity: int = CAPACITY, error_rate: float = ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.nbits, self.hashes = _sizing(capacity, error_rate)
+        self.bits = bytearray(self.nbits // 8)
+        self.count = 0               # ids added (an upper bound on distinct ids)
+        self.load_ms = 0.0
+
+    def _positions(self, lid: str):
+        digest = hashlib.blake2b(lid.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.nbits
+        return [(h1 + i * h2) % m for i in range(self.hashes)]
+
+    def __contains__(self, lid: str) -> bool:
+        bits = self.bits
+        for pos in self._positions(lid):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add(self, lid: str):
+        bits = self.bits
+        for pos in self._positions(lid):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def add_many(self, ids):
+        for lid in ids:
+            self.add(lid)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def saturated(self) -> bool:
+        return self.count > self.capacity
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Expected rate at the current fill (not the design rate)."""
+        return (1 - math.exp(-self.hashes * self.count / self.nbits)) ** self.hashes
+
+    # ── Persistence ────────────────────────────────────────────────────────────
+    def save(self, path: Path):
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.nbits, self.hashes, self.count, self.capacity, self.error_rate))
+            f.write(self.bits)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SeenFilter | None":
+        """The saved filter, or None if the file is missing or not a complete filter."""
+        t0 = time.perf_counter()
+        try:
+            with open(path, "rb") as f:
+                header = f.read(_HEADER.size)
+                magic, nbits, hashes, count, capacity, error_rate = _HEADER.unpack(header)
+                bits = bytearray(f.read())
+        except (OSError, struct.error):
+            return None
+        seen = cls(capacity, error_rate)
+        if magic != _MAGIC or (nbits, hashes) != (seen.nbits, seen.hashes) or len(bits) != len(seen.bits):
+            return None
+        seen.bits, seen.count = bits, count
+        seen.load_ms = (time.perf_counter() - t0) * 1000
+        return seen
+
+    @classmethod
+    def open(cls, path: Path, *, rebuild=None, min_count: int = 0, capacity: int = CAPACITY,
+             error_rate: float = ERROR_RATE) -> "SeenFilter":
+        """Load the saved filter; rebuild it from `rebuild()` (an iterable of every
+        known id) when it is missing, damaged, over capacity or holds fewer than
+        `min_count` ids."""
+        seen = cls.load(path)
+        if seen is not None and not seen.saturated and seen.count >= min_count:
+            return seen
+        capacity = max(capacity, min_count * 2, seen.count * 2 if seen else 0)
+        seen = cls(capacity, error_rate)
+        t0 = time.perf_counter()
+        if rebuild is not None:
+            seen.add_many(rebuild())
+        seen.load_ms = (time.perf_counter() - t0) * 1000
+        return seen
+
+    def summary(self) -> str:
+        return (f"{self.count:,} ids, {len(self.bits) / 1e6:.1f} MB, {self.hashes} hashes, "
+                f"~{self.false_positive_rate:.2%} false positives, loaded in {self.load_ms:.0f} ms")
@@ -0,0 +1,87 @@
+"""
+Encrypted Playwright session cache for the Marketplace scraper.
+
+Copying the whole Chrome `Default` profile takes minutes (GBs on a real
+profile) and needs Chrome closed. After one successful login we instead save
+Playwright's `storage_state` (cookies + localStorage) encrypted to a local
+file, and later runs start a clean, lightweight context from it in seconds.
+The scraper falls back to the profile copy only when the cached session is
+missing or no longer logged in.
+
+Encryption uses Fernet from the `cryptography` package (pip install
+cryptography). The key comes from $FB_SESSION_KEY or, failing that, a key file
+created on first use with owner-only permissions. Without `cryptography` the
+cache is disabled — cookies are never written to disk in plain text.
+"""
+
+import json
+import os
+from pathlib import Path
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:      # optional — no cache without it
+    Fernet = None
+    InvalidToken = Exception
+
+KEY_ENV = "FB_SESSION_KEY"
+KEY_FILE = Path.home() / ".fb_scraper" / "session.key"
+LOGIN_MARKERS = ("login", "checkpoint")
+
+
+def available() -> bool:
+    if Fernet is None:
+        print("  ℹ️  Session cache disabled (pip install cryptography to enable).")
+        return False
+    return True
+
+
+def _fernet():
+    key = os.environ.get(KEY_ENV)
+    if key:
+        return Fernet(key.encode())
+    if not KEY_FILE.exists():
+        KEY_FILE.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(Fernet.generate_key())
+    return Fernet(KEY_FILE.read_bytes().strip())
+
+
+def load_state(path: Path) -> dict | None:
+    """Decrypt a saved storage_state, or None if missing / unreadable."""
+    path = Path(path)
+    if not path.exists() or not available():
+        return None
+    try:
+        return json.loads(_fernet().decrypt(path.read_bytes()))
+    except (InvalidToken, ValueError) as e:
+        print(f"  ⚠️  Could not read session cache ({type(e).__name__}) — ignoring it.")
+        return None
+
+
+def save_state(path: Path, state: dict):
+    """Encrypt and atomically write a storage_state dict (owner-only permissions)."""
+    if not available():
+        return
+    path = Path(path)
+    token = _fernet().encrypt(json.dumps(state).encode("utf-8"))
+    tmp = path.with_name(path.name + ".tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(token)
+    os.replace(tmp, path)
+
+
+def on_login_page(url: str) -> bool:
+    return any(marker in url for marker in LOGIN_MARKERS)
+
+
+async def is_logged_in(context, page, home_url: str) -> bool:
+    """Session check: the c_user cookie is present and the home page doesn't
+    bounce to a login / checkpoint URL."""
+    cookies = await context.cookies(home_url)
+    if not any(c.get("name") == "c_user" for c in cookies):
+        return False
+    await page.goto(home_url, wait_until="domcontentloaded", timeout=30_000)
+    return not on_login_page(page.url)
@@ -0,0 +1,36 @@
+import pytest
+
+from listing_fields import FieldExtractor, parse_km, parse_year
+
+
+@pytest.mark.parametrize("text, km", [
+    ("120.000 km", 120_000),
+    ("120 mil km", 120_000),
+    ("45K km", 45_000),
+    ("1.2 mil km", 1_200),
+    ("120,5 mil km", 120_500),
+    ("1,5k km", 1_500),
+    ("Viña del Mar", None),
+    ("", None),
+])
+def test_parse_km(text, km):
+    assert parse_km(text) == km
+
+
+def test_parse_year_prefers_a_year_over_the_model_name():
+    assert parse_year("Peugeot 2008 año 2018", "2008") == 2018
+    assert parse_year("Peugeot 2008", "2008") == 2008
+    assert parse_year("Toyota RAV4 1.5 120000 km") is None
+
+
+def test_extract_many():
+    rows = FieldExtractor().extract_many([
+        {"title": "2018 Toyota RAV4 2.0", "km": "90 mil km"},
+        {"title": "Yaris Toyota 2015", "km": ""},
+        {"title": "Bicicleta", "km": "Viña del Mar"},
+    ])
+    assert [(r["make"], r["model"], r["year"], r["km_num"]) for r in rows] == [
+        ("Toyota", "RAV4", 2018, 90_000),
+        ("Toyota", "Yaris", 2015, None),
+        ("", "", None, None),
+    ]
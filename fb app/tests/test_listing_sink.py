@@ -0,0 +1,71 @@
+import csv
+
+from listing_sink import FIELDNAMES, ListingSink, schema_tag
+
+
+def _row(i, qualifies=True, **extra):
+    return {"id": str(i), "title": f"car {i}", "qualifies": qualifies, **extra}
+
+
+def _sink(tmp_path, name="all.csv"):
+    return ListingSink(tmp_path / name, tmp_path / f"q_{name}")
+
+
+def test_resume_after_interrupted_run(tmp_path):
+    sink = _sink(tmp_path).open()
+    for i in range(3):
+        sink.write(_row(i, qualifies=i != 1))
+    sink.close()
+
+    sink = _sink(tmp_path).open()
+    assert (len(sink), sink.resumed_total, sink.qualifying) == (3, 3, 2)
+    assert "0" in sink and "9" not in sink
+    sink.write(_row(3))
+    sink.close()
+    with open(tmp_path / "q_all.csv", newline="", encoding="utf-8") as f:
+        assert [r["id"] for r in csv.DictReader(f)] == ["0", "2", "3"]
+
+
+def test_completed_run_starts_fresh(tmp_path):
+    sink = _sink(tmp_path).open()
+    sink.write(_row(1))
+    sink.mark_complete()
+    sink.close()
+    sink = _sink(tmp_path).open()
+    assert len(sink) == 0 and "1" not in sink
+    sink.close()
+
+
+def test_partial_tail_is_truncated(tmp_path):
+    sink = _sink(tmp_path, "all.ndjson").open()
+    sink.write(_row(1))
+    sink.close()
+    with open(tmp_path / "all.ndjson", "a", encoding="utf-8") as f:
+        f.write('{"id": "2", "tit')          # crash mid-write
+
+    sink = _sink(tmp_path, "all.ndjson").open()
+    sink.write(_row(3))
+    sink.close()
+    assert [r["id"] for r in sink.iter_rows()] == ["1", "3"]
+
+
+def test_foreign_schema_is_left_alone(tmp_path):
+    old = tmp_path / "all.csv"
+    old.write_text("id,title\n1,old\n", encoding="utf-8")
+    sink = _sink(tmp_path).open()
+    sink.write(_row(2))
+    sink.close()
+    assert old.read_text(encoding="utf-8") == "id,title\n1,old\n"
+    assert sink.path.name == f"all.{schema_tag(FIELDNAMES)}.csv"
+
+
+def test_confirm_with_keeps_only_unknown_ids(tmp_path):
+    sink = _sink(tmp_path).open()
+    for i in range(3):
+        sink.write(_row(i))
+    sink.confirm_with(lambda lid: lid != "2")
+    assert sink.exact_ids == {"2"}
+    assert all(str(i) in sink for i in range(3))
+    sink.write(_row(3))
+    assert "3" in sink and "3" not in sink.exact_ids
+    sink.close()
@@ -0,0 +1,47 @@
+import pytest
+
+from listing_store import ListingStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ListingStore(tmp_path / "listings.db")
+    yield store
+    store.close()
+
+
+def _row(lid, price, title="2018 Toyota RAV4", km="90 mil km", **extra):
+    return {"id": lid, "title": title, "price": f"${price:,}", "price_clp": price, "km": km,
+            "qualifies": True, **extra}
+
+
+def test_upsert_many_records_history(store):
+    first = store.start_run()
+    assert store.upsert_many([_row("1", 10_000_000), _row("2", 8_000_000)]) == {"1", "2"}
+    store.finish_run(seen=2, new=2)
+
+    second = store.start_run()
+    new = store.upsert_many([_row("1", 9_000_000), _row("2", 8_000_000, km="95 mil km"), _row("3", 5_000_000)])
+    assert new == {"3"}
+    assert store.changed == 2 and store.price_drops_seen == 1
+
+    history = store.history("1")
+    assert len(history) == 1
+    assert (history[0]["old_price_clp"], history[0]["new_price_clp"]) == (10_000_000, 9_000_000)
+    assert history[0]["price_drop_pct"] == pytest.approx(10.0)
+    assert store.history("2")[0]["new_km"] == "95 mil km"
+
+    assert [r["id"] for r in store.price_drops(5, run_id=second)] == ["1"]
+    assert store.price_drops(5, run_id=first) == []
+    assert [r["id"] for r in store.new_in_run(second)] == ["3"]
+
+
+def test_refresh_many_updates_known_listings_only(store):
+    store.start_run()
+    store.upsert_many([_row("1", 10_000_000, canonical_id="0")])
+    run = store.start_run()
+    assert store.refresh_many([_row("1", 9_000_000), _row("9", 1_000_000)]) == 1
+    row = store.conn.execute("SELECT * FROM listings WHERE id = '1'").fetchone()
+    assert (row["price_clp"], row["last_run"], row["canonical_id"]) == (9_000_000, run, "0")
+    assert "9" not in store
+    assert store.in_run("1")
@@ -0,0 +1,35 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import parquet_export
+from parquet_export import ParquetExporter
+
+
+def _export(root, day, rows):
+    exporter = ParquetExporter(root, scrape_date=day)
+    exporter.add_many(rows)
+    exporter.close()
+
+
+def _row(lid, price, region="Valparaíso"):
+    return {"id": lid, "title": "2018 Toyota RAV4", "price_clp": price, "region": region,
+            "make": "Toyota", "model": "RAV4", "year": 2018, "qualifies": True}
+
+
+def test_median_uses_each_listings_latest_price(tmp_path):
+    _export(tmp_path, date(2026, 10, 1), [_row("1", 12_000_000), _row("2", 10_000_000), _row("3", 9_000_000)])
+    # Listing 1 was cut to 8M the next day
+    _export(tmp_path, date(2026, 10, 2), [_row("1", 8_000_000)])
+    assert parquet_export.median_price(tmp_path) == (3, 9_000_000)
+    assert parquet_export.median_price(tmp_path, since=date(2026, 10, 2)) == (1, 8_000_000)
+
+
+def test_partitions_and_typed_columns(tmp_path):
+    _export(tmp_path, date(2026, 10, 1), [_row("1", 5_000_000), _row("2", 6_000_000, region="Biobío")])
+    table = parquet_export.load(tmp_path, columns=["id", "year", "region", "scrape_date"])
+    assert sorted(table.column("region").to_pylist()) == ["Biobío", "Valparaíso"]
+    assert table.column("year").to_pylist() == [2018, 2018]
+    assert parquet_export.median_price(tmp_path, region="Biobío") == (1, 6_000_000)
@@ -0,0 +1,56 @@
+import pytest
+
+import scrape_marketplace as sm
+from listing_sink import ListingSink
+
+
+def _edge(lid, price=10_000_000, city="Viña del Mar"):
+    return {"node": {"listing": {
+        "id": str(lid), "marketplace_listing_title": f"2018 Toyota RAV4 {lid}",
+        "listing_price": {"amount": str(price), "formatted_amount": f"${price:,}"},
+        "location": {"reverse_geocode": {"city": city}},
+        "custom_sub_titles_with_rendering_flags": [{"subtitle": "90 mil km"}],
+    }}}
+
+
+def _page(ids, **kw):
+    return {"data": {"marketplace_search": {"feed_units": {"edges": [_edge(i, **kw) for i in ids]}}}}
+
+
+@pytest.fixture
+def sink(tmp_path, monkeypatch):
+    monkeypatch.setattr(sm, "QUIET", True)
+    sink = ListingSink(tmp_path / "all.csv", tmp_path / "qualified.csv").open()
+    sm.reset_run_state(sink)
+    yield sink
+    sink.close()
+
+
+def _run(name):
+    return sm.SearchRun({**sm.SEARCHES[0], "name": name})
+
+
+def test_only_price_bands_track_served_ids(sink):
+    plain = _run("plain")
+    assert sm.parse_feed_units(_page(range(5)), plain) == (5, 5)
+    assert plain.band_ids is None and not plain.band_local
+
+
+def test_band_novelty_counts_listings_another_band_collected(sink):
+    parent, child = _run("parent"), _run("child")
+    parent.track_band()
+    child.track_band()
+    sm.parse_feed_units(_page(range(4)), parent)
+    sm.parse_feed_units(_page(range(2, 6)), child)
+    sm.parse_feed_units(_page(range(2, 6)), child)
+    assert (child.new, child.served, child.band_qualifying) == (2, 4, 4)
+    assert child.repeat_ratio == 0.5
+    assert child.scheduler._pending_new == 4
+
+
+def test_lead_lines_number_each_row(sink, monkeypatch):
+    lines = []
+    monkeypatch.setattr(sm.run_log, "echo", lines.append)
+    sm.parse_feed_units(_page(range(2)))
+    sm.parse_feed_units(_page(range(2, 5)))
+    assert [line.split("[")[1].split("]")[0].strip() for line in lines] == ["1", "2", "3", "4", "5"]
@@ -0,0 +1,71 @@
+import asyncio
+
+import photo_downloader
+from photo_downloader import PhotoDownloader
+
+IMAGES = {
+    "primary.jpg": b"\xff\xd8 primary",
+    "side.jpg": b"\xff\xd8 side",
+    "side_copy.jpg": b"\xff\xd8 side",        # same bytes under another name
+    "rear.jpg": b"\xff\xd8 rear",
+}
+SLOW = {"primary.jpg"}
+
+
+def _fake_fetch(url):
+    name = photo_downloader.photo_name(url)
+    if name in SLOW:
+        import time
+        time.sleep(0.05)
+    if name not in IMAGES:
+        raise OSError("404")
+    return IMAGES[name]
+
+
+def _url(name, size="s960x960"):
+    return f"https://scontent.example/v/{size}/{name}?oh=sig"
+
+
+def _positions(downloader, lid):
+    return [(position, digest[:6]) for position, digest in downloader.conn.execute(
+        "SELECT position, sha256 FROM listing_photos WHERE listing_id = ? ORDER BY position", (lid,))]
+
+
+def test_positions_follow_submission_order_without_gaps(tmp_path, monkeypatch):
+    monkeypatch.setattr(photo_downloader, "_fetch", _fake_fetch)
+    monkeypatch.setattr(photo_downloader, "RETRIES", 0)
+
+    async def scenario():
+        downloader = PhotoDownloader(tmp_path, workers=3, thumbnails=False)
+        downloader.start()
+        downloader.submit("1", [_url("primary.jpg")])
+        # Enriched list: the primary again (other rendition), a duplicate image,
+        # a missing one, and a new one — fetched while the primary is still slow
+        downloader.submit("1", [_url("primary.jpg", "s2048x2048"), _url("side.jpg"), _url("side_copy.jpg"),
+                                _url("gone.jpg"), _url("rear.jpg")])
+        await downloader.close(drain_timeout=5)
+        return downloader
+
+    downloader = asyncio.run(scenario())
+    linked = _positions(downloader, "1")
+    assert [position for position, _ in linked] == [0, 1, 2]
+    assert [path.read_bytes() for path in downloader.photos_of("1")] == [
+        IMAGES["primary.jpg"], IMAGES["side.jpg"], IMAGES["rear.jpg"]]
+    assert downloader.failed == 1
+    assert downloader._listings == {}
+
+
+def test_resubmitting_after_a_restart_appends(tmp_path, monkeypatch):
+    monkeypatch.setattr(photo_downloader, "_fetch", _fake_fetch)
+
+    async def scenario(urls, conn=None):
+        downloader = PhotoDownloader(tmp_path, conn, workers=2, thumbnails=False)
+        downloader.start()
+        downloader.submit("1", urls)
+        await downloader.close(drain_timeout=5)
+        return downloader
+
+    first = asyncio.run(scenario([_url("primary.jpg"), _url("side.jpg")]))
+    second = asyncio.run(scenario([_url("primary.jpg"), _url("side_copy.jpg"), _url("rear.jpg")], first.conn))
+    assert [position for position, _ in _positions(second, "1")] == [0, 1, 2]
+    assert second.downloaded == 1
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from price_index import PriceIndex, group_keys
+
+
+def _rows(n, price=10_000_000, step=100_000, **fields):
+    car = {"make": "Toyota", "model": "RAV4", "year": 2018, "km_num": 90_000, **fields}
+    return [{**car, "price_clp": price + i * step} for i in range(n)]
+
+
+def test_group_keys():
+    assert group_keys("Toyota", "RAV4", 2018, 90_000) == ["Toyota|RAV4|2018|2", "Toyota|RAV4|2018", "Toyota|RAV4"]
+    assert group_keys("Toyota", "RAV4", None, None) == [None, None, "Toyota|RAV4"]
+    assert group_keys("", "RAV4", 2018, 0) == [None, None, None]
+
+
+def test_score_against_the_median():
+    index = PriceIndex.build(_rows(5))
+    rows = [{"make": "Toyota", "model": "RAV4", "year": 2018, "km_num": 80_000, "price_clp": 9_000_000}]
+    index.score_many(rows)
+    assert rows[0]["market_price"] == 10_200_000
+    assert rows[0]["deal_score"] == pytest.approx(11.8)
+
+
+def test_falls_back_to_a_wider_group():
+    index = PriceIndex.build(_rows(3) + _rows(3, price=12_000_000, year=2019))
+    rows = [{"make": "Toyota", "model": "RAV4", "year": 2018, "km_num": 90_000, "price_clp": 11_000_000},
+            {"make": "Honda", "model": "CR-V", "year": 2018, "km_num": 90_000, "price_clp": 11_000_000}]
+    index.score_many(rows)
+    assert rows[0]["market_price"] == 11_100_000        # make | model: 3 + 3 prices
+    assert rows[1]["market_price"] is None and rows[1]["deal_score"] is None
+
+
+def test_updates_only_change_dirty_groups():
+    index = PriceIndex.build(_rows(5))
+    assert index.lookup("Toyota", "RAV4", 2018)["median"] == 10_200_000
+    index.add_many(_rows(5, price=20_000_000, year=2020))
+    assert index.lookup("Toyota", "RAV4", 2018)["median"] == 10_200_000
+    assert index.lookup("Toyota", "RAV4", 2020)["median"] == 20_200_000
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "index.json"
+    PriceIndex.build(_rows(5)).save(path)
+    assert PriceIndex.load(path).lookup("Toyota", "RAV4", 2018, 90_000)["n"] == 5
+    assert PriceIndex.open(tmp_path / "missing.json", rebuild=lambda: _rows(5)).lookup("Toyota", "RAV4")["n"] == 5
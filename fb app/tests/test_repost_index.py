@@ -0,0 +1,42 @@
+from repost_index import RepostIndex
+
+
+def _row(lid, price, km=None, title="Toyota Yaris 2015 full equipo", **extra):
+    return {"id": lid, "title": title, "price_clp": price, "km_num": km, "seller": "Automotora Sur",
+            "city": "Viña del Mar", "make": "Toyota", "model": "Yaris", "year": 2015, **extra}
+
+
+def test_listings_live_in_the_same_run_are_different_cars():
+    index = RepostIndex()
+    assert index.assign_many([_row("1", 8_000_000), _row("2", 8_500_000)], run=1) == ["1", "2"]
+    assert index.assign_many([_row("3", 8_200_000)], run=1) == ["3"]
+    assert index.reposts == 0
+
+
+def test_repost_in_a_later_run_joins_the_group():
+    index = RepostIndex()
+    index.assign_many([_row("1", 8_000_000, km=90_000)], run=1)
+    assert index.assign_many([_row("2", 7_800_000, km=91_000)], run=2) == ["1"]
+    assert index.group("1") == ["1", "2"]
+
+
+def test_re_sighted_listing_is_not_a_repost_target():
+    index = RepostIndex()
+    index.assign_many([_row("1", 8_000_000, km=90_000)], run=1)
+    index.seen_live(["1"], run=2)
+    assert index.assign_many([_row("2", 7_800_000, km=91_000)], run=2) == ["2"]
+
+
+def test_needs_km_or_the_same_vehicle():
+    index = RepostIndex()
+    index.assign_many([_row("1", 8_000_000, make=None)], run=1)
+    assert index.assign_many([_row("2", 8_000_000, make=None)], run=2) == ["2"]
+    index.assign_many([_row("3", 8_000_000, km=90_000)], run=1)
+    assert index.assign_many([_row("4", 8_000_000, km=150_000)], run=2) == ["4"]
+    assert index.assign_many([_row("5", 8_000_000, year=2016)], run=2) == ["5"]
+
+
+def test_same_vehicle_without_km_in_a_later_run():
+    index = RepostIndex()
+    index.assign_many([_row("1", 8_000_000)], run=1)
+    assert index.assign_many([_row("2", 8_100_000)], run=2) == ["1"]
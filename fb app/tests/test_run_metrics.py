@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from run_metrics import Histogram, RunMetrics
+
+
+def test_quantiles_follow_the_whole_run():
+    hist = Histogram("latency", "test", (0.5, 1, 2), keep=1_000)
+    for _ in range(10_000):
+        hist.observe(0.2)                 # fast start …
+    for _ in range(30_000):
+        hist.observe(3.0)                 # … slow for most of the run
+    assert len(hist.samples) == 1_000
+    assert hist.quantile(0.5) == 3.0
+    summary = hist.summary()
+    assert summary["count"] == 40_000 and summary["max"] == 3.0
+    assert summary["mean"] == pytest.approx((10_000 * 0.2 + 30_000 * 3.0) / 40_000)
+
+
+def test_exact_quantiles_below_keep():
+    hist = Histogram("n", "test", (1, 10))
+    for value in range(1, 101):
+        hist.observe(value)
+    assert (hist.quantile(0.5), hist.quantile(0.95), hist.summary()["max"]) == (51, 96, 100)
+    assert hist.exposition()[:3] == ['fb_marketplace_n_bucket{le="1"} 1', 'fb_marketplace_n_bucket{le="10"} 10',
+                                     'fb_marketplace_n_bucket{le="+Inf"} 100']
+
+
+def test_exports(tmp_path):
+    metrics = RunMetrics()
+    metrics.info = {"run_id": 7}
+    metrics.scroll_latency.observe(0.4)
+    metrics.http_errors.inc(status=429)
+    metrics.write_prometheus(tmp_path / "m.prom")
+    metrics.append_json(tmp_path / "m.ndjson")
+    prom = (tmp_path / "m.prom").read_text(encoding="utf-8")
+    assert 'fb_marketplace_graphql_http_errors_total{status="429"} 1' in prom
+    line = json.loads((tmp_path / "m.ndjson").read_text(encoding="utf-8"))
+    assert line["run_id"] == 7
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+import scrape_daemon
+import scrape_marketplace as sm
+from listing_sink import ListingSink
+from listing_store import ListingStore
+
+
+def _edge(lid, price):
+    return {"node": {"listing": {
+        "id": str(lid), "marketplace_listing_title": f"2018 Toyota RAV4 {lid}",
+        "listing_price": {"amount": str(price), "formatted_amount": f"${price:,}"},
+        "location": {"reverse_geocode": {"city": "Viña del Mar"}},
+        "custom_sub_titles_with_rendering_flags": [{"subtitle": f"{80 + lid} mil km"}],
+    }}}
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    for name, value in {"QUIET": True, "METRICS_PROM_FILE": None, "METRICS_JSON_FILE": None,
+                        "PARQUET_DIR": None, "SEEN_FILTER_FILE": None, "PRICE_INDEX_FILE": None,
+                        "SEARCHES": sm.SEARCHES[:1]}.items():
+        monkeypatch.setattr(sm, name, value)
+    monkeypatch.setattr(scrape_daemon, "LEADS_DIR", tmp_path / "leads")
+    sink = ListingSink(tmp_path / "all.csv", tmp_path / "qualified.csv").open()
+    store = ListingStore(tmp_path / "listings.db")
+    store.start_run()
+    sm.reset_run_state(sink, store)
+    sink.confirm_with(store.in_run)
+    monkeypatch.setattr(sm, "SKIP_KNOWN", True)
+    feeds = []
+
+    async def scrape_search(context, run, slots):
+        # Newest first: the feed serves its pages until the run stops
+        for page in feeds.pop(0):
+            sm.parse_feed_units({"data": {"marketplace_search": {"feed_units": {"edges": page}}}}, run)
+            if sm._should_stop(run):
+                return
+        run.stop_reason = "end of feed"
+
+    monkeypatch.setattr(sm, "scrape_search", scrape_search)
+    yield feeds, store
+    sink.close()
+    store.close()
+
+
+def test_cycles_refresh_known_listings_and_stop_at_the_high_water_mark(daemon):
+    feeds, store = daemon
+    high_water = {}
+    feeds.append([[_edge(i, 10_000_000) for i in range(30)]])
+    _, first = asyncio.run(scrape_daemon.run_cycle(None, 1, True, high_water))
+    assert first["new"] == 30 and len(high_water[sm.SEARCHES[0]["name"]]) == sm.FIRST_IDS_KEPT
+    metrics = sm.metrics
+
+    # Two new listings on top, then last cycle's newest — one of them cheaper
+    feeds.append([[_edge(100, 9_000_000), _edge(101, 9_000_000)]
+                  + [_edge(i, 8_000_000 if i == 0 else 10_000_000) for i in range(5)],
+                  [_edge(i, 10_000_000) for i in range(5, 30)]])
+    runs, second = asyncio.run(scrape_daemon.run_cycle(None, 2, False, high_water))
+    assert (second["new"], second["refreshed"], second["price_drops"]) == (2, 5, 1)
+    assert runs[0].stop_reason.startswith("caught up")
+    assert second["run_id"] == first["run_id"] + 1
+    assert sm.metrics is not metrics and sm.metrics.info["run_id"] == second["run_id"]
+    assert len(store.history("0")) == 1
+    assert (scrape_daemon.LEADS_DIR / second["drops_file"]).exists()
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from scroll_scheduler import AdaptiveScrollScheduler, MarginalYieldStop
+
+LATENCY = 0.05
+
+
+def test_latency_is_measured_from_each_scroll():
+    async def scenario():
+        sched = AdaptiveScrollScheduler(min_pause=0.02, page_timeout=1.0)
+        loop = asyncio.get_running_loop()
+
+        async def scroll():
+            # Each scroll gets its page after LATENCY, plus a late second page
+            # that lands in the pause before the next scroll
+            loop.call_later(LATENCY, sched.page_parsed, 24, 10)
+            loop.call_later(LATENCY + 0.01, sched.page_parsed, 24, 5)
+
+        latencies, news = [], []
+        for _ in range(4):
+            news.append(await sched.after_scroll(scroll()))
+            latencies.append(sched.last_latency)
+        return sched, latencies, news
+
+    sched, latencies, news = asyncio.run(scenario())
+    assert latencies == [pytest.approx(LATENCY, abs=0.03)] * 4
+    assert news == [10, 15, 15, 15]         # late pages count towards the next scroll
+    assert sched.early_pages == 4
+
+
+def test_timeouts_and_end_of_feed():
+    async def scenario():
+        sched = AdaptiveScrollScheduler(min_pause=0.001, max_pause=0.002, page_timeout=0.01, end_after_idle=3)
+        while not sched.feed_ended:
+            await sched.after_scroll(asyncio.sleep(0))
+            assert sched.last_latency is None
+        return sched
+
+    assert "without a feed response" in asyncio.run(scenario()).end_reason
+
+
+def test_marginal_yield_stop():
+    stop = MarginalYieldStop(window=4, min_pages=4, min_yield=0.5)
+    for _ in range(3):
+        stop.record(0, 2)
+    assert not stop.should_stop
+    stop.record(1, 2)
+    assert stop.should_stop and stop.window_yield == 1 / 8
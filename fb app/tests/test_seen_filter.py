@@ -0,0 +1,40 @@
+from seen_filter import SeenFilter
+
+
+def test_no_false_negatives_and_bounded_false_positives():
+    seen = SeenFilter(capacity=20_000, error_rate=0.01)
+    seen.add_many(f"a{i}" for i in range(20_000))
+    assert all(f"a{i}" in seen for i in range(20_000))
+    hits = sum(f"b{i}" in seen for i in range(20_000))
+    assert hits / 20_000 < 0.02
+    assert seen.false_positive_rate < 0.02
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "seen.bloom"
+    seen = SeenFilter(capacity=1_000, error_rate=0.01)
+    seen.add_many(["1", "2", "3"])
+    seen.save(path)
+
+    loaded = SeenFilter.load(path)
+    assert loaded is not None and len(loaded) == 3
+    assert all(lid in loaded for lid in ("1", "2", "3"))
+    assert loaded.bits == seen.bits
+
+
+def test_damaged_file_is_not_loaded(tmp_path):
+    path = tmp_path / "seen.bloom"
+    path.write_bytes(b"FBSEEN01 truncated")
+    assert SeenFilter.load(path) is None
+
+
+def test_open_rebuilds_a_stale_filter(tmp_path):
+    path = tmp_path / "seen.bloom"
+    seen = SeenFilter(capacity=1_000, error_rate=0.01)
+    seen.add("1")
+    seen.save(path)
+
+    ids = ["1", "2", "3"]
+    reopened = SeenFilter.open(path, rebuild=lambda: ids, min_count=len(ids), capacity=1_000, error_rate=0.01)
+    assert len(reopened) == 3 and "3" in reopened
+    assert SeenFilter.open(path, rebuild=lambda: ids, min_count=1).count == 1